@@ -0,0 +1,220 @@
+"""Admission control: batas request konkuren per grup route + rate limit per klien.
+
+Saat lonjakan (mis. kampanye skrining), request /api/diagnosa yang melebihi
+kapasitas pool DB hanya akan antre di pool sampai DB_POOL_TIMEOUT lalu gagal,
+sambil ikut menghabiskan koneksi untuk panel admin. Middleware di sini membagi
+request /api/* ke tiga grup dengan jatah slot masing-masing:
+
+- "admin"    : /api/admin (termasuk riwayat & export) & /api/auth; jatah sendiri
+               yang tidak bisa dipakai grup lain dan tidak kena rate limit, jadi
+               panel admin tetap jalan.
+- "diagnosa" : /api/diagnosa
+- "publik"   : /api/* lainnya (katalog /api/penyakit & /api/gejala)
+
+Request yang tidak dapat slot menunggu di antrean FIFO terbatas paling lama
+ADMISI_TUNGGU_DETIK; kalau antrean penuh atau waktu tunggu habis, langsung
+dijawab 503 + Retry-After tanpa menyentuh DB. Untuk grup diagnosa & publik ada
+token bucket per IP klien (RATE_PER_DETIK, 429 + Retry-After). Path di luar
+/api (frontend, /healthz, /readyz, /metrics) tidak dibatasi.
+
+Semua state hidup di event loop (middleware ASGI murni), jadi tidak butuh lock.
+Batasnya per worker: total slot grup sebaiknya tidak melebihi
+DB_POOL_SIZE + DB_MAX_OVERFLOW.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from .konfigurasi import settings
+from .metrik import Counter, Histogram, prometheus_counter, prometheus_gauge, prometheus_histogram
+
+SEBAB_TOLAK = ("antrean_penuh", "timeout", "rate")
+
+
+def grup_route(path: str) -> Optional[str]:
+    if path.startswith(("/api/admin", "/api/auth")):
+        return "admin"
+    if path.startswith("/api/diagnosa"):
+        return "diagnosa"
+    if path.startswith("/api/"):
+        return "publik"
+    return None
+
+
+class Gerbang:
+    """Slot konkuren satu grup route dengan antrean tunggu FIFO terbatas."""
+
+    def __init__(self, batas: int, antrean_maks: int):
+        self.batas = batas
+        self.antrean_maks = antrean_maks
+        self.aktif = 0
+        self._antrean: deque[asyncio.Future] = deque()
+        self.diterima = Counter()
+        self.diantre = Counter()  # sempat menunggu di antrean (diterima atau tidak)
+        self.ditolak = {s: Counter() for s in SEBAB_TOLAK}
+        self.tunggu = Histogram()  # lama menunggu di antrean sampai dapat slot
+
+    @property
+    def panjang_antrean(self) -> int:
+        return len(self._antrean)
+
+    async def masuk(self, batas_tunggu: float) -> Optional[str]:
+        """Ambil slot; None kalau diterima, selain itu sebab ditolak."""
+        if self.aktif < self.batas and not self._antrean:
+            self.aktif += 1
+            self.diterima.tambah()
+            return None
+        if len(self._antrean) >= self.antrean_maks:
+            self.ditolak["antrean_penuh"].tambah()
+            return "antrean_penuh"
+
+        f = asyncio.get_running_loop().create_future()
+        self._antrean.append(f)
+        self.diantre.tambah()
+        mulai = time.perf_counter()
+        try:
+            await asyncio.wait_for(f, batas_tunggu)
+        except BaseException as e:
+            if f.done() and not f.cancelled():
+                self.keluar()  # slot sempat diserahkan bersamaan dengan timeout/cancel: kembalikan
+            else:
+                f.cancel()
+                try:
+                    self._antrean.remove(f)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                self.ditolak["timeout"].tambah()
+                return "timeout"
+            raise
+        self.tunggu.amati(time.perf_counter() - mulai)
+        self.diterima.tambah()
+        return None
+
+    def keluar(self) -> None:
+        # slot langsung diserahkan ke penunggu terdepan (aktif tidak berubah)
+        while self._antrean:
+            f = self._antrean.popleft()
+            if not f.done():
+                f.set_result(None)
+                return
+        self.aktif -= 1
+
+    def ke_dict(self) -> dict:
+        return {
+            "batas": self.batas,
+            "aktif": self.aktif,
+            "antrean": self.panjang_antrean,
+            "diterima": self.diterima.nilai,
+            "diantre": self.diantre.nilai,
+            "ditolak": {s: c.nilai for s, c in self.ditolak.items()},
+            "tunggu_detik": self.tunggu.ke_dict(),
+        }
+
+
+class Ember:
+    """Token bucket per klien; jumlah klien yang diingat dibatasi (LRU)."""
+
+    def __init__(self, laju: float, kapasitas: int, maks_klien: int):
+        self.laju = laju
+        self.kapasitas = kapasitas
+        self.maks_klien = maks_klien
+        self._isi: OrderedDict[str, tuple[float, float]] = OrderedDict()  # klien -> (token, waktu)
+
+    def ambil(self, klien: str) -> float:
+        """0 kalau token tersedia (lalu dipakai), selain itu detik sampai token berikutnya."""
+        sekarang = time.monotonic()
+        token, t = self._isi.pop(klien, (float(self.kapasitas), sekarang))
+        token = min(float(self.kapasitas), token + (sekarang - t) * self.laju)
+        tunggu = 0.0
+        if token >= 1:
+            token -= 1
+        else:
+            tunggu = (1 - token) / self.laju
+        self._isi[klien] = (token, sekarang)
+        if len(self._isi) > self.maks_klien:
+            self._isi.popitem(last=False)
+        return tunggu
+
+
+gerbang: dict[str, Gerbang] = {
+    "admin": Gerbang(settings.ADMISI_ADMIN, settings.ADMISI_ANTREAN),
+    "diagnosa": Gerbang(settings.ADMISI_DIAGNOSA, settings.ADMISI_ANTREAN),
+    "publik": Gerbang(settings.ADMISI_PUBLIK, settings.ADMISI_ANTREAN),
+}
+ember: Optional[Ember] = (
+    Ember(settings.RATE_PER_DETIK, settings.RATE_BURST, settings.RATE_MAKS_KLIEN)
+    if settings.RATE_PER_DETIK > 0 else None
+)
+
+
+async def _tolak(send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class MiddlewareAdmisi:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        grup = grup_route(scope["path"]) if scope["type"] == "http" and settings.ADMISI else None
+        if grup is None:
+            await self.app(scope, receive, send)
+            return
+
+        g = gerbang[grup]
+        if ember is not None and grup != "admin":
+            klien = (scope.get("client") or ("-",))[0]
+            tunggu = ember.ambil(klien)
+            if tunggu > 0:
+                g.ditolak["rate"].tambah()
+                await _tolak(send, 429, "Terlalu banyak request, coba lagi sebentar.", tunggu)
+                return
+
+        if await g.masuk(settings.ADMISI_TUNGGU_DETIK) is not None:
+            await _tolak(send, 503, "Server sedang sibuk, coba lagi sebentar.", settings.ADMISI_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            g.keluar()
+
+
+def statistik_admisi() -> dict:
+    return {
+        "aktif": settings.ADMISI,
+        "tunggu_maks_detik": settings.ADMISI_TUNGGU_DETIK,
+        "rate_per_detik": settings.RATE_PER_DETIK,
+        "grup": {nama: g.ke_dict() for nama, g in gerbang.items()},
+    }
+
+
+def prometheus_admisi() -> list[str]:
+    isi = list(gerbang.items())
+    return [
+        *prometheus_counter("admission_admitted_total", "Request yang mendapat slot, per grup route.",
+                            [({"group": n}, g.diterima) for n, g in isi]),
+        *prometheus_counter("admission_queued_total", "Request yang sempat menunggu di antrean, per grup route.",
+                            [({"group": n}, g.diantre) for n, g in isi]),
+        *prometheus_counter("admission_shed_total", "Request yang ditolak (503/429), per grup route & sebab.",
+                            [({"group": n, "reason": s}, c) for n, g in isi for s, c in g.ditolak.items()]),
+        *prometheus_gauge("admission_in_flight", "Request yang sedang memegang slot.",
+                          [({"group": n}, g.aktif) for n, g in isi]),
+        *prometheus_gauge("admission_queue_depth", "Panjang antrean tunggu saat ini.",
+                          [({"group": n}, g.panjang_antrean) for n, g in isi]),
+        *prometheus_histogram("admission_wait_seconds", "Lama menunggu di antrean sampai dapat slot.",
+                              [({"group": n}, g.tunggu) for n, g in isi]),
+    ]
@@ -1,18 +1,88 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import contextvars
+import logging
+import time
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .konfigurasi import settings
+from .metrik import Counter, Histogram
 
-def db_url() -> str:
+log = logging.getLogger(__name__)
+
+def db_url(driver: str = "pymysql") -> str:
     user = settings.DB_USER
     pwd = settings.DB_PASSWORD
     host = settings.DB_HOST
     port = settings.DB_PORT
     name = settings.DB_NAME
-    return f"mysql+pymysql://{user}:{pwd}@{host}:{port}/{name}?charset=utf8mb4"
+    return f"mysql+{driver}://{user}:{pwd}@{host}:{port}/{name}?charset=utf8mb4"
+
+class StatPool:
+    """Statistik checkout pool: lama antre slot, latensi checkout total, dan timeout."""
+
+    def __init__(self):
+        self.tunggu = Histogram()  # lama menunggu slot kosong di antrean pool
+        self.checkout = Histogram()  # total checkout termasuk pre-ping / connect baru
+        self.timeout = Counter()
+
+
+class _PoolTerukur:
+    stat: StatPool
+
+    def _do_get(self):
+        t = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stat.timeout.tambah()
+            raise
+        finally:
+            self.stat.tunggu.amati(time.perf_counter() - t)
+
+    def connect(self):
+        t = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.stat.checkout.amati(time.perf_counter() - t)
 
-engine = create_engine(db_url(), pool_pre_ping=True, pool_recycle=3600)
+
+class PoolTerukur(_PoolTerukur, QueuePool):
+    stat = StatPool()
+
+
+class PoolTerukurAsync(_PoolTerukur, AsyncAdaptedQueuePool):
+    stat = StatPool()
+
+
+def opsi_pool() -> dict:
+    return dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_use_lifo=settings.DB_POOL_LIFO,
+    )
+
+engine = create_engine(db_url(), poolclass=PoolTerukur, **opsi_pool())
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Stack async hanya dibuat kalau DB_ASYNC aktif, supaya driver asyncio
+# tidak wajib terpasang untuk deployment sync biasa.
+async_engine = (
+    create_async_engine(db_url(settings.DB_ASYNC_DRIVER), poolclass=PoolTerukurAsync, **opsi_pool())
+    if settings.DB_ASYNC else None
+)
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False)
+    if async_engine is not None else None
+)
+
 class Base(DeclarativeBase):
     pass
 
@@ -22,3 +92,76 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def upsert(db: Session, model, nilai: dict, kunci: list[str], ubah: dict) -> None:
+    """INSERT, atau UPDATE kolom `ubah` kalau baris dengan unique key `kunci` sudah ada.
+
+    MySQL memakai INSERT ... ON DUPLICATE KEY UPDATE; dialek lain (SQLite untuk
+    uji/benchmark) memakai INSERT ... ON CONFLICT DO UPDATE.
+    """
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model).values(**nilai).on_duplicate_key_update(**ubah)
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(model).values(**nilai).on_conflict_do_update(index_elements=kunci, set_=ubah)
+    db.execute(stmt)
+
+class RekamanQuery:
+    """Query DB yang dijalankan selama satu request (diisi event engine di bawah)."""
+    __slots__ = ("route", "jumlah", "detik", "terlama", "sql_terlama")
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.jumlah = 0
+        self.detik = 0.0
+        self.terlama = 0.0
+        self.sql_terlama: Optional[str] = None
+
+
+# rekaman request yang sedang berjalan; ikut terbawa ke threadpool & greenlet AsyncSession
+rekaman_query: contextvars.ContextVar[Optional[RekamanQuery]] = contextvars.ContextVar("rekaman_query", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_mulai(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_mulai"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_selesai(conn, cursor, statement, parameters, context, executemany):
+    detik = time.perf_counter() - conn.info.pop("query_mulai", time.perf_counter())
+    r = rekaman_query.get()
+    if r is not None:
+        r.jumlah += 1
+        r.detik += detik
+        if detik > r.terlama:
+            r.terlama, r.sql_terlama = detik, statement
+    if 0 < settings.DB_QUERY_LAMBAT_MS <= detik * 1000:
+        log.warning("query lambat %.1f ms [%s]: %s", detik * 1000, r.route if r else "-", " ".join(statement.split())[:500])
+
+
+def statistik_pool() -> dict:
+    """Ringkasan pool per engine untuk sizing worker terhadap max_connections MySQL."""
+    out = {}
+    for nama, eng in (("sync", engine), ("async", async_engine and async_engine.sync_engine)):
+        if eng is None:
+            continue
+        pool = eng.pool
+        stat = pool.stat
+        out[nama] = {
+            "pool_size": pool.size(),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "koneksi_maks": pool.size() + settings.DB_MAX_OVERFLOW,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "timeout_total": stat.timeout.nilai,
+            "tunggu_detik": stat.tunggu.ke_dict(),
+            "checkout_detik": stat.checkout.ke_dict(),
+        }
+    return out
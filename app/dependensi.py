@@ -1,6 +1,14 @@
+import functools
+import hmac
+import inspect
+from typing import Callable, Optional
 from fastapi import Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from .db import get_async_db, get_db
 from .keamanan import cek_token
+from .konfigurasi import settings
+from .pengetahuan import basis_aktif, perlu_disegarkan
 
 bearer = HTTPBearer(auto_error=False)
 
@@ -14,3 +22,53 @@ def wajib_admin(creds: HTTPAuthorizationCredentials = Depends(bearer)) -> str:
     if sub != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
     return sub
+
+def wajib_token_metrik(creds: HTTPAuthorizationCredentials = Depends(bearer)) -> None:
+    """Scrape /metrics: token statis METRIK_TOKEN (Prometheus `authorization`), kosong = terbuka."""
+    if not settings.METRIK_TOKEN:
+        return
+    if not creds or not hmac.compare_digest(creds.credentials, settings.METRIK_TOKEN):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+def dukung_async(fn: Optional[Callable] = None, *, blokir: Optional[Callable[[], bool]] = None):
+    """Jadikan handler sync (yang menerima `db: Session`) async saat DB_ASYNC aktif.
+
+    Logika handler tetap satu versi (ORM sync). Dengan DB_ASYNC, dependency `db`
+    diganti AsyncSession dan handler dijalankan lewat `AsyncSession.run_sync`:
+    query memakai driver asyncio, tapi kode Python handler ikut berjalan di thread
+    event loop. Supaya event loop tidak terblokir:
+
+    - snapshot basis pengetahuan yang perlu dibangun / dicek ulang disegarkan dulu
+      di threadpool (engine sync), jadi kompilasi snapshot tidak jalan di event loop;
+    - kalau `blokir()` True untuk request ini (mis. store sesi Redis dengan klien
+      sync), handler dijalankan utuh di threadpool dengan Session sync, sama
+      seperti saat DB_ASYNC mati.
+
+    Handler yang selalu memblokir tidak memakai dekorator ini dan tetap sync di
+    threadpool: login (hash password & cache ber-lock), perubahan basis
+    pengetahuan (kompilasi snapshot & kabar ke worker lain), dan export streaming
+    (riwayat/export, export, export/ndjson) yang membaca lewat engine sync.
+    """
+    if fn is None:
+        return functools.partial(dukung_async, blokir=blokir)
+    if not settings.DB_ASYNC:
+        return fn
+
+    sig = inspect.signature(fn)
+    params = [
+        p.replace(default=Depends(get_async_db)) if p.name == "db" else p
+        for p in sig.parameters.values()
+    ]
+    # Session sync (lazy, baru ambil koneksi saat dipakai) untuk jalur threadpool
+    params.append(inspect.Parameter("db_sync", inspect.Parameter.KEYWORD_ONLY, default=Depends(get_db)))
+
+    @functools.wraps(fn)
+    async def handler(*args, db, db_sync, **kwargs):
+        if blokir is not None and blokir():
+            return await run_in_threadpool(fn, *args, db=db_sync, **kwargs)
+        if perlu_disegarkan():
+            await run_in_threadpool(basis_aktif, db_sync)
+        return await db.run_sync(lambda s: fn(*args, db=s, **kwargs))
+
+    handler.__signature__ = sig.replace(parameters=params)
+    return handler
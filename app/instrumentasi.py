@@ -0,0 +1,122 @@
+"""Instrumentasi per request: jumlah & waktu query DB, header Server-Timing, metrik per route.
+
+Query dihitung oleh event engine di db.py ke `rekaman_query` milik request.
+Middleware di sini ASGI murni (bukan BaseHTTPMiddleware) supaya ContextVar yang
+dipasang terlihat juga oleh handler sync di threadpool dan AsyncSession.
+"""
+import threading
+import time
+from typing import Optional
+
+from .db import RekamanQuery, rekaman_query
+from .konfigurasi import settings
+from .metrik import Counter, Histogram, prometheus_counter, prometheus_histogram
+
+# bucket jumlah query per request
+BUCKET_QUERY = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+
+class StatRoute:
+    def __init__(self):
+        self.durasi = Histogram()
+        self.db_detik = Histogram()
+        self.query = Histogram(BUCKET_QUERY)
+        self.error = Counter()  # response 5xx
+        self.terlama = 0.0  # statement paling lambat yang pernah tercatat di route ini
+        self.sql_terlama: Optional[str] = None
+
+    def ke_dict(self) -> dict:
+        q = self.query.ke_dict()
+        return {
+            "request": q["count"],
+            "query_total": int(q["sum"]),
+            "query_per_request": round(q["sum"] / q["count"], 2) if q["count"] else 0.0,
+            "error_5xx": self.error.nilai,
+            "durasi_detik": self.durasi.ke_dict(),
+            "db_detik": self.db_detik.ke_dict(),
+            "query_terlama": {"detik": round(self.terlama, 6), "sql": self.sql_terlama},
+        }
+
+
+_stat: dict[tuple[str, str], StatRoute] = {}
+_kunci = threading.Lock()
+
+
+def _nama_route(scope) -> str:
+    # template path (/api/publik/penyakit/{kode}), bukan path mentah, supaya label tidak meledak
+    route = scope.get("route")
+    return getattr(route, "path", None) or "lainnya"
+
+
+def catat(metode: str, route: str, r: RekamanQuery, status: int, detik: float) -> None:
+    with _kunci:
+        st = _stat.get((metode, route))
+        if st is None:
+            st = _stat[(metode, route)] = StatRoute()
+        if r.terlama > st.terlama:
+            st.terlama, st.sql_terlama = r.terlama, " ".join(r.sql_terlama.split())[:1000]
+    st.durasi.amati(detik)
+    st.db_detik.amati(r.detik)
+    st.query.amati(r.jumlah)
+    if status >= 500:
+        st.error.tambah()
+
+
+def server_timing(r: RekamanQuery, detik: float) -> bytes:
+    return (
+        f'db;dur={r.detik * 1000:.2f};desc="{r.jumlah} query", '
+        f"db-terlama;dur={r.terlama * 1000:.2f}, total;dur={detik * 1000:.2f}"
+    ).encode("latin-1")
+
+
+class MiddlewareQuery:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        r = RekamanQuery(scope["path"])
+        token = rekaman_query.set(r)
+        mulai = time.perf_counter()
+        status = 500
+
+        async def kirim(pesan):
+            nonlocal status
+            if pesan["type"] == "http.response.start":
+                status = pesan["status"]
+                if settings.SERVER_TIMING:
+                    # response streaming: hanya query sebelum header terkirim yang terhitung di sini
+                    header = server_timing(r, time.perf_counter() - mulai)
+                    pesan["headers"] = [*pesan.get("headers", ()), (b"server-timing", header)]
+            await send(pesan)
+
+        try:
+            await self.app(scope, receive, kirim)
+        finally:
+            rekaman_query.reset(token)
+            catat(scope["method"], _nama_route(scope), r, status, time.perf_counter() - mulai)
+
+
+def statistik_route() -> dict:
+    with _kunci:
+        isi = sorted(_stat.items())
+    return {f"{m} {route}": st.ke_dict() for (m, route), st in isi}
+
+
+def prometheus() -> str:
+    with _kunci:
+        isi = sorted(_stat.items())
+    seri = [({"method": m, "route": route}, st) for (m, route), st in isi]
+    baris = [
+        *prometheus_histogram("http_request_duration_seconds", "Durasi request per route.",
+                              [(lb, st.durasi) for lb, st in seri]),
+        *prometheus_histogram("http_request_db_seconds", "Total waktu query DB per request.",
+                              [(lb, st.db_detik) for lb, st in seri]),
+        *prometheus_histogram("http_request_db_queries", "Jumlah query DB per request.",
+                              [(lb, st.query) for lb, st in seri]),
+        *prometheus_counter("http_request_errors_total", "Response 5xx per route.",
+                            [(lb, st.error) for lb, st in seri]),
+    ]
+    return "\n".join(baris) + "\n"
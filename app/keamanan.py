@@ -1,13 +1,120 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
 from jose import jwt
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
 from .konfigurasi import settings
+from .metrik import Counter
 
 ALGO = "HS256"
 
+
+class CacheLRU:
+    """Cache LRU terbatas dengan waktu kedaluwarsa per entri (epoch detik).
+
+    `maks` <= 0 mematikan cache (semua akses dihitung miss).
+    """
+
+    def __init__(self, maks: int):
+        self.maks = maks
+        self._data: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+        self._kunci = threading.Lock()
+        self.hit = Counter()
+        self.miss = Counter()
+
+    def ambil(self, kunci) -> Optional[Any]:
+        with self._kunci:
+            isi = self._data.get(kunci)
+            if isi is not None:
+                if isi[1] > time.time():
+                    self._data.move_to_end(kunci)
+                    self.hit.tambah()
+                    return isi[0]
+                del self._data[kunci]
+        self.miss.tambah()
+        return None
+
+    def simpan(self, kunci, nilai, sampai: float) -> None:
+        if self.maks <= 0:
+            return
+        with self._kunci:
+            self._data[kunci] = (nilai, sampai)
+            self._data.move_to_end(kunci)
+            while len(self._data) > self.maks:
+                self._data.popitem(last=False)
+
+    def hapus(self, kunci) -> None:
+        with self._kunci:
+            self._data.pop(kunci, None)
+
+    def ke_dict(self) -> dict:
+        hit, miss = self.hit.nilai, self.miss.nilai
+        return {
+            "maks": self.maks,
+            "ukuran": len(self._data),
+            "hit": hit,
+            "miss": miss,
+            "rasio_hit": round(hit / (hit + miss), 4) if hit + miss else 0.0,
+        }
+
+
+# token yang sudah terverifikasi: digest token -> sub, berlaku sampai `exp` token
+cache_token = CacheLRU(settings.JWT_CACHE_MAKS)
+# baris admin untuk login: username -> password_sha, berlaku AUTH_CACHE_DETIK
+cache_admin = CacheLRU(64 if settings.AUTH_CACHE_DETIK > 0 else 0)
+
+
 def buat_token(sub: str) -> str:
     exp = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_EXPIRE_MINUTES)
     return jwt.encode({"sub": sub, "exp": exp}, settings.JWT_SECRET, algorithm=ALGO)
 
+
 def cek_token(token: str) -> str:
+    """Verifikasi token dan kembalikan `sub`.
+
+    Token yang sama dari burst request SPA admin cukup diverifikasi HMAC sekali;
+    berikutnya dilayani dari cache (kunci = digest token) sampai `exp`-nya lewat.
+    """
+    kunci = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    sub = cache_token.ambil(kunci)
+    if sub is not None:
+        return sub
     payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGO])
-    return payload.get("sub", "")
+    sub = payload.get("sub", "")
+    exp = payload.get("exp")
+    if exp is not None:
+        cache_token.simpan(kunci, sub, float(exp))
+    return sub
+
+
+def cek_login(db: Session, username: str, password: str) -> bool:
+    """Cocokkan username/password dengan tabel admin.
+
+    Hash password admin disimpan sebentar (AUTH_CACHE_DETIK) di cache yang sama
+    jenisnya dengan cache token, jadi login berulang tidak selalu query DB.
+    Username yang tidak ada tidak di-cache.
+    """
+    sha_db = cache_admin.ambil(username)
+    if sha_db is None:
+        row = db.execute(
+            text("SELECT password_sha FROM admin WHERE username=:u LIMIT 1"),
+            {"u": username}
+        ).mappings().first()
+        if not row:
+            return False
+        sha_db = row["password_sha"]
+        cache_admin.simpan(username, sha_db, time.time() + settings.AUTH_CACHE_DETIK)
+
+    sha = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    return hmac.compare_digest(sha, sha_db)
+
+
+def statistik_cache() -> dict:
+    return {"token": cache_token.ke_dict(), "login": cache_admin.ke_dict()}
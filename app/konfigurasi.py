@@ -10,10 +10,92 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER", "root")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "")
 
+    # DB_ASYNC=1: handler publik/diagnosa/admin jadi `async def` di atas AsyncEngine
+    # (driver asyncio, default aiomysql) alih-alih threadpool + PyMySQL; yang memblokir
+    # (login, perubahan basis, export, store sesi memori/redis) tetap di threadpool
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+    DB_ASYNC_DRIVER: str = os.getenv("DB_ASYNC_DRIVER", "aiomysql")
+
+    # Connection pool (per proses/worker): total koneksi maks = POOL_SIZE + MAX_OVERFLOW
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    # pre-ping = 1 round-trip ekstra tiap checkout; bisa dimatikan kalau POOL_RECYCLE < wait_timeout MySQL
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+    # LIFO: koneksi yang baru dipakai dipakai lagi, sisanya bisa di-recycle saat sepi
+    DB_POOL_LIFO: bool = os.getenv("DB_POOL_LIFO", "0").lower() in ("1", "true", "yes")
+
+    # Admission control per worker: slot request konkuren per grup route, sisanya menunggu
+    # di antrean terbatas (per grup) lalu 503 + Retry-After kalau penuh / kelamaan.
+    # Jumlah slot sebaiknya <= DB_POOL_SIZE + DB_MAX_OVERFLOW.
+    ADMISI: bool = os.getenv("ADMISI", "1").lower() in ("1", "true", "yes")
+    ADMISI_DIAGNOSA: int = int(os.getenv("ADMISI_DIAGNOSA", "8"))
+    ADMISI_PUBLIK: int = int(os.getenv("ADMISI_PUBLIK", "4"))
+    ADMISI_ADMIN: int = int(os.getenv("ADMISI_ADMIN", "3"))
+    ADMISI_ANTREAN: int = int(os.getenv("ADMISI_ANTREAN", "32"))
+    ADMISI_TUNGGU_DETIK: float = float(os.getenv("ADMISI_TUNGGU_DETIK", "2"))
+    ADMISI_RETRY_AFTER: int = int(os.getenv("ADMISI_RETRY_AFTER", "1"))
+    # Token bucket per IP klien untuk grup diagnosa & publik (0 = mati). Hati-hati kalau
+    # banyak pasien keluar lewat satu IP (NAT klinik); di belakang proxy pakai --proxy-headers.
+    RATE_PER_DETIK: float = float(os.getenv("RATE_PER_DETIK", "0"))
+    RATE_BURST: int = int(os.getenv("RATE_BURST", "20"))
+    RATE_MAKS_KLIEN: int = int(os.getenv("RATE_MAKS_KLIEN", "10000"))
+
+    # Pemanasan saat startup: koneksi pool yang dibuka lebih dulu (maks DB_POOL_SIZE,
+    # 0 = tidak), dan jeda sebelum pemanasan diulang kalau DB belum bisa dihubungi
+    WARMUP_KONEKSI: int = int(os.getenv("WARMUP_KONEKSI", str(DB_POOL_SIZE)))
+    WARMUP_ULANG_DETIK: float = float(os.getenv("WARMUP_ULANG_DETIK", "5"))
+
+    # Query yang lebih lama dari ini (ms) dicatat ke log sebagai warning (0 = mati)
+    DB_QUERY_LAMBAT_MS: float = float(os.getenv("DB_QUERY_LAMBAT_MS", "200"))
+    # Header Server-Timing (jumlah & waktu query DB per request) di setiap response
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "1").lower() in ("1", "true", "yes")
+    # Bearer token untuk scrape /metrics (kosong = terbuka)
+    METRIK_TOKEN: str = os.getenv("METRIK_TOKEN", "")
+
     ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
     ADMIN_PASSWORD: str = os.getenv("ADMIN_PASSWORD", "admin123")
 
     JWT_SECRET: str = os.getenv("JWT_SECRET", "ubah-ini-ya")
     JWT_EXPIRE_MINUTES: int = int(os.getenv("JWT_EXPIRE_MINUTES", "720"))
+    # Jumlah token terverifikasi yang di-cache (0 = verifikasi HMAC di setiap request)
+    JWT_CACHE_MAKS: int = int(os.getenv("JWT_CACHE_MAKS", "1024"))
+    # Lama (detik) hash password admin di-cache untuk login (0 = selalu query DB)
+    AUTH_CACHE_DETIK: float = float(os.getenv("AUTH_CACHE_DETIK", "60"))
+
+    # Cache-Control max-age (detik) untuk katalog publik; klien tetap revalidasi pakai ETag
+    KATALOG_MAX_AGE: int = int(os.getenv("KATALOG_MAX_AGE", "0"))
+
+    # Jumlah baris per INSERT multi-row saat import basis pengetahuan
+    IMPORT_CHUNK: int = int(os.getenv("IMPORT_CHUNK", "1000"))
+
+    # Batas jumlah kasus per request /api/diagnosa/batch
+    BATCH_MAX_KASUS: int = int(os.getenv("BATCH_MAX_KASUS", "5000"))
+
+    # Sesi diagnosa "aktif" lebih tua dari TTL dianggap ditinggalkan (0 = tanpa batas)
+    SESI_TTL_MENIT: int = int(os.getenv("SESI_TTL_MENIT", "60"))
+    # Interval task pembersihan (detik) & jumlah sesi yang dihapus per transaksi
+    SESI_PURGE_INTERVAL: float = float(os.getenv("SESI_PURGE_INTERVAL", "300"))
+    SESI_PURGE_BATCH: int = int(os.getenv("SESI_PURGE_BATCH", "500"))
+
+    # Profil jawaban pasien: sesi baru dengan `profil` yang sama memakai ulang jawaban
+    # gejala dari sesi profil itu yang dibuat dalam jendela ini (0 = fitur mati)
+    PROFIL_TTL_MENIT: int = int(os.getenv("PROFIL_TTL_MENIT", "60"))
+
+    # Snapshot basis pengetahuan antar worker: versi di tabel kb_version dicek paling
+    # lama tiap KB_CEK_DETIK (batas basi snapshot; 0 = tidak dicek, cocok untuk 1 worker).
+    # KB_NOTIFIER=redis mendorong versi baru lewat pub/sub supaya worker lain langsung
+    # memuat ulang; poll tetap jalan sebagai cadangan. lokal = stand-in dalam proses.
+    KB_CEK_DETIK: float = float(os.getenv("KB_CEK_DETIK", "2"))
+    KB_NOTIFIER: str = os.getenv("KB_NOTIFIER", "poll").lower()  # poll|lokal|redis
+    KB_REDIS_URL: str = os.getenv("KB_REDIS_URL", os.getenv("SESI_REDIS_URL", "redis://127.0.0.1:6379/0"))
+    KB_REDIS_KANAL: str = os.getenv("KB_REDIS_KANAL", "kb_version")
+
+    # Penyimpanan state sesi aktif: mysql | memori (LRU satu proses) | redis
+    SESI_STORE: str = os.getenv("SESI_STORE", "mysql").lower()
+    SESI_MEMORI_MAKS: int = int(os.getenv("SESI_MEMORI_MAKS", "10000"))
+    SESI_REDIS_URL: str = os.getenv("SESI_REDIS_URL", "redis://127.0.0.1:6379/0")
+    SESI_REDIS_PREFIX: str = os.getenv("SESI_REDIS_PREFIX", "sesi:")
 
 settings = Settings()
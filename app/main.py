@@ -1,3 +1,10 @@
+import time
+
+_MULAI_IMPOR = time.perf_counter()  # awal fase "impor" di log startup
+
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -7,21 +14,57 @@ from .routers.auth import router as auth_router
 from .routers.publik import router as publik_router
 from .routers.diagnosa import router as diagnosa_router
 from .routers.admin import router as admin_router
+from .routers.metrik import router as metrik_router
+from .routers.kesehatan import router as kesehatan_router
+from .admisi import MiddlewareAdmisi
+from .instrumentasi import MiddlewareQuery
+from .konfigurasi import settings
+from .pemanasan import panaskan
+from .pengetahuan import pemberitahu
+from .sesi import loop_purge
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # task pembersihan sesi diagnosa yang ditinggalkan (lihat sesi.py)
+    task = asyncio.create_task(loop_purge()) if settings.SESI_TTL_MENIT > 0 else None
+    # langganan versi basis pengetahuan dari worker lain (KB_NOTIFIER)
+    pemberitahu.mulai()
+    # pemanasan jalan di belakang: /healthz langsung menjawab, /readyz menunggu selesai
+    hangat = asyncio.create_task(panaskan(app, _MULAI_IMPOR))
+    yield
+    hangat.cancel()
+    pemberitahu.berhenti()
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
 
-app = FastAPI(title="Sistem Pakar Diagnosa Tidur", version="3.0.0")
+app = FastAPI(title="Sistem Pakar Diagnosa Tidur", version="3.0.0", lifespan=lifespan)
 
+# batas request konkuren per grup route (lihat admisi.py); dipasang di dalam CORS
+# supaya response 503/429 tetap membawa header CORS
+app.add_middleware(MiddlewareAdmisi)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
+# jumlah & waktu query DB per request -> Server-Timing + /metrics
+app.add_middleware(MiddlewareQuery)
 
 app.include_router(auth_router)
 app.include_router(publik_router)
 app.include_router(diagnosa_router)
 app.include_router(admin_router)
+app.include_router(metrik_router)
+app.include_router(kesehatan_router)
 
 # Serve frontend (satu domain biar simpel)
 frontend_dir = Path(__file__).resolve().parent.parent / "frontend"
@@ -1,65 +1,190 @@
+from typing import Iterable, NamedTuple, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import select
-from .model import Penyakit, Gejala, Aturan, Solusi, SesiDiagnosa, JawabanDiagnosa, RiwayatDiagnosa
+from .db import upsert
+from .model import JawabanDiagnosa, RiwayatDiagnosa
+from .pengetahuan import BasisPengetahuan, InfoSolusi
+from . import statistik
+from .sesi import DataSesi, penyimpanan
 
-def daftar_gejala_untuk_penyakit(db: Session, kode_penyakit: str) -> list[str]:
-    rows = db.scalars(
-        select(Aturan).where(Aturan.kode_penyakit == kode_penyakit).order_by(Aturan.urutan)
-    ).all()
-    return [r.kode_gejala for r in rows]
+# Basis pengetahuan dibaca dari snapshot di memori (lihat pengetahuan.py) yang
+# diambil sekali per request oleh router lalu diteruskan ke sini, supaya satu
+# request tidak mencampur dua versi snapshot; state sesi dari penyimpanan sesi
+# (lihat sesi.py), DB untuk riwayat. Jawaban yang diberikan ke
+# langkah_berikutnya sudah termasuk jawaban sesi lain di profil pasien yang
+# sama, jadi gejala itu dianggap terjawab dan tidak ditanya.
+#
+# Forward chaining dikerjakan dengan bitset: jawaban sesi jadi dua masker
+# (ya & tidak) atas semesta gejala, lalu tiap penyakit cukup dicek dengan
+# operasi AND terhadap masker premisnya. Mode "tunggal" (penyakit yang dipilih
+# user) hanyalah mode "semua" dengan satu kandidat.
+
+class Langkah(NamedTuple):
+    status: str  # tanya|selesai|tidak_terpenuhi
+    data: object  # pertanyaan (dict) / InfoPenyakit / None
+    progres: dict
+    kandidat: dict[str, str]  # kode_penyakit -> terbukti|mungkin (yang gugur tidak ikut)
+
+def daftar_gejala_untuk_penyakit(basis: BasisPengetahuan, kode_penyakit: str) -> tuple[str, ...]:
+    return basis.premis.get(kode_penyakit, ())
 
-def teks_gejala(db: Session, kode_gejala: str) -> str:
-    g = db.get(Gejala, kode_gejala)
-    return g.nama if g else kode_gejala
+def teks_gejala(basis: BasisPengetahuan, kode_gejala: str) -> str:
+    return basis.gejala.get(kode_gejala, kode_gejala)
 
 def peta_jawaban(db: Session, sesi_id: str) -> dict[str, bool]:
-    rows = db.scalars(select(JawabanDiagnosa).where(JawabanDiagnosa.sesi_id == sesi_id)).all()
-    return {r.kode_gejala: bool(r.jawaban) for r in rows}
+    rows = db.execute(
+        select(JawabanDiagnosa.kode_gejala, JawabanDiagnosa.jawaban).where(JawabanDiagnosa.sesi_id == sesi_id)
+    ).all()
+    return {k: bool(v) for k, v in rows}
 
-def progres(db: Session, sesi: SesiDiagnosa) -> dict:
-    req = daftar_gejala_untuk_penyakit(db, sesi.kode_penyakit)
-    ans = peta_jawaban(db, sesi.id)
+def progres(req: tuple[str, ...], ans: dict[str, bool]) -> dict:
     ditanya = sum(1 for k in req if k in ans)
     total = max(len(req), 1)
     return {"ditanya": ditanya, "total": total}
 
-def solusi_penyakit(db: Session, kode_penyakit: str) -> list[Solusi]:
-    return list(db.scalars(
-        select(Solusi).where(Solusi.kode_penyakit == kode_penyakit).order_by(Solusi.urutan)
-    ).all())
-
-def langkah_berikutnya(db: Session, sesi: SesiDiagnosa):
-    req = daftar_gejala_untuk_penyakit(db, sesi.kode_penyakit)
-    ans = peta_jawaban(db, sesi.id)
-    pr = progres(db, sesi)
-
-    # kalau ada jawaban "Tidak" di salah satu gejala premis, rule gagal
-    for k in req:
-        if k in ans and ans[k] is False:
-            return ("tidak_terpenuhi", None, pr)
-
-    # tanya gejala yg belum ditanya
-    for k in req:
-        if k not in ans:
-            return ("tanya", {"kode_gejala": k, "teks": teks_gejala(db, k)}, pr)
-
-    # semua Ya -> terbukti
-    penyakit = db.get(Penyakit, sesi.kode_penyakit)
-    return ("selesai", penyakit, pr)
-
-def simpan_riwayat(db: Session, sesi: SesiDiagnosa, status: str, pesan: str):
-    p = db.get(Penyakit, sesi.kode_penyakit)
-    h = RiwayatDiagnosa(
+def solusi_penyakit(basis: BasisPengetahuan, kode_penyakit: str) -> tuple[InfoSolusi, ...]:
+    return basis.solusi.get(kode_penyakit, ())
+
+def masker_jawaban(basis: BasisPengetahuan, ans: dict[str, bool]) -> tuple[int, int]:
+    """Ubah peta jawaban jadi pasangan bitmask (ya, tidak)."""
+    ya = tidak = 0
+    bit = basis.bit_gejala
+    for k, v in ans.items():
+        if v:
+            ya |= bit.get(k, 0)
+        else:
+            tidak |= bit.get(k, 0)
+    return ya, tidak
+
+def evaluasi(basis: BasisPengetahuan, ya: int, tidak: int, kandidat: Iterable[str]) -> tuple[list[str], list[str]]:
+    """Pisahkan kandidat jadi (terbukti, mungkin) dalam satu lintasan.
+
+    Penyakit gugur kalau ada premis yang dijawab "Tidak", terbukti kalau semua
+    premis sudah "Ya". Penyakit tanpa aturan tidak pernah bisa terbukti.
+    """
+    terbukti, mungkin = [], []
+    mp = basis.masker_premis
+    for kp in kandidat:
+        m = mp.get(kp, 0)
+        if not m or m & tidak:
+            continue
+        if m & ya == m:
+            terbukti.append(kp)
+        else:
+            mungkin.append(kp)
+    return terbukti, mungkin
+
+def kandidat_sesi(basis: BasisPengetahuan, sesi: DataSesi) -> tuple[str, ...]:
+    if sesi.mode == "semua":
+        return tuple(basis.masker_premis)
+    return (sesi.kode_penyakit,)
+
+def gejala_belum_dijawab(basis: BasisPengetahuan, kode_penyakit: str, dijawab: int) -> Optional[str]:
+    bit = basis.bit_gejala
+    for k in basis.premis.get(kode_penyakit, ()):
+        if not bit[k] & dijawab:
+            return k
+    return None
+
+def pilih_gejala_informasi(basis: BasisPengetahuan, mungkin: list[str], dijawab: int) -> Optional[str]:
+    """Pilih gejala yang memaksimalkan perkiraan jumlah kandidat yang gugur.
+
+    Dengan n kandidat dan c di antaranya memakai gejala g, jawaban "Tidak"
+    (peluang (n-c)/n) menggugurkan c kandidat, jadi harapannya c*(n-c)/n; n sama
+    untuk semua gejala, jadi yang dibandingkan cukup c*(n-c). c dihitung dengan
+    popcount masker pemakai gejala (dikompilasi per versi snapshot) terhadap
+    masker kandidat; seri dipecah oleh urutan kode gejala. Kalau tidak ada
+    gejala yang membelah kandidat (mis. tinggal satu penyakit), tanya premis
+    kandidat pertama mulai dari gejala yang paling spesifik.
+    """
+    n = len(mungkin)
+    bit_penyakit, masker_premis = basis.bit_penyakit, basis.masker_premis
+    kandidat = sisa = 0
+    for kp in mungkin:
+        kandidat |= bit_penyakit[kp]
+        sisa |= masker_premis[kp]
+    sisa &= ~dijawab
+
+    pemakai, kode = basis.masker_pemakai, basis.urutan_gejala
+    terbaik, skor_terbaik = None, 0
+    while sisa:
+        bit = sisa & -sisa
+        sisa ^= bit
+        kg = kode[bit.bit_length() - 1]
+        c = (pemakai[kg] & kandidat).bit_count()
+        skor = c * (n - c)
+        if skor > skor_terbaik:
+            terbaik, skor_terbaik = kg, skor
+    if terbaik is not None:
+        return terbaik
+
+    bit = basis.bit_gejala
+    for kg in basis.premis_spesifik[mungkin[0]]:
+        if not bit[kg] & dijawab:
+            return kg
+    return None
+
+def langkah_berikutnya(db: Session, basis: BasisPengetahuan, sesi: DataSesi, jawaban: Optional[dict[str, bool]] = None) -> Langkah:
+    # default: jawaban dari penyimpanan sesi, sudah digabung dengan jawaban profil
+    ans = penyimpanan.jawaban(db, sesi) if jawaban is None else jawaban
+    ya, tidak = masker_jawaban(basis, ans)
+    dijawab = ya | tidak
+    terbukti, mungkin = evaluasi(basis, ya, tidak, kandidat_sesi(basis, sesi))
+
+    if sesi.mode == "semua":
+        sisa = 0
+        for kp in mungkin:
+            sisa |= basis.masker_premis[kp]
+        ditanya = len(ans)
+        pr = {"ditanya": ditanya, "total": max(ditanya + (sisa & ~dijawab).bit_count(), 1)}
+    else:
+        pr = progres(daftar_gejala_untuk_penyakit(basis, sesi.kode_penyakit), ans)
+
+    kandidat = {kp: "terbukti" for kp in terbukti}
+    kandidat.update((kp, "mungkin") for kp in mungkin)
+
+    # masih ada penyakit yang belum pasti -> tanya gejala berikutnya
+    if mungkin:
+        if sesi.strategi == "informasi":
+            k = pilih_gejala_informasi(basis, mungkin, dijawab)
+        else:
+            k = gejala_belum_dijawab(basis, mungkin[0], dijawab)
+        return Langkah("tanya", {"kode_gejala": k, "teks": teks_gejala(basis, k)}, pr, kandidat)
+
+    if terbukti:
+        return Langkah("selesai", basis.penyakit.get(terbukti[0]), pr, kandidat)
+
+    return Langkah("tidak_terpenuhi", None, pr, kandidat)
+
+def baris_riwayat(basis: BasisPengetahuan, sesi: DataSesi, status: str, pesan: str, kode_penyakit: Optional[str] = None) -> dict:
+    kode = kode_penyakit or sesi.kode_penyakit
+    p = basis.penyakit.get(kode) if kode else None
+    return dict(
         sesi_id=sesi.id,
         nama=sesi.nama,
         umur=sesi.umur,
         jk=sesi.jk,
         alamat=sesi.alamat,
         status=status,
-        kode_penyakit=p.kode if p else sesi.kode_penyakit,
-        nama_penyakit=p.nama if p else sesi.kode_penyakit,
+        kode_penyakit=p.kode if p else (kode or "-"),
+        nama_penyakit=p.nama if p else (kode or "-"),
         pesan=pesan
     )
+
+def simpan_jawaban(db: Session, sesi_id: str, kode_gejala: str, jawaban: bool) -> None:
+    """Upsert satu jawaban lewat uq_sesi_gejala (belum di-commit)."""
+    upsert(
+        db, JawabanDiagnosa,
+        {"sesi_id": sesi_id, "kode_gejala": kode_gejala, "jawaban": jawaban},
+        kunci=["sesi_id", "kode_gejala"],
+        ubah={"jawaban": jawaban},
+    )
+
+def simpan_riwayat(db: Session, basis: BasisPengetahuan, sesi: DataSesi, status: str, pesan: str, kode_penyakit: Optional[str] = None):
+    """Tambahkan baris riwayat (dan counter statistiknya) ke transaksi yang sedang jalan;
+    commit dilakukan pemanggil."""
+    baris = baris_riwayat(basis, sesi, status, pesan, kode_penyakit)
+    statistik.catat(db, (baris,))
+    h = RiwayatDiagnosa(**baris)
     db.add(h)
-    db.commit()
     return h
@@ -0,0 +1,78 @@
+"""Metrik sederhana di memori proses (counter & histogram) untuk endpoint observabilitas."""
+import threading
+
+# batas bucket default dalam detik
+BUCKET_DETIK = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus (`le` = batas atas bucket)."""
+
+    def __init__(self, batas: tuple[float, ...] = BUCKET_DETIK):
+        self.batas = tuple(batas)
+        self._isi = [0] * (len(self.batas) + 1)  # bucket terakhir = +Inf
+        self._jumlah = 0.0
+        self._n = 0
+        self._kunci = threading.Lock()
+
+    def amati(self, nilai: float) -> None:
+        i = 0
+        for b in self.batas:
+            if nilai <= b:
+                break
+            i += 1
+        with self._kunci:
+            self._isi[i] += 1
+            self._jumlah += nilai
+            self._n += 1
+
+    def ke_dict(self) -> dict:
+        with self._kunci:
+            isi, jumlah, n = list(self._isi), self._jumlah, self._n
+        kumulatif, total = {}, 0
+        for b, c in zip(self.batas + (float("inf"),), isi):
+            total += c
+            kumulatif["+Inf" if b == float("inf") else str(b)] = total
+        return {"count": n, "sum": round(jumlah, 6), "buckets": kumulatif}
+
+
+class Counter:
+    def __init__(self):
+        self._nilai = 0
+        self._kunci = threading.Lock()
+
+    def tambah(self, n: int = 1) -> None:
+        with self._kunci:
+            self._nilai += n
+
+    @property
+    def nilai(self) -> int:
+        return self._nilai
+
+
+def _label(label: dict[str, str]) -> str:
+    return ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in label.items())
+
+
+def prometheus_histogram(nama: str, bantuan: str, seri: list[tuple[dict[str, str], Histogram]]) -> list[str]:
+    """Baris format teks Prometheus untuk satu histogram dengan banyak kombinasi label."""
+    baris = [f"# HELP {nama} {bantuan}", f"# TYPE {nama} histogram"]
+    for label, h in seri:
+        d, lb = h.ke_dict(), _label(label)
+        for le, n in d["buckets"].items():
+            baris.append(f'{nama}_bucket{{{_label({**label, "le": le})}}} {n}')
+        baris.append(f"{nama}_sum{{{lb}}} {d['sum']}")
+        baris.append(f"{nama}_count{{{lb}}} {d['count']}")
+    return baris
+
+
+def prometheus_counter(nama: str, bantuan: str, seri: list[tuple[dict[str, str], Counter]]) -> list[str]:
+    baris = [f"# HELP {nama} {bantuan}", f"# TYPE {nama} counter"]
+    baris += [f"{nama}{{{_label(label)}}} {c.nilai}" for label, c in seri]
+    return baris
+
+
+def prometheus_gauge(nama: str, bantuan: str, seri: list[tuple[dict[str, str], float]]) -> list[str]:
+    baris = [f"# HELP {nama} {bantuan}", f"# TYPE {nama} gauge"]
+    baris += [f"{nama}{{{_label(label)}}} {nilai}" for label, nilai in seri]
+    return baris
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Text, Integer, DateTime, Boolean, ForeignKey, UniqueConstraint, func
+from sqlalchemy import String, Text, Integer, Float, Date, DateTime, Boolean, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
 
@@ -11,8 +11,8 @@ class Penyakit(Base):
     created_at: Mapped[object] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[object] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
-    aturan: Mapped[list["Aturan"]] = relationship(back_populates="penyakit", cascade="all, delete-orphan")
-    solusi: Mapped[list["Solusi"]] = relationship(back_populates="penyakit", cascade="all, delete-orphan")
+    aturan: Mapped[list["Aturan"]] = relationship(back_populates="penyakit", cascade="all, delete-orphan", order_by="Aturan.urutan")
+    solusi: Mapped[list["Solusi"]] = relationship(back_populates="penyakit", cascade="all, delete-orphan", order_by="Solusi.urutan")
 
 class Gejala(Base):
     __tablename__ = "gejala"
@@ -28,21 +28,42 @@ class Aturan(Base):
     kode_penyakit: Mapped[str] = mapped_column(String(3), ForeignKey("penyakit.kode", ondelete="CASCADE"), nullable=False)
     kode_gejala: Mapped[str] = mapped_column(String(5), ForeignKey("gejala.kode", ondelete="CASCADE"), nullable=False)
     urutan: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # bobot / certainty factor premis (0..1] untuk diagnosa berperingkat; forward chaining mengabaikannya
+    bobot: Mapped[float] = mapped_column(Float, nullable=False, default=1.0, server_default="1")
 
-    __table_args__ = (UniqueConstraint("kode_penyakit", "kode_gejala", name="uq_aturan"),)
+    __table_args__ = (
+        UniqueConstraint("kode_penyakit", "kode_gejala", name="uq_aturan"),
+        Index("ix_aturan_penyakit_urutan", "kode_penyakit", "urutan"),
+    )
 
     penyakit: Mapped["Penyakit"] = relationship(back_populates="aturan")
     gejala: Mapped["Gejala"] = relationship(back_populates="aturan")
 
 class Solusi(Base):
     __tablename__ = "solusi"
-    kode: Mapped[str] = mapped_column(String(3), primary_key=True)  # S01 dst
+    kode: Mapped[str] = mapped_column(String(10), primary_key=True)  # S01 .. S99, S100, ...
     kode_penyakit: Mapped[str] = mapped_column(String(3), ForeignKey("penyakit.kode", ondelete="CASCADE"), nullable=False)
     deskripsi: Mapped[str] = mapped_column(Text, nullable=False)
     urutan: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
+    __table_args__ = (Index("ix_solusi_penyakit_urutan", "kode_penyakit", "urutan"),)
+
     penyakit: Mapped["Penyakit"] = relationship(back_populates="solusi")
 
+class NomorUrut(Base):
+    """Counter penomoran kode (mis. solusi S01, S02, ...) supaya tidak perlu scan tabel."""
+    __tablename__ = "nomor_urut"
+    nama: Mapped[str] = mapped_column(String(30), primary_key=True)
+    nilai: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+class VersiBasis(Base):
+    """Satu baris (id=1) berisi versi basis pengetahuan; dinaikkan di transaksi yang sama
+    dengan setiap perubahan admin supaya worker lain tahu snapshot-nya basi."""
+    __tablename__ = "kb_version"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    versi: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    diubah_pada: Mapped[object] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
 class SesiDiagnosa(Base):
     __tablename__ = "sesi_diagnosa"
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
@@ -50,11 +71,21 @@ class SesiDiagnosa(Base):
     umur: Mapped[int] = mapped_column(Integer, nullable=False)
     jk: Mapped[str] = mapped_column(String(20), nullable=False)
     alamat: Mapped[str] = mapped_column(Text, nullable=False)
-    kode_penyakit: Mapped[str] = mapped_column(String(3), ForeignKey("penyakit.kode", ondelete="RESTRICT"), nullable=False)
+    kode_penyakit: Mapped[str] = mapped_column(String(3), ForeignKey("penyakit.kode", ondelete="RESTRICT"), nullable=True)  # kosong kalau mode=semua
+    mode: Mapped[str] = mapped_column(String(20), nullable=False, default="tunggal")  # tunggal|semua
+    strategi: Mapped[str] = mapped_column(String(20), nullable=False, default="urutan")  # urutan|informasi
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="aktif")  # aktif|selesai|tidak_terpenuhi
+    # profil jawaban pasien: sesi dengan profil sama saling memakai jawaban gejala
+    profil_id: Mapped[str] = mapped_column(String(36), nullable=True)
     created_at: Mapped[object] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[object] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_sesi_status_created", "status", "created_at"),
+        Index("ix_sesi_created", "created_at"),  # laporan peringkat sesi terbaru
+        Index("ix_sesi_profil", "profil_id", "created_at"),  # jawaban profil dalam jendela TTL
+    )
+
     jawaban: Mapped[list["JawabanDiagnosa"]] = relationship(back_populates="sesi", cascade="all, delete-orphan")
 
 class JawabanDiagnosa(Base):
@@ -82,3 +113,21 @@ class RiwayatDiagnosa(Base):
     nama_penyakit: Mapped[str] = mapped_column(String(120), nullable=False)
     pesan: Mapped[str] = mapped_column(Text, nullable=True)
     created_at: Mapped[object] = mapped_column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_riwayat_created", "created_at"),
+        Index("ix_riwayat_penyakit_status", "kode_penyakit", "status"),
+    )
+
+class StatistikDiagnosa(Base):
+    """Counter riwayat per (tanggal, penyakit, status, jk, kelompok umur), dinaikkan
+    di transaksi yang sama dengan insert riwayat; dashboard cukup menjumlah bucket."""
+    __tablename__ = "statistik_diagnosa"
+    tanggal: Mapped[object] = mapped_column(Date, primary_key=True)
+    kode_penyakit: Mapped[str] = mapped_column(String(3), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    jk: Mapped[str] = mapped_column(String(20), primary_key=True)
+    kelompok_umur: Mapped[str] = mapped_column(String(10), primary_key=True)
+    jumlah: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_statistik_penyakit_status", "kode_penyakit", "status"),)
@@ -0,0 +1,118 @@
+"""Pemanasan worker saat startup dan status kesiapan untuk /readyz.
+
+Tanpa pemanasan, request pertama setelah deploy ikut membayar koneksi pool
+yang dibuka malas-malasan, konfigurasi mapper ORM, kompilasi snapshot basis
+pengetahuan, dan pembuatan skema OpenAPI / potongan JSON. Pemanasan dijalankan
+sebagai task dari lifespan app: /healthz sudah menjawab selama pemanasan,
+sedangkan /readyz baru 200 setelah semua fase selesai, jadi orchestrator hanya
+mengirim traffic ke worker yang sudah hangat. Kalau DB belum bisa dihubungi,
+pemanasan diulang tiap WARMUP_ULANG_DETIK.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+from sqlalchemy.orm import configure_mappers
+
+from .db import SessionLocal, async_engine, engine
+from .konfigurasi import settings
+from .pengetahuan import muat_ulang
+from .respon import fragmen_penyakit
+from .routers.publik import katalog_gejala, katalog_penyakit
+
+log = logging.getLogger(__name__)
+
+
+class StatusPemanasan:
+    def __init__(self):
+        self.siap = False
+        self.fase: dict[str, float] = {}  # fase -> ms (fase terakhir yang berhasil)
+        self.percobaan = 0
+        self.galat: Optional[str] = None
+
+    def ke_dict(self) -> dict:
+        return {"siap": self.siap, "fase_ms": dict(self.fase), "percobaan": self.percobaan, "galat": self.galat}
+
+
+status = StatusPemanasan()
+
+
+@contextmanager
+def _ukur(fase: str):
+    t = time.perf_counter()
+    yield
+    ms = (time.perf_counter() - t) * 1000
+    status.fase[fase] = round(ms, 1)
+    log.info("startup %s: %.1f ms", fase, ms)
+
+
+def buka_koneksi(n: int) -> int:
+    """Checkout n koneksi sekaligus lalu kembalikan, supaya pool sudah berisi koneksi siap pakai."""
+    n = min(n, settings.DB_POOL_SIZE)
+    koneksi = []
+    try:
+        for _ in range(n):
+            koneksi.append(engine.connect())
+    finally:
+        for k in koneksi:
+            k.close()
+    return n
+
+
+async def buka_koneksi_async(n: int) -> int:
+    n = min(n, settings.DB_POOL_SIZE)
+    koneksi = []
+    try:
+        for _ in range(n):
+            koneksi.append(await async_engine.connect())
+    finally:
+        for k in koneksi:
+            await k.close()
+    return n
+
+
+def siapkan_skema(app: FastAPI) -> None:
+    # mapper ORM & skema OpenAPI biasanya baru dibangun di query / hit /docs pertama
+    configure_mappers()
+    app.openapi()
+
+
+def panaskan_basis() -> None:
+    """Muat snapshot basis pengetahuan beserta body katalog & potongan JSON per penyakit."""
+    with SessionLocal() as db:
+        basis = muat_ulang(db)
+    katalog_penyakit(basis)
+    katalog_gejala(basis)
+    for kode in basis.penyakit:
+        fragmen_penyakit(basis, kode)
+
+
+async def panaskan(app: FastAPI, mulai: float) -> None:
+    """Jalankan semua fase sampai berhasil; `mulai` = perf_counter saat modul app mulai diimpor."""
+    status.fase["impor"] = round((time.perf_counter() - mulai) * 1000, 1)
+    log.info("startup impor: %.1f ms", status.fase["impor"])
+    while True:
+        status.percobaan += 1
+        try:
+            if settings.WARMUP_KONEKSI > 0:
+                with _ukur("koneksi"):
+                    await asyncio.to_thread(buka_koneksi, settings.WARMUP_KONEKSI)
+                    if async_engine is not None:
+                        await buka_koneksi_async(settings.WARMUP_KONEKSI)
+            with _ukur("skema"):
+                siapkan_skema(app)
+            with _ukur("basis"):
+                await asyncio.to_thread(panaskan_basis)
+            break
+        except Exception as e:
+            status.galat = f"{type(e).__name__}: {e}"
+            log.warning("pemanasan gagal (percobaan %d), diulang %.0f detik lagi: %s",
+                        status.percobaan, settings.WARMUP_ULANG_DETIK, status.galat)
+            await asyncio.sleep(settings.WARMUP_ULANG_DETIK)
+    status.galat = None
+    status.siap = True
+    status.fase["total"] = round((time.perf_counter() - mulai) * 1000, 1)
+    log.info("startup selesai, worker siap: %.1f ms sejak impor", status.fase["total"])
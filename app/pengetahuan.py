@@ -0,0 +1,341 @@
+"""Snapshot basis pengetahuan (penyakit, gejala, aturan, solusi) di memori proses.
+
+Snapshot dikompilasi sekali dari DB menjadi tuple/dict biasa dan tidak pernah
+diubah setelah dibuat. Kalau admin mengubah data, snapshot baru dibangun lalu
+ditukar sekaligus, jadi mesin inferensi tidak perlu query basis pengetahuan
+di setiap langkah diagnosa.
+
+Dengan beberapa worker, perubahan admin di satu proses harus sampai ke proses
+lain. Setiap perubahan admin menaikkan baris tabel kb_version di transaksi yang
+sama; `basis_aktif` mencocokkan versi itu dengan snapshot paling lama tiap
+KB_CEK_DETIK (satu query primary key, hanya satu thread yang mengecek), jadi
+snapshot basi paling lama sebatas interval itu. Notifier (KB_NOTIFIER) bisa
+mendorong versi baru supaya worker lain memuat ulang di request berikutnya
+tanpa menunggu interval cek.
+"""
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Iterable, Mapping, NamedTuple, Optional, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import upsert
+from .konfigurasi import settings
+from .metrik import Counter, Histogram, prometheus_counter, prometheus_gauge, prometheus_histogram
+from .model import Penyakit, Gejala, Aturan, Solusi, VersiBasis
+
+T = TypeVar("T")
+log = logging.getLogger(__name__)
+
+
+class InfoPenyakit(NamedTuple):
+    kode: str
+    nama: str
+    pengertian: Optional[str]
+    penyebab: Optional[str]
+
+
+class InfoSolusi(NamedTuple):
+    kode: str
+    deskripsi: str
+    urutan: int
+
+
+class BasisPengetahuan:
+    """Satu versi basis pengetahuan yang sudah dikompilasi (read-only)."""
+
+    __slots__ = (
+        "versi", "versi_db", "penyakit", "gejala", "premis", "bobot", "solusi",
+        "bit_gejala", "urutan_gejala", "masker_premis", "bit_penyakit", "masker_pemakai",
+        "premis_spesifik", "_memo",
+    )
+
+    def __init__(
+        self,
+        versi: int,
+        penyakit: Mapping[str, InfoPenyakit],
+        gejala: Mapping[str, str],
+        premis: Mapping[str, tuple[str, ...]],
+        solusi: Mapping[str, tuple[InfoSolusi, ...]],
+        bobot: Optional[Mapping[str, tuple[float, ...]]] = None,
+        versi_db: int = 0,
+    ):
+        self.versi = versi  # nomor snapshot di proses ini
+        self.versi_db = versi_db  # nilai kb_version saat snapshot dikompilasi
+        self._memo: dict = {}
+        self.penyakit = MappingProxyType(dict(penyakit))  # kode -> InfoPenyakit, urut kode
+        self.gejala = MappingProxyType(dict(gejala))  # kode -> teks gejala
+        self.premis = MappingProxyType(dict(premis))  # kode_penyakit -> kode gejala urut Aturan.urutan
+        # kode_penyakit -> Aturan.bobot sejajar dengan `premis` (default 1.0 semua)
+        self.bobot = MappingProxyType({
+            kp: tuple(bobot[kp]) if bobot and kp in bobot else (1.0,) * len(gs) for kp, gs in self.premis.items()
+        })
+        self.solusi = MappingProxyType(dict(solusi))  # kode_penyakit -> solusi urut Solusi.urutan
+
+        # Bitset untuk mesin forward chaining: tiap gejala dapat satu posisi bit,
+        # tiap penyakit disimpan sebagai masker gabungan gejala premisnya.
+        self.bit_gejala = MappingProxyType({k: 1 << i for i, k in enumerate(self.gejala)})
+        self.urutan_gejala = tuple(self.gejala)  # posisi bit -> kode gejala
+        self.masker_premis = MappingProxyType({
+            kp: self.masker(gs) for kp, gs in self.premis.items() if kp in self.penyakit
+        })
+
+        # Untuk strategi pertanyaan "informasi": tiap penyakit (yang punya aturan) juga
+        # dapat satu bit, dan tiap gejala disimpan sebagai masker penyakit yang memakainya.
+        # Jumlah kandidat yang memakai gejala g cukup popcount(masker_pemakai[g] & kandidat).
+        self.bit_penyakit = MappingProxyType({kp: 1 << i for i, kp in enumerate(self.masker_premis)})
+        pemakai: dict[str, int] = {}
+        for kp, b in self.bit_penyakit.items():
+            for kg in self.premis[kp]:
+                pemakai[kg] = pemakai.get(kg, 0) | b
+        self.masker_pemakai = MappingProxyType(pemakai)
+
+        # Premis tiap penyakit diurutkan dari gejala yang paling jarang dipakai penyakit
+        # lain (paling mungkin dijawab "Tidak"), urutan asli jadi pemecah seri.
+        self.premis_spesifik = MappingProxyType({
+            kp: tuple(sorted(self.premis[kp], key=lambda kg: pemakai[kg].bit_count())) for kp in self.masker_premis
+        })
+
+    def memo(self, kunci, buat: Callable[[], T]) -> T:
+        """Nilai turunan snapshot (mis. response JSON siap kirim), dihitung sekali per versi."""
+        try:
+            return self._memo[kunci]
+        except KeyError:
+            nilai = self._memo[kunci] = buat()
+            return nilai
+
+    def masker(self, kode_gejala: Iterable[str]) -> int:
+        """Gabungkan kode gejala jadi satu bitmask (kode yang tidak dikenal diabaikan)."""
+        m = 0
+        bit = self.bit_gejala
+        for k in kode_gejala:
+            m |= bit.get(k, 0)
+        return m
+
+
+def versi_db(db: Session) -> int:
+    return db.scalar(select(VersiBasis.versi).where(VersiBasis.id == 1)) or 0
+
+
+def naikkan_versi(db: Session) -> None:
+    """Naikkan kb_version di transaksi yang sedang jalan (commit dilakukan pemanggil)."""
+    upsert(db, VersiBasis, {"id": 1, "versi": 1}, kunci=["id"], ubah={"versi": VersiBasis.versi + 1})
+
+
+def kompilasi(db: Session, versi: int) -> BasisPengetahuan:
+    # versi dibaca lebih dulu: kalau data berubah di tengah kompilasi, snapshot
+    # tercatat dengan versi lama dan cek berikutnya memuat ulang lagi
+    vdb = versi_db(db)
+    penyakit = {
+        p.kode: InfoPenyakit(p.kode, p.nama, p.pengertian, p.penyebab)
+        for p in db.scalars(select(Penyakit).order_by(Penyakit.kode)).all()
+    }
+    gejala = {g.kode: g.nama for g in db.scalars(select(Gejala).order_by(Gejala.kode)).all()}
+
+    premis: dict[str, list[str]] = {k: [] for k in penyakit}
+    bobot: dict[str, list[float]] = {k: [] for k in penyakit}
+    for kp, kg, w in db.execute(
+        select(Aturan.kode_penyakit, Aturan.kode_gejala, Aturan.bobot)
+        .order_by(Aturan.kode_penyakit, Aturan.urutan, Aturan.id)
+    ).all():
+        premis.setdefault(kp, []).append(kg)
+        bobot.setdefault(kp, []).append(float(w))
+
+    solusi: dict[str, list[InfoSolusi]] = {k: [] for k in penyakit}
+    for s in db.scalars(select(Solusi).order_by(Solusi.kode_penyakit, Solusi.urutan, Solusi.kode)).all():
+        solusi.setdefault(s.kode_penyakit, []).append(InfoSolusi(s.kode, s.deskripsi, s.urutan))
+
+    return BasisPengetahuan(
+        versi=versi,
+        penyakit=penyakit,
+        gejala=gejala,
+        premis={k: tuple(v) for k, v in premis.items()},
+        solusi={k: tuple(v) for k, v in solusi.items()},
+        bobot=bobot,
+        versi_db=vdb,
+    )
+
+
+_kunci = threading.Lock()
+_basis: Optional[BasisPengetahuan] = None
+_versi = 0
+
+_kunci_cek = threading.Lock()
+_cek_terakhir = 0.0  # monotonic saat versi DB terakhir dipastikan sama dengan snapshot
+_diumumkan = 0  # versi terbaru yang diterima dari notifier
+_diumumkan_pada = 0.0
+
+# sebab muat ulang: awal|admin|poll|notifier
+_muat_ulang: dict[str, Counter] = {s: Counter() for s in ("awal", "admin", "poll", "notifier")}
+# lama snapshot basi sebelum dibuang: poll = sejak cek terakhir yang masih cocok
+# (batas atas), notifier = sejak pesan versi baru diterima
+_basi = Histogram()
+
+
+def muat_ulang(db: Session, sebab: str = "awal") -> BasisPengetahuan:
+    """Bangun snapshot baru dari DB lalu tukar snapshot aktif sekaligus.
+
+    Query dijalankan di luar kunci (kunci hanya untuk nomor versi & penukaran),
+    supaya aman juga dipakai dari AsyncSession.run_sync di event loop.
+    """
+    global _basis, _versi, _cek_terakhir
+    with _kunci:
+        _versi += 1
+        versi = _versi
+    baru = kompilasi(db, versi)
+    with _kunci:
+        if _basis is None or (_basis.versi < baru.versi and _basis.versi_db <= baru.versi_db):
+            _basis = baru
+            _cek_terakhir = time.monotonic()
+    _muat_ulang.setdefault(sebab, Counter()).tambah()
+    return baru
+
+
+def _segarkan(db: Session, b: BasisPengetahuan) -> BasisPengetahuan:
+    global _cek_terakhir
+    if not _kunci_cek.acquire(blocking=False):
+        return b  # thread lain sedang mengecek; snapshot ini dipakai dulu
+    try:
+        sekarang = time.monotonic()
+        if _diumumkan > b.versi_db:
+            _basi.amati(sekarang - _diumumkan_pada)
+            return muat_ulang(db, "notifier")
+        if versi_db(db) == b.versi_db:
+            _cek_terakhir = sekarang
+            return b
+        log.info("kb_version berubah di proses lain, snapshot versi %s dimuat ulang", b.versi_db)
+        _basi.amati(sekarang - _cek_terakhir)
+        return muat_ulang(db, "poll")
+    finally:
+        _kunci_cek.release()
+
+
+def perlu_disegarkan() -> bool:
+    """True kalau basis_aktif berikutnya akan query DB (membangun snapshot atau cek kb_version)."""
+    b = _basis
+    return b is None or _diumumkan > b.versi_db or 0 < settings.KB_CEK_DETIK <= time.monotonic() - _cek_terakhir
+
+
+def basis_aktif(db: Session) -> BasisPengetahuan:
+    """Snapshot yang sedang aktif; dibangun dari DB saat pertama kali dipakai dan
+    dimuat ulang kalau kb_version sudah berubah (lihat KB_CEK_DETIK)."""
+    b = _basis
+    if b is None:
+        return muat_ulang(db)
+    if perlu_disegarkan():
+        return _segarkan(db, b)
+    return b
+
+
+def terima_versi(versi: int) -> None:
+    """Dipanggil notifier: versi kb_version terbaru yang diumumkan worker lain."""
+    global _diumumkan, _diumumkan_pada
+    if versi > _diumumkan:
+        _diumumkan, _diumumkan_pada = versi, time.monotonic()
+
+
+class Pemberitahu:
+    """Penyebar versi basis pengetahuan ke worker lain. Dasar: tidak mengirim apa-apa (poll saja)."""
+
+    def kirim(self, versi: int) -> None:
+        pass
+
+    def mulai(self) -> None:
+        pass
+
+    def berhenti(self) -> None:
+        pass
+
+
+class PemberitahuLokal(Pemberitahu):
+    """Stand-in dalam proses (dev/uji tanpa broker): versi langsung diteruskan ke penerima."""
+
+    def kirim(self, versi):
+        terima_versi(versi)
+
+
+class PemberitahuRedis(Pemberitahu):
+    """Pub/sub di server berprotokol Redis; kalau broker putus, poll tetap jadi cadangan."""
+
+    def __init__(self, klien, kanal: str):
+        self.klien = klien
+        self.kanal = kanal
+        self._thread = None
+
+    def kirim(self, versi):
+        try:
+            self.klien.publish(self.kanal, str(versi))
+        except Exception:
+            log.warning("Gagal mengirim kb_version %s ke notifier", versi, exc_info=True)
+
+    def _terima(self, pesan) -> None:
+        try:
+            terima_versi(int(pesan["data"]))
+        except (TypeError, ValueError):
+            log.warning("Pesan kb_version tidak valid: %r", pesan.get("data"))
+
+    def _gagal(self, e, pubsub, thread) -> None:
+        log.warning("Koneksi notifier kb_version terputus: %s", e)
+        time.sleep(1.0)
+
+    def mulai(self):
+        try:
+            ps = self.klien.pubsub(ignore_subscribe_messages=True)
+            ps.subscribe(**{self.kanal: self._terima})
+            self._thread = ps.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=self._gagal)
+        except Exception:
+            log.warning("Notifier kb_version tidak aktif, hanya poll", exc_info=True)
+
+    def berhenti(self):
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+
+
+def buat_pemberitahu() -> Pemberitahu:
+    jenis = settings.KB_NOTIFIER
+    if jenis == "poll":
+        return Pemberitahu()
+    if jenis == "lokal":
+        return PemberitahuLokal()
+    if jenis == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("KB_NOTIFIER=redis butuh paket redis (uv sync --extra redis)") from e
+        return PemberitahuRedis(redis.Redis.from_url(settings.KB_REDIS_URL), settings.KB_REDIS_KANAL)
+    raise RuntimeError(f"KB_NOTIFIER tidak dikenal: {jenis!r} (poll|lokal|redis)")
+
+
+pemberitahu: Pemberitahu = buat_pemberitahu()
+
+
+def statistik_basis() -> dict:
+    b = _basis
+    return {
+        "versi": b.versi_db if b else None,
+        "snapshot": b.versi if b else None,
+        "notifier": settings.KB_NOTIFIER,
+        "cek_detik": settings.KB_CEK_DETIK,
+        "umur_cek_detik": round(time.monotonic() - _cek_terakhir, 3) if b else None,
+        "versi_diumumkan": _diumumkan,
+        "muat_ulang": {s: c.nilai for s, c in _muat_ulang.items()},
+        "basi_detik": _basi.ke_dict(),
+    }
+
+
+def prometheus_basis() -> list[str]:
+    b = _basis
+    return [
+        *prometheus_gauge("kb_version", "Versi kb_version snapshot basis pengetahuan di proses ini.",
+                          [({}, b.versi_db if b else 0)]),
+        *prometheus_gauge("kb_check_age_seconds", "Detik sejak versi snapshot terakhir dipastikan sama dengan DB.",
+                          [({}, round(time.monotonic() - _cek_terakhir, 3) if b else 0)]),
+        *prometheus_counter("kb_reloads_total", "Snapshot basis pengetahuan dimuat ulang, per sebab.",
+                            [({"reason": s}, c) for s, c in _muat_ulang.items()]),
+        *prometheus_histogram("kb_stale_seconds", "Lama snapshot basi sebelum dimuat ulang dari DB.",
+                              [({}, _basi)]),
+    ]
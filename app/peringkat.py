@@ -0,0 +1,116 @@
+"""Diagnosa diferensial berperingkat: semua penyakit diskor sekaligus dari jawaban (boleh sebagian).
+
+Berbeda dengan forward chaining di mesin.py (boolean: satu "Tidak" langsung
+menggugurkan penyakit), di sini tiap premis punya bobot `Aturan.bobot` (0..1]
+dan jawaban bernilai +1 (Ya), -1 (Tidak), 0 (belum dijawab). Untuk penyakit d
+dengan total bobot premis T_d:
+
+    keyakinan_d = max(0, sum_g W[d, g] * a[g]) / T_d
+    terjawab_d  = sum_g W[d, g] * |a[g]| / T_d
+
+Semua premis "Ya" memberi keyakinan 1.0, sama dengan "terbukti" di mesin
+boolean. Matriks W (penyakit x gejala) dikompilasi sekali per versi snapshot;
+dengan numpy (extra `numpy`) skor satu sesi adalah satu perkalian
+matriks-vektor dan banyak sesi sekaligus satu perkalian matriks. Tanpa numpy
+skor dihitung per premis dengan hasil yang sama.
+"""
+from typing import Iterable, NamedTuple
+
+from .pengetahuan import BasisPengetahuan
+
+try:
+    import numpy as np
+except ImportError:  # dependency opsional
+    np = None
+
+
+class Peringkat(NamedTuple):
+    kode: str
+    nama: str
+    keyakinan: float
+    terjawab: float
+
+
+class Matriks(NamedTuple):
+    penyakit: tuple[str, ...]  # urutan baris (hanya penyakit yang punya aturan)
+    indeks_gejala: dict[str, int]  # kode gejala -> kolom
+    w: "np.ndarray"  # (penyakit, gejala) float64, sudah dibagi total bobot per baris
+
+
+def matriks(basis: BasisPengetahuan) -> Matriks:
+    """Matriks bobot ter-normalisasi untuk snapshot ini (dibangun sekali per versi)."""
+    def buat():
+        penyakit = tuple(basis.masker_premis)
+        indeks = {k: i for i, k in enumerate(basis.gejala)}
+        w = np.zeros((len(penyakit), len(indeks)))
+        for i, kp in enumerate(penyakit):
+            for kg, b in zip(basis.premis[kp], basis.bobot[kp]):
+                w[i, indeks[kg]] = b
+        total = w.sum(axis=1, keepdims=True)
+        return Matriks(penyakit, indeks, w / np.where(total > 0, total, 1.0))
+    return basis.memo(("peringkat", "matriks"), buat)
+
+
+def _urutkan(basis: BasisPengetahuan, penyakit: tuple[str, ...], yakin, terjawab, k: int) -> list[Peringkat]:
+    # keyakinan tertinggi dulu, lalu yang premisnya paling banyak terjawab, lalu kode
+    urut = sorted(
+        (i for i in range(len(penyakit)) if yakin[i] > 0),
+        key=lambda i: (-yakin[i], -terjawab[i], penyakit[i]),
+    )[:k]
+    return [
+        Peringkat(penyakit[i], basis.penyakit[penyakit[i]].nama, round(float(yakin[i]), 4), round(float(terjawab[i]), 4))
+        for i in urut
+    ]
+
+
+def _skor_murni(basis: BasisPengetahuan, ans: dict[str, bool]) -> tuple[tuple[str, ...], list[float], list[float]]:
+    penyakit = tuple(basis.masker_premis)
+    yakin, terjawab = [], []
+    for kp in penyakit:
+        total = skor = dijawab = 0.0
+        for kg, b in zip(basis.premis[kp], basis.bobot[kp]):
+            total += b
+            v = ans.get(kg)
+            if v is not None:
+                dijawab += b
+                skor += b if v else -b
+        total = total or 1.0
+        yakin.append(round(max(skor, 0.0) / total, 6))
+        terjawab.append(round(dijawab / total, 6))
+    return penyakit, yakin, terjawab
+
+
+def _top_k(basis: BasisPengetahuan, m: Matriks, a, k: int) -> list[list[Peringkat]]:
+    """Skor matriks jawaban `a` (sesi x gejala) terhadap semua penyakit, ambil top-k per baris."""
+    skor = np.stack([a, np.abs(a)]) @ m.w.T  # (2, sesi, penyakit): satu perkalian untuk semua sesi
+    # dibulatkan supaya seri (mis. semua premis "Ya" = 1.0) tidak pecah oleh galat float
+    yakin, terjawab = np.round(np.maximum(skor[0], 0.0), 6), np.round(skor[1], 6)
+    # lexsort stabil: seri keyakinan & keterjawaban jatuh ke urutan kode penyakit
+    urut = np.lexsort((-terjawab, -yakin), axis=-1)[:, :k]
+    hasil = []
+    for y, t, idx in zip(yakin.tolist(), terjawab.tolist(), urut.tolist()):
+        hasil.append([
+            Peringkat(m.penyakit[i], basis.penyakit[m.penyakit[i]].nama, round(y[i], 4), round(t[i], 4))
+            for i in idx if y[i] > 0
+        ])
+    return hasil
+
+
+def peringkat(basis: BasisPengetahuan, ans: dict[str, bool], k: int = 5) -> list[Peringkat]:
+    """Top-k penyakit untuk satu peta jawaban (penyakit berkeyakinan 0 tidak ikut)."""
+    return peringkat_batch(basis, (ans,), k)[0]
+
+
+def peringkat_batch(basis: BasisPengetahuan, daftar: Iterable[dict[str, bool]], k: int = 5) -> list[list[Peringkat]]:
+    """Top-k untuk banyak peta jawaban sekaligus (mis. laporan offline sesi tersimpan)."""
+    daftar = list(daftar)
+    if np is None:
+        return [_urutkan(basis, *_skor_murni(basis, ans), k) for ans in daftar]
+    m = matriks(basis)
+    a = np.zeros((len(daftar), len(m.indeks_gejala)))
+    for baris, ans in zip(a, daftar):
+        for kg, v in ans.items():
+            i = m.indeks_gejala.get(kg)
+            if i is not None:
+                baris[i] = 1.0 if v else -1.0
+    return _top_k(basis, m, a, k)
@@ -0,0 +1,63 @@
+"""Serialisasi response yang bagian statisnya dirakit sekali per versi basis pengetahuan.
+
+Detail penyakit + solusinya tidak pernah berubah selama versi snapshot sama,
+jadi JSON-nya di-render (dan divalidasi Pydantic) sekali lewat `basis.memo`.
+Per request tinggal merangkai potongan bytes tersebut dengan field dinamis
+(status, pertanyaan, progres, ...). orjson dipakai kalau terpasang
+(extra `json`), selain itu json bawaan.
+"""
+import json
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from .pengetahuan import BasisPengetahuan
+from .skema import PenyakitDetailKeluar, SolusiKeluar
+
+try:
+    import orjson
+except ImportError:  # dependency opsional
+    orjson = None
+
+_SOLUSI = TypeAdapter(list[SolusiKeluar])
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ResponJSON(Response):
+    """Response JSON tanpa validasi ulang; `content` boleh bytes yang sudah jadi."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+
+def detail_penyakit(basis: BasisPengetahuan, kode: str) -> PenyakitDetailKeluar:
+    p = basis.penyakit[kode]
+    return PenyakitDetailKeluar(
+        kode=p.kode,
+        nama=p.nama,
+        pengertian=p.pengertian,
+        penyebab=p.penyebab,
+        solusi=[SolusiKeluar(kode=s.kode, deskripsi=s.deskripsi, urutan=s.urutan) for s in basis.solusi.get(kode, ())]
+    )
+
+
+def fragmen_penyakit(basis: BasisPengetahuan, kode: str) -> tuple[bytes, bytes]:
+    """(JSON detail penyakit, JSON daftar solusi) untuk satu penyakit, sekali per versi."""
+    def buat():
+        d = detail_penyakit(basis, kode)
+        return d.model_dump_json().encode("utf-8"), _SOLUSI.dump_json(d.solusi)
+    return basis.memo(("fragmen", "penyakit", kode), buat)
+
+
+def rakit(bagian: dict[str, Optional[bytes]]) -> bytes:
+    """Gabungkan field -> potongan JSON (bytes) jadi satu objek; None = field dilewati."""
+    return b"{" + b",".join(dumps(k) + b":" + v for k, v in bagian.items() if v is not None) + b"}"
@@ -1,63 +1,317 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func, delete
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, delete, insert, update
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
+import csv
+import io
+import json
+import logging
 import re
-from ..db import get_db
-from ..dependensi import wajib_admin
-from ..model import Penyakit, Gejala, Aturan, Solusi, RiwayatDiagnosa
+import time
+from datetime import date, timedelta
+from ..admisi import statistik_admisi
+from ..db import get_db, statistik_pool, upsert
+from ..dependensi import wajib_admin, dukung_async
+from ..instrumentasi import statistik_route
+from ..keamanan import statistik_cache
+from ..konfigurasi import settings
+from ..model import Penyakit, Gejala, Aturan, Solusi, RiwayatDiagnosa, NomorUrut, StatistikDiagnosa, SesiDiagnosa, JawabanDiagnosa
+from ..pengetahuan import basis_aktif, muat_ulang, naikkan_versi, pemberitahu, statistik_basis
+from ..peringkat import peringkat_batch
+from .. import sesi, statistik
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
+log = logging.getLogger(__name__)
+
+
+def _commit_basis(db: Session) -> None:
+    """Commit perubahan basis pengetahuan (kb_version ikut naik di transaksi yang sama),
+    bangun ulang snapshot mesin inferensi, lalu kabari worker lain.
+
+    Kompilasi snapshot & publish notifier memblokir, jadi handler yang memanggil
+    ini tidak memakai @dukung_async (tetap sync di threadpool walau DB_ASYNC aktif)."""
+    naikkan_versi(db)
+    db.commit()
+    pemberitahu.kirim(muat_ulang(db, "admin").versi_db)
+
 
 @router.get("/stats", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def stats(db: Session = Depends(get_db)):
+    # jumlah basis pengetahuan dari snapshot, riwayat dari counter statistik (tanpa COUNT(*))
+    basis = basis_aktif(db)
     return {
-        "total_penyakit": db.scalar(select(func.count()).select_from(Penyakit)) or 0,
-        "total_gejala": db.scalar(select(func.count()).select_from(Gejala)) or 0,
-        "total_solusi": db.scalar(select(func.count()).select_from(Solusi)) or 0,
-        "total_riwayat": db.scalar(select(func.count()).select_from(RiwayatDiagnosa)) or 0,
+        "total_penyakit": len(basis.penyakit),
+        "total_gejala": len(basis.gejala),
+        "total_solusi": sum(len(s) for s in basis.solusi.values()),
+        "total_riwayat": statistik.total(db),
     }
 
-@router.get("/riwayat", dependencies=[Depends(wajib_admin)])
-def riwayat(db: Session = Depends(get_db), limit: int = 200):
-    rows = db.scalars(select(RiwayatDiagnosa).order_by(RiwayatDiagnosa.id.desc()).limit(limit)).all()
+
+@router.get("/statistik", dependencies=[Depends(wajib_admin)])
+@dukung_async
+def statistik_riwayat(
+    db: Session = Depends(get_db),
+    per: List[Literal[statistik.DIMENSI]] = Query(["tanggal"]),
+    dari: Optional[date] = None,
+    sampai: Optional[date] = None,
+    kode_penyakit: Optional[str] = None,
+    status: Optional[str] = None,
+):
+    """Jumlah riwayat per dimensi (`per` boleh diulang: tanggal, kode_penyakit, status, jk, kelompok_umur).
+
+    Dibaca dari tabel counter, jadi biayanya sebanding jumlah bucket, bukan panjang riwayat.
+    """
+    kp = kode_penyakit.strip().upper() if kode_penyakit else None
+    return statistik.rekap(db, list(dict.fromkeys(per)), dari, sampai, kp, status)
+
+
+@router.post("/statistik/bangun-ulang", dependencies=[Depends(wajib_admin)])
+@dukung_async
+def bangun_ulang_statistik(db: Session = Depends(get_db)):
+    """Hitung ulang counter statistik dari riwayat_diagnosa (untuk data lama / setelah migrasi)."""
+    n = statistik.bangun_ulang(db)
+    db.commit()
+    return {"ok": True, "bucket": n}
+
+
+@router.get("/peringkat", dependencies=[Depends(wajib_admin)])
+@dukung_async
+def peringkat_sesi_tersimpan(
+    db: Session = Depends(get_db),
+    k: int = Query(3, ge=1, le=50),
+    limit: int = Query(1000, ge=1, le=20000),
+    dari: Optional[date] = None,
+    sampai: Optional[date] = None,
+    status: Optional[str] = None,
+):
+    """Laporan offline: peringkat penyakit untuk sesi tersimpan (terbaru dulu), diskor sekaligus.
+
+    Hanya sesi yang ada di tabel sesi_diagnosa (SESI_STORE=mysql, atau diagnosa batch).
+    """
+    stmt = select(SesiDiagnosa.id, SesiDiagnosa.created_at, SesiDiagnosa.status, SesiDiagnosa.kode_penyakit)
+    if dari:
+        stmt = stmt.where(SesiDiagnosa.created_at >= dari)
+    if sampai:
+        stmt = stmt.where(SesiDiagnosa.created_at < sampai + timedelta(days=1))
+    if status:
+        stmt = stmt.where(SesiDiagnosa.status == status)
+    daftar = db.execute(stmt.order_by(SesiDiagnosa.created_at.desc()).limit(limit)).all()
+
+    jawaban: dict[str, dict[str, bool]] = {r.id: {} for r in daftar}
+    ids = list(jawaban)
+    for i in range(0, len(ids), _YIELD_PER):
+        for sid, kg, v in db.execute(
+            select(JawabanDiagnosa.sesi_id, JawabanDiagnosa.kode_gejala, JawabanDiagnosa.jawaban)
+            .where(JawabanDiagnosa.sesi_id.in_(ids[i:i + _YIELD_PER]))
+        ):
+            jawaban[sid][kg] = bool(v)
+
+    hasil = peringkat_batch(basis_aktif(db), jawaban.values(), k)
+    teratas: dict[str, int] = {}
+    for ps in hasil:
+        if ps:
+            teratas[ps[0].kode] = teratas.get(ps[0].kode, 0) + 1
     return {
-        "items": [
+        "jumlah": len(daftar),
+        "teratas": dict(sorted(teratas.items(), key=lambda x: -x[1])),
+        "sesi": [
             {
-                "id": r.id,
+                "sesi_id": r.id,
                 "created_at": str(r.created_at),
-                "nama": r.nama,
-                "umur": r.umur,
-                "jk": r.jk,
-                "alamat": r.alamat,
                 "status": r.status,
                 "kode_penyakit": r.kode_penyakit,
-                "nama_penyakit": r.nama_penyakit,
-                "pesan": r.pesan,
-            } for r in rows
-        ]
+                "peringkat": [p._asdict() for p in ps],
+            }
+            for r, ps in zip(daftar, hasil)
+        ],
+    }
+
+@router.get("/pool", dependencies=[Depends(wajib_admin)])
+def pool():
+    return statistik_pool()
+
+
+@router.get("/auth", dependencies=[Depends(wajib_admin)])
+def auth_cache():
+    """Hit/miss cache verifikasi token & login admin."""
+    return statistik_cache()
+
+
+@router.get("/query", dependencies=[Depends(wajib_admin)])
+def query_per_route():
+    """Jumlah & waktu query DB per route + statement paling lambat yang tercatat."""
+    return statistik_route()
+
+
+@router.get("/sesi", dependencies=[Depends(wajib_admin)])
+@dukung_async(blokir=sesi.store_memblokir)
+def sesi_aktif(db: Session = Depends(get_db)):
+    """Jumlah sesi diagnosa yang masih aktif + metrik task pembersihan sesi kedaluwarsa."""
+    return {
+        "ttl_menit": settings.SESI_TTL_MENIT,
+        "store": settings.SESI_STORE,
+        "aktif": sesi.penyimpanan.jumlah_aktif(db),
+        "purge": sesi.stat.ke_dict(),
+    }
+
+@router.get("/basis", dependencies=[Depends(wajib_admin)])
+def basis_status():
+    """Versi snapshot basis pengetahuan di worker ini, umur cek terakhir, dan jumlah muat ulang."""
+    return statistik_basis()
+
+@router.get("/admisi", dependencies=[Depends(wajib_admin)])
+def admisi():
+    """Slot & antrean per grup route di worker ini, plus jumlah request diterima/diantre/ditolak."""
+    return statistik_admisi()
+
+_KOLOM_RIWAYAT = (
+    "id", "created_at", "nama", "umur", "jk", "alamat", "status", "kode_penyakit", "nama_penyakit", "pesan",
+)
+
+# baris per fetch dari server-side cursor saat streaming export
+_YIELD_PER = 1000
+
+
+def _dict_riwayat(r) -> dict:
+    d = {k: getattr(r, k) for k in _KOLOM_RIWAYAT}
+    d["created_at"] = str(r.created_at)
+    return d
+
+
+def _filter_riwayat(stmt, dari: Optional[date], sampai: Optional[date], status: Optional[str], kode_penyakit: Optional[str]):
+    if dari:
+        stmt = stmt.where(RiwayatDiagnosa.created_at >= dari)
+    if sampai:
+        stmt = stmt.where(RiwayatDiagnosa.created_at < sampai + timedelta(days=1))
+    if status:
+        stmt = stmt.where(RiwayatDiagnosa.status == status)
+    if kode_penyakit:
+        stmt = stmt.where(RiwayatDiagnosa.kode_penyakit == kode_penyakit.strip().upper())
+    return stmt
+
+
+@router.get("/riwayat", dependencies=[Depends(wajib_admin)])
+@dukung_async
+def riwayat(
+    db: Session = Depends(get_db),
+    limit: int = Query(200, ge=1, le=1000),
+    sebelum: Optional[int] = None,
+    dari: Optional[date] = None,
+    sampai: Optional[date] = None,
+    status: Optional[str] = None,
+    kode_penyakit: Optional[str] = None,
+):
+    """Riwayat terbaru dulu, dipaging dengan keyset (`sebelum` = id terakhir halaman sebelumnya)."""
+    stmt = _filter_riwayat(select(RiwayatDiagnosa), dari, sampai, status, kode_penyakit)
+    if sebelum is not None:
+        stmt = stmt.where(RiwayatDiagnosa.id < sebelum)
+    rows = db.scalars(stmt.order_by(RiwayatDiagnosa.id.desc()).limit(limit)).all()
+    return {
+        "items": [_dict_riwayat(r) for r in rows],
+        "kursor_berikut": rows[-1].id if len(rows) == limit else None,
     }
 
+
+@router.get("/riwayat/export", dependencies=[Depends(wajib_admin)])
+def export_riwayat(
+    db: Session = Depends(get_db),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    dari: Optional[date] = None,
+    sampai: Optional[date] = None,
+    status: Optional[str] = None,
+    kode_penyakit: Optional[str] = None,
+):
+    """Export seluruh riwayat (terlama dulu) sebagai NDJSON/CSV streaming.
+
+    Dibaca lewat server-side cursor (yield_per) di session sendiri, jadi memori
+    tetap datar berapa pun jumlah barisnya.
+    """
+    stmt = _filter_riwayat(select(RiwayatDiagnosa), dari, sampai, status, kode_penyakit).order_by(RiwayatDiagnosa.id)
+    bind = db.get_bind()
+
+    def alir():
+        with Session(bind) as s:
+            rows = s.scalars(stmt.execution_options(yield_per=_YIELD_PER))
+            if format == "csv":
+                buf = io.StringIO()
+                w = csv.writer(buf)
+                w.writerow(_KOLOM_RIWAYAT)
+                for r in rows:
+                    w.writerow(_dict_riwayat(r).values())
+                    if buf.tell() > 64 * 1024:
+                        yield buf.getvalue()
+                        buf.seek(0)
+                        buf.truncate()
+                yield buf.getvalue()
+            else:
+                for r in rows:
+                    yield json.dumps(_dict_riwayat(r), ensure_ascii=False) + "\n"
+
+    media = "text/csv" if format == "csv" else "application/x-ndjson"
+    nama = f"riwayat.{'csv' if format == 'csv' else 'ndjson'}"
+    return StreamingResponse(alir(), media_type=media, headers={"Content-Disposition": f'attachment; filename="{nama}"'})
+
 @router.delete("/riwayat", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def hapus_riwayat(db: Session = Depends(get_db)):
     db.execute(delete(RiwayatDiagnosa))
+    db.execute(delete(StatistikDiagnosa))
     db.commit()
     return {"ok": True}
 
+
+_SUMBER_EXPORT = (
+    ("penyakit", select(Penyakit.kode, Penyakit.nama, Penyakit.pengertian, Penyakit.penyebab).order_by(Penyakit.kode)),
+    ("gejala", select(Gejala.kode, Gejala.nama).order_by(Gejala.kode)),
+    ("aturan", select(Aturan.kode_penyakit, Aturan.kode_gejala, Aturan.urutan, Aturan.bobot).order_by(Aturan.kode_penyakit, Aturan.urutan)),
+    ("solusi", select(Solusi.kode, Solusi.kode_penyakit, Solusi.deskripsi, Solusi.urutan).order_by(Solusi.kode)),
+)
+
+
+def _baris_export(s: Session, stmt):
+    return (dict(r) for r in s.execute(stmt.execution_options(yield_per=_YIELD_PER)).mappings())
+
+
 @router.get("/export", dependencies=[Depends(wajib_admin)])
 def export_data(db: Session = Depends(get_db)):
-    penyakit = list(db.scalars(select(Penyakit).order_by(Penyakit.kode)).all())
-    gejala = list(db.scalars(select(Gejala).order_by(Gejala.kode)).all())
-    aturan = list(db.scalars(select(Aturan).order_by(Aturan.kode_penyakit, Aturan.urutan)).all())
-    solusi = list(db.scalars(select(Solusi).order_by(Solusi.kode)).all())
-    return {
-        "penyakit": [{"kode": p.kode, "nama": p.nama, "pengertian": p.pengertian, "penyebab": p.penyebab} for p in penyakit],
-        "gejala": [{"kode": g.kode, "nama": g.nama} for g in gejala],
-        "aturan": [{"kode_penyakit": a.kode_penyakit, "kode_gejala": a.kode_gejala, "urutan": a.urutan} for a in aturan],
-        "solusi": [{"kode": s.kode, "kode_penyakit": s.kode_penyakit, "deskripsi": s.deskripsi, "urutan": s.urutan} for s in solusi],
-    }
+    """Export basis pengetahuan sebagai satu dokumen JSON (format `/import`), dikirim bertahap."""
+    bind = db.get_bind()
+
+    def alir():
+        with Session(bind) as s:
+            for i, (jenis, stmt) in enumerate(_SUMBER_EXPORT):
+                yield ("{" if i == 0 else "],") + json.dumps(jenis) + ":["
+                pisah = ""
+                for row in _baris_export(s, stmt):
+                    yield pisah + json.dumps(row, ensure_ascii=False)
+                    pisah = ","
+            yield "]}"
+
+    return StreamingResponse(alir(), media_type="application/json")
+
+
+@router.get("/export/ndjson", dependencies=[Depends(wajib_admin)])
+def export_ndjson(db: Session = Depends(get_db)):
+    """Export basis pengetahuan sebagai NDJSON (satu baris per record, field `jenis`);
+    bisa langsung dikirim balik ke `/api/admin/import/ndjson`."""
+    bind = db.get_bind()
+
+    def alir():
+        with Session(bind) as s:
+            for jenis, stmt in _SUMBER_EXPORT:
+                for row in _baris_export(s, stmt):
+                    yield json.dumps({"jenis": jenis, **row}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        alir(), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="basis_pengetahuan.ndjson"'},
+    )
 
 @router.post("/reset", dependencies=[Depends(wajib_admin)])
 def reset_data(db: Session = Depends(get_db)):
@@ -67,7 +321,9 @@ def reset_data(db: Session = Depends(get_db)):
     db.execute(delete(Gejala))
     db.execute(delete(Penyakit))
     db.execute(delete(RiwayatDiagnosa))
-    db.commit()
+    db.execute(delete(StatistikDiagnosa))
+    db.execute(delete(NomorUrut).where(NomorUrut.nama == "solusi"))
+    _commit_basis(db)
     return {"ok": True, "note": "Data sudah dikosongkan. Import ulang db_init.sql untuk seed."}
 
 
@@ -90,6 +346,8 @@ class GejalaMasuk(BaseModel):
 class AturanSimpanMasuk(BaseModel):
     gejala: List[str] = []
     solusi: List[str] = []  # daftar baris solusi
+    # kode_gejala -> bobot (0..1] untuk diagnosa berperingkat; None = pertahankan bobot lama (default 1)
+    bobot: Optional[Dict[str, float]] = None
 
 
 def _norm_kode_penyakit(kode: str) -> str:
@@ -99,6 +357,25 @@ def _norm_kode_penyakit(kode: str) -> str:
     return k
 
 
+def _norm_bobot(nilai) -> float:
+    if nilai is None:
+        return 1.0
+    try:
+        b = float(nilai)
+    except (TypeError, ValueError):
+        b = 0.0
+    if not 0 < b <= 1:
+        raise HTTPException(status_code=400, detail="Bobot aturan harus lebih dari 0 dan maksimal 1")
+    return b
+
+
+def _norm_urutan(nilai) -> int:
+    try:
+        return int(nilai or 1)
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Urutan harus bilangan bulat")
+
+
 def _norm_kode_gejala(kode: str) -> str:
     k = (kode or "").strip().upper()
     if not re.fullmatch(r"G-\d{2}", k):
@@ -107,23 +384,185 @@ def _norm_kode_gejala(kode: str) -> str:
 
 
 
-def _next_solusi_number(db: Session) -> int:
-    # cari nomor terbesar dari Sxx
-    rows = db.scalars(select(Solusi.kode)).all()
-    mx = 0
-    for code in rows:
-        if not code:
-            continue
-        m = re.fullmatch(r"S(\d+)", code.strip().upper())
-        if m:
-            mx = max(mx, int(m.group(1)))
-    return mx + 1
+def _nomor_solusi(kode: str) -> int:
+    m = re.fullmatch(r"S(\d+)", (kode or "").strip().upper())
+    return int(m.group(1)) if m else 0
+
+
+def _pesan_nomor_solusi(db: Session, jumlah: int) -> int:
+    """Reservasi `jumlah` nomor solusi sekaligus dari counter; kembalikan nomor pertama.
+
+    Baris counter dikunci (SELECT ... FOR UPDATE) sampai transaksi selesai.
+    """
+    kunci = select(NomorUrut).where(NomorUrut.nama == "solusi").with_for_update()
+    row = db.scalar(kunci)
+    if row is None:
+        # DB lama yang belum punya counter: inisialisasi dari kode yang sudah ada. Upsert
+        # tanpa perubahan kalau baris sudah dibuat transaksi lain (tidak bentrok di
+        # primary key), lalu baris itu yang dikunci dan dipakai.
+        mx = max((_nomor_solusi(k) for k in db.scalars(select(Solusi.kode)).all()), default=0)
+        upsert(db, NomorUrut, {"nama": "solusi", "nilai": mx}, kunci=["nama"], ubah={"nilai": NomorUrut.nilai})
+        row = db.scalar(kunci)
+    awal = row.nilai + 1
+    row.nilai += jumlah
+    return awal
+
+
+def _set_nomor_solusi(db: Session, nilai: int) -> None:
+    upsert(db, NomorUrut, {"nama": "solusi", "nilai": nilai}, kunci=["nama"], ubah={"nilai": nilai})
 
 
 def _fmt_solusi_kode(n: int) -> str:
     return f"S{n:02d}" if n < 100 else f"S{n}"
 
 
+def _baris_penyakit(p: dict) -> dict:
+    kode = _norm_kode_penyakit(p.get("kode"))
+    nama = (p.get("nama") or "").strip()
+    if not nama:
+        raise HTTPException(status_code=400, detail=f"Nama penyakit kosong untuk {kode}")
+    return {"kode": kode, "nama": nama, "pengertian": p.get("pengertian"), "penyebab": p.get("penyebab")}
+
+
+def _baris_gejala(g: dict) -> dict:
+    kode = _norm_kode_gejala(g.get("kode"))
+    nama = (g.get("nama") or "").strip()
+    if not nama:
+        raise HTTPException(status_code=400, detail=f"Nama gejala kosong untuk {kode}")
+    return {"kode": kode, "nama": nama}
+
+
+def _baris_aturan(a: dict) -> dict:
+    return {
+        "kode_penyakit": _norm_kode_penyakit(a.get("kode_penyakit")),
+        "kode_gejala": _norm_kode_gejala(a.get("kode_gejala")),
+        "urutan": _norm_urutan(a.get("urutan")),
+        "bobot": _norm_bobot(a.get("bobot")),
+    }
+
+
+def _baris_solusi(s: dict) -> dict:
+    kode = (s.get("kode") or "").strip().upper()
+    if not kode:
+        raise HTTPException(status_code=400, detail="Kode solusi kosong")
+    return {
+        "kode": kode,
+        "kode_penyakit": _norm_kode_penyakit(s.get("kode_penyakit")),
+        "deskripsi": (s.get("deskripsi") or "").strip(),
+        "urutan": _norm_urutan(s.get("urutan")),
+    }
+
+
+# urutan = urutan flush (tabel induk dulu supaya foreign key terpenuhi)
+_TABEL_IMPOR = {
+    "penyakit": (Penyakit, _baris_penyakit),
+    "gejala": (Gejala, _baris_gejala),
+    "aturan": (Aturan, _baris_aturan),
+    "solusi": (Solusi, _baris_solusi),
+}
+
+
+def _di_baris(nomor, pesan: str) -> str:
+    return f"Baris {nomor}: {pesan}" if nomor is not None else pesan
+
+
+class _Pengimpor:
+    """Validasi baris basis pengetahuan satu per satu, tulis per chunk dengan executemany.
+
+    Semua chunk masuk dalam satu transaksi; pemanggil yang commit lewat `selesai()`.
+    Baris lengkap hanya disimpan sebesar chunk; yang disimpan untuk seluruh import
+    hanya kode yang sudah dilihat, supaya duplikat & referensi ke induk yang belum
+    ada langsung ditolak di baris sumbernya (bukan baru ketahuan saat chunk ditulis).
+    """
+
+    def __init__(self, db: Session, ukuran_chunk: int):
+        self.db = db
+        self.ukuran_chunk = max(ukuran_chunk, 1)
+        self.buffer: dict[str, list[dict]] = {t: [] for t in _TABEL_IMPOR}
+        self.sumber: dict[str, list[Optional[int]]] = {t: [] for t in _TABEL_IMPOR}  # nomor baris per baris buffer
+        self.kunci: dict[str, set] = {t: set() for t in _TABEL_IMPOR}
+        self.jumlah: dict[str, int] = {t: 0 for t in _TABEL_IMPOR}
+        self.chunk: list[dict] = []
+        self.nomor_maks = 0
+        self.mulai = time.perf_counter()
+
+        # wipe knowledge-base tables (keep riwayat)
+        db.execute(delete(Aturan))
+        db.execute(delete(Solusi))
+        db.execute(delete(Gejala))
+        db.execute(delete(Penyakit))
+
+    def tambah(self, jenis: str, row: dict, nomor: Optional[int] = None) -> None:
+        """Validasi & buffer satu baris; `nomor` = nomor baris sumber untuk pesan error."""
+        try:
+            baris = self._validasi(jenis, row)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=_di_baris(nomor, e.detail))
+        if jenis == "solusi":
+            self.nomor_maks = max(self.nomor_maks, _nomor_solusi(baris["kode"]))
+        buf = self.buffer[jenis]
+        buf.append(baris)
+        self.sumber[jenis].append(nomor)
+        if len(buf) >= self.ukuran_chunk:
+            self.flush()
+
+    def _validasi(self, jenis: str, row: dict) -> dict:
+        if jenis not in _TABEL_IMPOR or not isinstance(row, dict):
+            raise HTTPException(status_code=400, detail="Format JSON tidak valid")
+        baris = _TABEL_IMPOR[jenis][1](row)
+        if jenis in ("aturan", "solusi") and baris["kode_penyakit"] not in self.kunci["penyakit"]:
+            raise HTTPException(status_code=400, detail=f"Penyakit {baris['kode_penyakit']} belum didefinisikan sebelum baris ini")
+        if jenis == "aturan" and baris["kode_gejala"] not in self.kunci["gejala"]:
+            raise HTTPException(status_code=400, detail=f"Gejala {baris['kode_gejala']} belum didefinisikan sebelum baris ini")
+        kunci = (baris["kode_penyakit"], baris["kode_gejala"]) if jenis == "aturan" else baris["kode"]
+        if kunci in self.kunci[jenis]:
+            raise HTTPException(status_code=400, detail=f"Data {jenis} duplikat: {kunci}")
+        self.kunci[jenis].add(kunci)
+        return baris
+
+    def flush(self) -> None:
+        for jenis, (model, _) in _TABEL_IMPOR.items():
+            buf = self.buffer[jenis]
+            if not buf:
+                continue
+            t = time.perf_counter()
+            try:
+                self.db.execute(insert(model), buf)
+            except IntegrityError as e:
+                # cadangan kalau lolos validasi di tambah(): sebutkan rentang baris chunk ini
+                nomor = [n for n in self.sumber[jenis] if n is not None]
+                rentang = f"{min(nomor)}-{max(nomor)}" if nomor else None
+                raise HTTPException(status_code=400, detail=_di_baris(
+                    rentang, f"Data {jenis} bentrok / referensi tidak ditemukan: {e.orig}"
+                ))
+            self.jumlah[jenis] += len(buf)
+            info = {
+                "chunk": len(self.chunk) + 1,
+                "tabel": jenis,
+                "baris": len(buf),
+                "total_tabel": self.jumlah[jenis],
+                "detik": round(time.perf_counter() - t, 4),
+            }
+            self.chunk.append(info)
+            log.info("import chunk %(chunk)d: %(baris)d baris %(tabel)s (total %(total_tabel)d) %(detik)ss", info)
+            self.buffer[jenis] = []
+            self.sumber[jenis] = []
+
+    def selesai(self) -> dict:
+        self.flush()
+        _set_nomor_solusi(self.db, self.nomor_maks)
+        _commit_basis(self.db)
+        detik = time.perf_counter() - self.mulai
+        total = sum(self.jumlah.values())
+        return {
+            "ok": True,
+            "jumlah": self.jumlah,
+            "chunk": self.chunk,
+            "detik": round(detik, 3),
+            "baris_per_detik": round(total / detik, 1) if detik > 0 else None,
+        }
+
+
 @router.post("/import", dependencies=[Depends(wajib_admin)])
 def import_data(payload: dict = Body(...), db: Session = Depends(get_db)):
     """Import ulang basis pengetahuan (penyakit, gejala, aturan, solusi).
@@ -132,65 +571,58 @@ def import_data(payload: dict = Body(...), db: Session = Depends(get_db)):
     Payload yang punya field lama seperti `kelompok` akan diabaikan.
     """
 
-    penyakit_items = payload.get("penyakit", [])
-    gejala_items = payload.get("gejala", [])
-    aturan_items = payload.get("aturan", [])
-    solusi_items = payload.get("solusi", [])
-
-    if not all(isinstance(x, list) for x in [penyakit_items, gejala_items, aturan_items, solusi_items]):
+    items = {t: payload.get(t, []) for t in _TABEL_IMPOR}
+    if not all(isinstance(x, list) for x in items.values()):
         raise HTTPException(status_code=400, detail="Format JSON tidak valid")
 
-    # wipe knowledge-base tables (keep riwayat)
-    db.execute(delete(Aturan))
-    db.execute(delete(Solusi))
-    db.execute(delete(Gejala))
-    db.execute(delete(Penyakit))
+    pengimpor = _Pengimpor(db, settings.IMPORT_CHUNK)
+    for jenis, rows in items.items():
+        for row in rows:
+            pengimpor.tambah(jenis, row or {})
+    return pengimpor.selesai()
 
-    # insert penyakit
-    for p in penyakit_items:
-        kode = _norm_kode_penyakit((p or {}).get("kode"))
-        nama = ((p or {}).get("nama") or "").strip()
-        if not nama:
-            raise HTTPException(status_code=400, detail=f"Nama penyakit kosong untuk {kode}")
-        db.add(Penyakit(
-            kode=kode,
-            nama=nama,
-            pengertian=(p or {}).get("pengertian"),
-            penyebab=(p or {}).get("penyebab"),
-        ))
-
-    # insert gejala
-    for g in gejala_items:
-        kode = _norm_kode_gejala((g or {}).get("kode"))
-        nama = ((g or {}).get("nama") or "").strip()
-        if not nama:
-            raise HTTPException(status_code=400, detail=f"Nama gejala kosong untuk {kode}")
-        db.add(Gejala(kode=kode, nama=nama))
-
-    db.flush()
-
-    # insert aturan
-    for a in aturan_items:
-        kp = _norm_kode_penyakit((a or {}).get("kode_penyakit"))
-        kg = _norm_kode_gejala((a or {}).get("kode_gejala"))
-        ur = int((a or {}).get("urutan") or 1)
-        db.add(Aturan(kode_penyakit=kp, kode_gejala=kg, urutan=ur))
-
-    # insert solusi
-    for s in solusi_items:
-        kode = ((s or {}).get("kode") or "").strip().upper()
-        if not kode:
-            raise HTTPException(status_code=400, detail="Kode solusi kosong")
-        kp = _norm_kode_penyakit((s or {}).get("kode_penyakit"))
-        des = ((s or {}).get("deskripsi") or "").strip()
-        ur = int((s or {}).get("urutan") or 1)
-        db.add(Solusi(kode=kode, kode_penyakit=kp, deskripsi=des, urutan=ur))
 
-    db.commit()
-    return {"ok": True}
+@router.post("/import/ndjson", dependencies=[Depends(wajib_admin)])
+async def import_ndjson(request: Request, db: Session = Depends(get_db)):
+    """Import basis pengetahuan dari body NDJSON yang dibaca bertahap (streaming).
+
+    Tiap baris satu objek JSON dengan field `jenis` (penyakit|gejala|aturan|solusi)
+    plus kolom tabelnya, mis. `{"jenis": "gejala", "kode": "G-01", "nama": "..."}`.
+    Baris induk (penyakit, gejala) harus muncul sebelum aturan/solusi yang
+    merujuknya. Penulisan DB dijalankan di threadpool per potongan body supaya
+    event loop tidak terblokir; semuanya tetap satu transaksi.
+    """
+    pengimpor = await run_in_threadpool(_Pengimpor, db, settings.IMPORT_CHUNK)
+    nomor = 0
+    sisa = b""
+
+    def proses(lines: list[tuple[int, bytes]]) -> None:
+        for n, line in lines:
+            try:
+                row = json.loads(line)
+                jenis = row.pop("jenis", None)
+            except (ValueError, AttributeError):
+                raise HTTPException(status_code=400, detail=f"Baris {n}: JSON tidak valid")
+            pengimpor.tambah(jenis, row, n)
+
+    async for potong in request.stream():
+        sisa += potong
+        *lengkap, sisa = sisa.split(b"\n")
+        lines = []
+        for line in lengkap:
+            nomor += 1
+            if line.strip():
+                lines.append((nomor, line))
+        if lines:
+            await run_in_threadpool(proses, lines)
+    if sisa.strip():
+        await run_in_threadpool(proses, [(nomor + 1, sisa)])
+
+    return await run_in_threadpool(pengimpor.selesai)
 
 
 @router.get("/penyakit", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def list_penyakit(db: Session = Depends(get_db)):
     items = db.scalars(select(Penyakit).order_by(Penyakit.kode)).all()
     return [
@@ -200,6 +632,7 @@ def list_penyakit(db: Session = Depends(get_db)):
 
 
 @router.get("/penyakit/{kode}", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def detail_penyakit(kode: str, db: Session = Depends(get_db)):
     kode = _norm_kode_penyakit(kode)
     p = db.get(Penyakit, kode)
@@ -215,7 +648,7 @@ def tambah_penyakit(payload: PenyakitMasuk, db: Session = Depends(get_db)):
         raise HTTPException(status_code=409, detail="Kode penyakit sudah ada")
     p = Penyakit(kode=kode, nama=payload.nama.strip(), pengertian=payload.pengertian, penyebab=payload.penyebab)
     db.add(p)
-    db.commit()
+    _commit_basis(db)
     return {"kode": p.kode, "nama": p.nama, "pengertian": p.pengertian, "penyebab": p.penyebab}
 
 
@@ -228,7 +661,7 @@ def ubah_penyakit(kode: str, payload: PenyakitMasuk, db: Session = Depends(get_d
     p.nama = payload.nama.strip()
     p.pengertian = payload.pengertian
     p.penyebab = payload.penyebab
-    db.commit()
+    _commit_basis(db)
     return {"kode": p.kode, "nama": p.nama, "pengertian": p.pengertian, "penyebab": p.penyebab}
 
 
@@ -239,11 +672,12 @@ def hapus_penyakit(kode: str, db: Session = Depends(get_db)):
     if not p:
         raise HTTPException(status_code=404, detail="Penyakit tidak ditemukan")
     db.delete(p)
-    db.commit()
+    _commit_basis(db)
     return {"ok": True}
 
 
 @router.get("/gejala", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def list_gejala(db: Session = Depends(get_db)):
     items = db.scalars(select(Gejala).order_by(Gejala.kode)).all()
     return [
@@ -253,6 +687,7 @@ def list_gejala(db: Session = Depends(get_db)):
 
 
 @router.get("/gejala/{kode}", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def detail_gejala(kode: str, db: Session = Depends(get_db)):
     kode = _norm_kode_gejala(kode)
     g = db.get(Gejala, kode)
@@ -268,7 +703,7 @@ def tambah_gejala(payload: GejalaMasuk, db: Session = Depends(get_db)):
         raise HTTPException(status_code=409, detail="Kode gejala sudah ada")
     g = Gejala(kode=kode, nama=payload.nama.strip())
     db.add(g)
-    db.commit()
+    _commit_basis(db)
     return {"kode": g.kode, "nama": g.nama}
 
 
@@ -279,7 +714,7 @@ def ubah_gejala(kode: str, payload: GejalaMasuk, db: Session = Depends(get_db)):
     if not g:
         raise HTTPException(status_code=404, detail="Gejala tidak ditemukan")
     g.nama = payload.nama.strip()
-    db.commit()
+    _commit_basis(db)
     return {"kode": g.kode, "nama": g.nama}
 
 
@@ -290,7 +725,7 @@ def hapus_gejala(kode: str, db: Session = Depends(get_db)):
     if not g:
         raise HTTPException(status_code=404, detail="Gejala tidak ditemukan")
     db.delete(g)
-    db.commit()
+    _commit_basis(db)
     return {"ok": True}
 
 
@@ -298,40 +733,39 @@ def hapus_gejala(kode: str, db: Session = Depends(get_db)):
 # Aturan + Solusi per penyakit
 # -----------------------------
 
+# aturan & solusi semua penyakit yang diambil dalam 1 query per relasi (bukan per penyakit)
+_MUAT_ATURAN = (selectinload(Penyakit.aturan), selectinload(Penyakit.solusi))
+
+
+def _dict_aturan(p: Penyakit) -> dict:
+    return {
+        "kode_penyakit": p.kode,
+        "nama_penyakit": p.nama,
+        "gejala": [a.kode_gejala for a in p.aturan],
+        "bobot": {a.kode_gejala: a.bobot for a in p.aturan},
+        "solusi": [{"kode": s.kode, "deskripsi": s.deskripsi, "urutan": s.urutan} for s in p.solusi],
+    }
+
+
 @router.get("/aturan", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def list_aturan(db: Session = Depends(get_db)):
-    penyakit = db.scalars(select(Penyakit).order_by(Penyakit.kode)).all()
-    out = []
-    for p in penyakit:
-        gej = db.scalars(
-            select(Aturan).where(Aturan.kode_penyakit == p.kode).order_by(Aturan.urutan)
-        ).all()
-        sol = db.scalars(
-            select(Solusi).where(Solusi.kode_penyakit == p.kode).order_by(Solusi.urutan)
-        ).all()
-        out.append({
-            "kode_penyakit": p.kode,
-            "nama_penyakit": p.nama,
-            "gejala": [a.kode_gejala for a in gej],
-            "solusi": [{"kode": s.kode, "deskripsi": s.deskripsi, "urutan": s.urutan} for s in sol],
-        })
-    return out
+    # 3 query berapa pun jumlah penyakitnya: penyakit, aturan IN (...), solusi IN (...)
+    penyakit = db.scalars(select(Penyakit).options(*_MUAT_ATURAN).order_by(Penyakit.kode)).all()
+    return [_dict_aturan(p) for p in penyakit]
 
 
 @router.get("/aturan/{kode_penyakit}", dependencies=[Depends(wajib_admin)])
+@dukung_async
 def detail_aturan(kode_penyakit: str, db: Session = Depends(get_db)):
-    kode_penyakit = _norm_kode_penyakit(kode_penyakit)
-    p = db.get(Penyakit, kode_penyakit)
+    return _aturan_penyakit(db, _norm_kode_penyakit(kode_penyakit))
+
+
+def _aturan_penyakit(db: Session, kode_penyakit: str) -> dict:
+    p = db.scalars(select(Penyakit).options(*_MUAT_ATURAN).where(Penyakit.kode == kode_penyakit)).first()
     if not p:
         raise HTTPException(status_code=404, detail="Penyakit tidak ditemukan")
-    gej = db.scalars(select(Aturan).where(Aturan.kode_penyakit == kode_penyakit).order_by(Aturan.urutan)).all()
-    sol = db.scalars(select(Solusi).where(Solusi.kode_penyakit == kode_penyakit).order_by(Solusi.urutan)).all()
-    return {
-        "kode_penyakit": p.kode,
-        "nama_penyakit": p.nama,
-        "gejala": [a.kode_gejala for a in gej],
-        "solusi": [{"kode": s.kode, "deskripsi": s.deskripsi, "urutan": s.urutan} for s in sol],
-    }
+    return _dict_aturan(p)
 
 
 @router.put("/aturan/{kode_penyakit}", dependencies=[Depends(wajib_admin)])
@@ -349,27 +783,46 @@ def simpan_aturan(kode_penyakit: str, payload: AturanSimpanMasuk, db: Session =
         if tidak_ada:
             raise HTTPException(status_code=400, detail=f"Kode gejala tidak ditemukan: {', '.join(tidak_ada)}")
 
-    # replace aturan
+    if payload.bobot is None:
+        bobot = dict(db.execute(
+            select(Aturan.kode_gejala, Aturan.bobot).where(Aturan.kode_penyakit == kode_penyakit)
+        ).all())
+    else:
+        bobot = {_norm_kode_gejala(k): _norm_bobot(v) for k, v in payload.bobot.items()}
+
+    # replace aturan (bulk)
     db.execute(delete(Aturan).where(Aturan.kode_penyakit == kode_penyakit))
-    for i, kg in enumerate(gejala_kode, start=1):
-        db.add(Aturan(kode_penyakit=kode_penyakit, kode_gejala=kg, urutan=i))
+    if gejala_kode:
+        db.execute(insert(Aturan), [
+            {"kode_penyakit": kode_penyakit, "kode_gejala": kg, "urutan": i, "bobot": bobot.get(kg, 1.0)}
+            for i, kg in enumerate(gejala_kode, start=1)
+        ])
 
-    # replace solusi (pakai teks per baris)
+    # replace solusi (pakai teks per baris): baris lama dipakai ulang sesuai urutan,
+    # sisanya di-insert dengan nomor yang direservasi sekali untuk seluruh batch
     new_lines = [s.strip() for s in payload.solusi if s and s.strip()]
-    existing = db.scalars(select(Solusi).where(Solusi.kode_penyakit == kode_penyakit).order_by(Solusi.urutan)).all()
-
-    # update existing
-    for idx, line in enumerate(new_lines):
-        if idx < len(existing):
-            existing[idx].deskripsi = line
-            existing[idx].urutan = idx + 1
-        else:
-            n = _next_solusi_number(db)
-            db.add(Solusi(kode=_fmt_solusi_kode(n), kode_penyakit=kode_penyakit, deskripsi=line, urutan=idx + 1))
+    existing = db.scalars(
+        select(Solusi.kode).where(Solusi.kode_penyakit == kode_penyakit).order_by(Solusi.urutan)
+    ).all()
 
-    # delete extras
-    for j in range(len(new_lines), len(existing)):
-        db.delete(existing[j])
-
-    db.commit()
-    return detail_aturan(kode_penyakit, db)
+    ubah = [
+        {"kode": kode, "deskripsi": line, "urutan": idx}
+        for idx, (kode, line) in enumerate(zip(existing, new_lines), start=1)
+    ]
+    if ubah:
+        db.execute(update(Solusi), ubah)
+
+    baru = new_lines[len(existing):]
+    if baru:
+        n = _pesan_nomor_solusi(db, len(baru))
+        db.execute(insert(Solusi), [
+            {"kode": _fmt_solusi_kode(n + i), "kode_penyakit": kode_penyakit, "deskripsi": line, "urutan": len(existing) + i + 1}
+            for i, line in enumerate(baru)
+        ])
+
+    extras = existing[len(new_lines):]
+    if extras:
+        db.execute(delete(Solusi).where(Solusi.kode.in_(extras)))
+
+    _commit_basis(db)
+    return _aturan_penyakit(db, kode_penyakit)
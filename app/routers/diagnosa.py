@@ -1,11 +1,19 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Union
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import insert
 from ..db import get_db
-from ..model import SesiDiagnosa, JawabanDiagnosa, Penyakit, Solusi
-from ..skema import DiagnosaMulaiMasuk, DiagnosaMulaiKeluar, DiagnosaJawabMasuk, DiagnosaHasilKeluar, Pertanyaan, Progres, Biodata, PenyakitKeluar, PenyakitDetailKeluar, SolusiKeluar
-from ..mesin import langkah_berikutnya, simpan_riwayat, solusi_penyakit
+from ..dependensi import dukung_async
+from ..konfigurasi import settings
+from ..model import SesiDiagnosa, JawabanDiagnosa, RiwayatDiagnosa
+from ..skema import DiagnosaMulaiMasuk, DiagnosaMulaiKeluar, DiagnosaJawabMasuk, DiagnosaHasilKeluar, Pertanyaan, Progres, PenyakitKeluar, SolusiKeluar, Kandidat, DiagnosaBatchMasuk, DiagnosaBatchHasil, DiagnosaBatchKeluar, DiagnosaPeringkatMasuk, DiagnosaPeringkatKeluar, KandidatPeringkat
+from ..mesin import langkah_berikutnya, simpan_riwayat, masker_jawaban, evaluasi, kandidat_sesi, baris_riwayat
+from ..pengetahuan import basis_aktif
+from ..peringkat import peringkat
+from .. import statistik
+from ..sesi import DataSesi, penyimpanan, store_memblokir
+from ..respon import ResponJSON, dumps, fragmen_penyakit, rakit
 
 router = APIRouter(prefix="/api/diagnosa", tags=["diagnosa"])
 
@@ -15,107 +23,233 @@ NO_DIAGNOSA_TEXT = (
     "Kalau keluhan kamu mengganggu aktivitas atau makin berat, sebaiknya konsultasi tenaga kesehatan."
 )
 
+def _pesan_selesai(basis, terbukti) -> str:
+    nama = ", ".join(basis.penyakit[k].nama for k in terbukti)
+    return f"Gejala yang kamu jawab cocok dengan aturan untuk {nama}."
+
+def _daftar_kandidat(basis, sesi: DataSesi, kandidat: dict[str, str]):
+    if sesi.mode != "semua":
+        return None
+    return [Kandidat(kode=k, nama=basis.penyakit[k].nama, status=st) for k, st in kandidat.items()]
+
 @router.post("/mulai", response_model=DiagnosaMulaiKeluar)
+@dukung_async(blokir=store_memblokir)
 def mulai(payload: DiagnosaMulaiMasuk, db: Session = Depends(get_db)):
-    p = db.get(Penyakit, payload.kode_penyakit)
-    if not p:
-        raise HTTPException(status_code=404, detail="Penyakit tidak ditemukan")
+    basis = basis_aktif(db)
+    p = None
+    if payload.mode == "tunggal":
+        p = basis.penyakit.get(payload.kode_penyakit or "")
+        if not p:
+            raise HTTPException(status_code=404, detail="Penyakit tidak ditemukan")
 
     sid = str(uuid.uuid4())
-    sesi = SesiDiagnosa(
+    sesi = DataSesi(
         id=sid,
         nama=payload.nama,
         umur=payload.umur,
         jk=payload.jk,
         alamat=payload.alamat,
-        kode_penyakit=payload.kode_penyakit,
+        kode_penyakit=p.kode if p else None,
+        mode=payload.mode,
+        strategi=payload.strategi,
+        profil=(payload.profil or str(uuid.uuid4())) if settings.PROFIL_TTL_MENIT > 0 else None,
         status="aktif",
     )
-    db.add(sesi)
-    db.commit()
+    # sesi baru belum punya jawaban sendiri; yang mungkin ada hanya jawaban
+    # sesi lain di profil yang sama (pasien yang lanjut memeriksa penyakit lain)
+    awal = penyimpanan.jawaban(db, sesi) if payload.profil and sesi.profil else {}
+    status, q_or_p, prog, kandidat = langkah_berikutnya(db, basis, sesi, jawaban=awal)
+    if status != "tanya" and not awal:
+        raise HTTPException(status_code=400, detail="Tidak ada pertanyaan. Cek data aturan.")
 
-    status, q_or_p, prog = langkah_berikutnya(db, sesi)
+    kode_hasil = sesi.kode_penyakit or (q_or_p.kode if status == "selesai" else None)
+    pesan = None
     if status != "tanya":
-        raise HTTPException(status_code=400, detail="Tidak ada pertanyaan. Cek data aturan.")
+        # jawaban profil sudah cukup untuk memutuskan: sesi langsung selesai tanpa pertanyaan
+        if status == "selesai":
+            pesan = _pesan_selesai(basis, [k for k, st in kandidat.items() if st == "terbukti"])
+        else:
+            pesan = NO_DIAGNOSA_TEXT
+        sesi.status = status
+    penyimpanan.buat(db, sesi)
+    if status != "tanya":
+        simpan_riwayat(db, basis, sesi, status, pesan, kode_penyakit=kode_hasil)
+    db.commit()
+
+    hasil = basis.penyakit.get(kode_hasil) if kode_hasil else None
     return DiagnosaMulaiKeluar(
         sesi_id=sid,
-        penyakit=PenyakitKeluar(kode=p.kode, nama=p.nama, pengertian=p.pengertian, penyebab=p.penyebab),
-        pertanyaan=Pertanyaan(**q_or_p),
+        status=status,
+        pesan=pesan,
+        penyakit=PenyakitKeluar(kode=hasil.kode, nama=hasil.nama, pengertian=hasil.pengertian, penyebab=hasil.penyebab) if hasil else None,
+        solusi=[
+            SolusiKeluar(kode=s.kode, deskripsi=s.deskripsi, urutan=s.urutan) for s in basis.solusi.get(kode_hasil, ())
+        ] if status != "tanya" else None,
+        pertanyaan=Pertanyaan(**q_or_p) if status == "tanya" else None,
         progres=Progres(**prog),
+        kandidat=_daftar_kandidat(basis, sesi, kandidat),
+        profil=sesi.profil,
     )
 
-@router.post("/jawab", response_model=DiagnosaHasilKeluar)
+@router.post("/jawab", response_model=DiagnosaHasilKeluar, response_class=ResponJSON)
+@dukung_async(blokir=store_memblokir)
 def jawab(payload: DiagnosaJawabMasuk, db: Session = Depends(get_db)):
-    sesi = db.get(SesiDiagnosa, payload.sesi_id)
+    sesi = penyimpanan.ambil(db, payload.sesi_id)
     if not sesi:
-        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan")
+        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan atau sudah kedaluwarsa")
     if sesi.status != "aktif":
         raise HTTPException(status_code=400, detail="Sesi sudah selesai")
+    if sesi.kedaluwarsa:
+        raise HTTPException(status_code=410, detail="Sesi kedaluwarsa. Silakan mulai diagnosa baru.")
 
-    # upsert jawaban
-    existing = db.scalar(select(JawabanDiagnosa).where(
-        JawabanDiagnosa.sesi_id == payload.sesi_id,
-        JawabanDiagnosa.kode_gejala == payload.kode_gejala
-    ))
-    if existing:
-        existing.jawaban = payload.jawaban
-        db.add(existing)
+    # satu snapshot untuk seluruh request: langkah, riwayat, dan body respons
+    basis = basis_aktif(db)
+
+    # Jawaban, status sesi, dan riwayat ditulis dalam satu transaksi (backend
+    # mysql) atau diterapkan ke penyimpanan sesi setelah commit; satu commit
+    # di akhir request.
+    penyimpanan.simpan_jawaban(db, sesi, payload.kode_gejala, payload.jawaban)
+
+    status, q_or_p, prog, kandidat = langkah_berikutnya(db, basis, sesi)
+
+    # mode semua: detail penyakit baru ada setelah ada yang terbukti
+    kode_hasil = sesi.kode_penyakit or (q_or_p.kode if status == "selesai" else None)
+
+    if status == "tanya":
+        pesan = "Lanjut pertanyaan berikutnya."
+    elif status == "selesai":
+        pesan = _pesan_selesai(basis, [k for k, st in kandidat.items() if st == "terbukti"])
+        penyimpanan.selesai(db, sesi, "selesai")
+        simpan_riwayat(db, basis, sesi, "selesai", pesan, kode_penyakit=kode_hasil)
     else:
-        db.add(JawabanDiagnosa(sesi_id=payload.sesi_id, kode_gejala=payload.kode_gejala, jawaban=payload.jawaban))
+        pesan = NO_DIAGNOSA_TEXT
+        penyimpanan.selesai(db, sesi, "tidak_terpenuhi")
+        simpan_riwayat(db, basis, sesi, "tidak_terpenuhi", NO_DIAGNOSA_TEXT)
     db.commit()
 
-    status, q_or_p, prog = langkah_berikutnya(db, sesi)
+    # Body dirakit dari potongan JSON: detail penyakit + solusi sudah di-render
+    # sekali per versi basis pengetahuan, sisanya field dinamis per langkah.
+    # `ringkas` melewati detail penyakit di langkah "tanya" (isinya tidak berubah).
+    if payload.ringkas and status == "tanya":
+        detail = solusi = None
+    elif kode_hasil:
+        detail, solusi = fragmen_penyakit(basis, kode_hasil)
+    else:
+        detail, solusi = b"null", b"[]"
+    daftar_kandidat = _daftar_kandidat(basis, sesi, kandidat)
+    return ResponJSON(rakit({
+        "status": dumps(status),
+        "pesan": dumps(pesan),
+        "sesi_id": dumps(sesi.id),
+        "biodata": dumps({"nama": sesi.nama, "umur": sesi.umur, "jk": sesi.jk, "alamat": sesi.alamat}),
+        "penyakit": detail,
+        "solusi": solusi,
+        "pertanyaan": dumps(q_or_p if status == "tanya" else None),
+        "progres": dumps(prog),
+        "kandidat": dumps([k.model_dump() for k in daftar_kandidat] if daftar_kandidat is not None else None),
+    }))
 
-    p = db.get(Penyakit, sesi.kode_penyakit)
-    sol = solusi_penyakit(db, sesi.kode_penyakit)
-    penyakit_detail = PenyakitDetailKeluar(
-        kode=p.kode,
-        nama=p.nama,
-        pengertian=p.pengertian,
-        penyebab=p.penyebab,
-        solusi=[SolusiKeluar(kode=s.kode, deskripsi=s.deskripsi, urutan=s.urutan) for s in sol]
-    )
-    biodata = Biodata(nama=sesi.nama, umur=sesi.umur, jk=sesi.jk, alamat=sesi.alamat)
+@router.post("/batch", response_model=DiagnosaBatchKeluar)
+@dukung_async
+def batch(
+    payload: Union[DiagnosaBatchMasuk, List[DiagnosaBatchMasuk]] = Body(...),
+    db: Session = Depends(get_db),
+):
+    """Diagnosa sekali jalan untuk kasus yang semua jawabannya sudah diketahui.
 
-    if status == "tanya":
-        return DiagnosaHasilKeluar(
-            status="tanya",
-            pesan="Lanjut pertanyaan berikutnya.",
-            sesi_id=sesi.id,
-            biodata=biodata,
-            penyakit=penyakit_detail,
-            solusi=penyakit_detail.solusi,
-            pertanyaan=Pertanyaan(**q_or_p),
-            progres=Progres(**prog),
+    Tiap kasus dievaluasi di memori terhadap snapshot basis pengetahuan, lalu
+    riwayat semua kasus (plus sesi & jawaban kalau SESI_STORE=mysql) ditulis
+    dengan bulk insert dalam satu transaksi. Premis yang tidak ada jawabannya
+    dianggap belum terpenuhi.
+    """
+    kasus = payload if isinstance(payload, list) else [payload]
+    if len(kasus) > settings.BATCH_MAX_KASUS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {settings.BATCH_MAX_KASUS} kasus per request")
+
+    basis = basis_aktif(db)
+    sesi_rows, jawaban_rows, riwayat_rows, hasil = [], [], [], []
+    for i, k in enumerate(kasus, start=1):
+        if k.kode_penyakit and k.kode_penyakit not in basis.penyakit:
+            raise HTTPException(status_code=404, detail=f"Kasus #{i}: Penyakit tidak ditemukan")
+        asing = [kg for kg in k.jawaban if kg not in basis.gejala]
+        if asing:
+            raise HTTPException(status_code=400, detail=f"Kasus #{i}: Kode gejala tidak ditemukan: {', '.join(asing)}")
+
+        sesi = DataSesi(
+            id=str(uuid.uuid4()),
+            nama=k.nama,
+            umur=k.umur,
+            jk=k.jk,
+            alamat=k.alamat,
+            kode_penyakit=k.kode_penyakit,
+            mode="tunggal" if k.kode_penyakit else "semua",
+            strategi="urutan",
         )
+        ya, tidak = masker_jawaban(basis, k.jawaban)
+        terbukti, mungkin = evaluasi(basis, ya, tidak, kandidat_sesi(basis, sesi))
 
-    if status == "selesai":
-        sesi.status = "selesai"
-        db.add(sesi)
-        db.commit()
-        pesan = f"Gejala yang kamu jawab cocok dengan aturan untuk {p.nama}."
-        simpan_riwayat(db, sesi, "selesai", pesan)
-        return DiagnosaHasilKeluar(
-            status="selesai",
-            pesan=pesan,
-            sesi_id=sesi.id,
-            biodata=biodata,
-            penyakit=penyakit_detail,
-            solusi=penyakit_detail.solusi,
-            progres=Progres(**prog),
+        if terbukti:
+            status, pesan, kode_hasil = "selesai", _pesan_selesai(basis, terbukti), terbukti[0]
+        else:
+            status, pesan, kode_hasil = "tidak_terpenuhi", NO_DIAGNOSA_TEXT, None
+        sesi.status = status
+
+        belum = list(dict.fromkeys(
+            kg for kp in mungkin for kg in basis.premis[kp] if kg not in k.jawaban
+        ))
+
+        sesi_rows.append({
+            "id": sesi.id, "nama": sesi.nama, "umur": sesi.umur, "jk": sesi.jk, "alamat": sesi.alamat,
+            "kode_penyakit": sesi.kode_penyakit, "mode": sesi.mode, "strategi": sesi.strategi, "status": status,
+        })
+        jawaban_rows.extend(
+            {"sesi_id": sesi.id, "kode_gejala": kg, "jawaban": v} for kg, v in k.jawaban.items()
         )
+        riwayat_rows.append(baris_riwayat(basis, sesi, status, pesan, kode_hasil))
+        hasil.append(DiagnosaBatchHasil(
+            sesi_id=sesi.id,
+            status=status,
+            pesan=pesan,
+            kode_penyakit=kode_hasil or sesi.kode_penyakit,
+            terbukti=[Kandidat(kode=kp, nama=basis.penyakit[kp].nama, status="terbukti") for kp in terbukti],
+            belum_dijawab=belum,
+        ))
 
-    # tidak_terpenuhi
-    sesi.status = "tidak_terpenuhi"
-    db.add(sesi)
+    if penyimpanan.di_db and sesi_rows:
+        db.execute(insert(SesiDiagnosa), sesi_rows)
+    if penyimpanan.di_db and jawaban_rows:
+        db.execute(insert(JawabanDiagnosa), jawaban_rows)
+    if riwayat_rows:
+        db.execute(insert(RiwayatDiagnosa), riwayat_rows)
+        statistik.catat(db, riwayat_rows)
     db.commit()
-    simpan_riwayat(db, sesi, "tidak_terpenuhi", NO_DIAGNOSA_TEXT)
-    return DiagnosaHasilKeluar(
-        status="tidak_terpenuhi",
-        pesan=NO_DIAGNOSA_TEXT,
+    return DiagnosaBatchKeluar(jumlah=len(hasil), hasil=hasil)
+
+@router.post("/peringkat", response_model=DiagnosaPeringkatKeluar)
+@dukung_async
+def peringkat_jawaban(payload: DiagnosaPeringkatMasuk, db: Session = Depends(get_db)):
+    """Diagnosa diferensial: top-k penyakit berdasarkan bobot premis, tanpa membuat sesi.
+
+    Tidak seperti /jawab, jawaban "Tidak" hanya menurunkan keyakinan, tidak
+    menggugurkan penyakit (lihat peringkat.py).
+    """
+    basis = basis_aktif(db)
+    asing = [kg for kg in payload.jawaban if kg not in basis.gejala]
+    if asing:
+        raise HTTPException(status_code=400, detail=f"Kode gejala tidak ditemukan: {', '.join(asing)}")
+    return DiagnosaPeringkatKeluar(
+        peringkat=[KandidatPeringkat(**p._asdict()) for p in peringkat(basis, payload.jawaban, payload.k)]
+    )
+
+@router.get("/peringkat/{sesi_id}", response_model=DiagnosaPeringkatKeluar)
+@dukung_async(blokir=store_memblokir)
+def peringkat_sesi(sesi_id: str, k: int = Query(5, ge=1, le=50), db: Session = Depends(get_db)):
+    """Peringkat penyakit dari jawaban sesi sejauh ini (bisa dipanggil di tengah sesi)."""
+    sesi = penyimpanan.ambil(db, sesi_id)
+    if not sesi:
+        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan atau sudah kedaluwarsa")
+    basis = basis_aktif(db)
+    return DiagnosaPeringkatKeluar(
         sesi_id=sesi.id,
-        biodata=biodata,
-        penyakit=penyakit_detail,
-        solusi=penyakit_detail.solusi,
-        progres=Progres(**prog),
+        peringkat=[KandidatPeringkat(**p._asdict()) for p in peringkat(basis, penyimpanan.jawaban(db, sesi), k)],
     )
@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from ..db import async_engine, engine
+from ..pemanasan import status
+
+router = APIRouter(tags=["kesehatan"])
+
+# /healthz hanya menandakan proses hidup (liveness); /readyz baru 200 kalau
+# pemanasan selesai dan DB bisa dihubungi (readiness).
+
+def _ping() -> None:
+    with engine.connect() as k:
+        k.execute(text("SELECT 1"))
+
+async def _ping_async() -> None:
+    async with async_engine.connect() as k:
+        await k.execute(text("SELECT 1"))
+
+@router.get("/healthz")
+def healthz():
+    return {"status": "hidup"}
+
+@router.get("/readyz")
+async def readyz():
+    if not status.siap:
+        return JSONResponse(status_code=503, content={"status": "pemanasan", **status.ke_dict()})
+    try:
+        if async_engine is not None:
+            await _ping_async()
+        else:
+            await run_in_threadpool(_ping)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "db_tidak_terjangkau", "galat": f"{type(e).__name__}: {e}"})
+    return {"status": "siap", **status.ke_dict()}
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ..dependensi import wajib_token_metrik
+from ..admisi import prometheus_admisi
+from ..instrumentasi import prometheus
+from ..pengetahuan import prometheus_basis
+
+router = APIRouter(tags=["metrik"])
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(wajib_token_metrik)])
+def metrics():
+    """Metrik per route (durasi, waktu & jumlah query DB), admission control, dan kesegaran
+    snapshot basis pengetahuan dalam format teks Prometheus."""
+    teks = prometheus() + "\n".join([*prometheus_admisi(), *prometheus_basis()]) + "\n"
+    return PlainTextResponse(teks, media_type="text/plain; version=0.0.4; charset=utf-8")
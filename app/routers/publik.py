@@ -1,30 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import select
 from ..db import get_db
-from ..model import Penyakit, Gejala, Solusi
-from ..skema import PenyakitKeluar, PenyakitDetailKeluar, GejalaKeluar, SolusiKeluar
+from ..dependensi import dukung_async
+from ..konfigurasi import settings
+from ..pengetahuan import BasisPengetahuan, basis_aktif
+from ..respon import fragmen_penyakit
+from ..skema import PenyakitKeluar, PenyakitDetailKeluar, GejalaKeluar
 
 router = APIRouter(prefix="/api", tags=["publik"])
 
+# Katalog publik dilayani dari snapshot basis pengetahuan: body JSON dan ETag-nya
+# dihitung sekali per versi, lalu If-None-Match yang cocok dijawab 304 tanpa
+# query DB maupun serialisasi ulang. Versi naik setiap admin mengubah data.
+
+def _dengan_etag(body: bytes) -> tuple[bytes, str]:
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _serialisasi(model, data) -> tuple[bytes, str]:
+    return _dengan_etag(TypeAdapter(model).dump_json(data))
+
+def _etag_cocok(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tag = [t.strip() for t in inm.split(",")]
+    return "*" in tag or etag in tag or f"W/{etag}" in tag
+
+def _respon(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.KATALOG_MAX_AGE}, must-revalidate"}
+    if _etag_cocok(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def katalog_penyakit(basis: BasisPengetahuan) -> tuple[bytes, str]:
+    return basis.memo(("publik", "penyakit"), lambda: _serialisasi(
+        list[PenyakitKeluar], [PenyakitKeluar.model_validate(p) for p in basis.penyakit.values()]
+    ))
+
+def katalog_gejala(basis: BasisPengetahuan) -> tuple[bytes, str]:
+    return basis.memo(("publik", "gejala"), lambda: _serialisasi(
+        list[GejalaKeluar], [GejalaKeluar(kode=k, nama=n) for k, n in basis.gejala.items()]
+    ))
+
 @router.get("/penyakit", response_model=list[PenyakitKeluar])
-def list_penyakit(db: Session = Depends(get_db)):
-    return list(db.scalars(select(Penyakit).order_by(Penyakit.kode)).all())
+@dukung_async
+def list_penyakit(request: Request, db: Session = Depends(get_db)):
+    return _respon(request, *katalog_penyakit(basis_aktif(db)))
 
 @router.get("/penyakit/{kode}", response_model=PenyakitDetailKeluar)
-def detail_penyakit(kode: str, db: Session = Depends(get_db)):
-    p = db.get(Penyakit, kode)
-    if not p:
+@dukung_async
+def detail_penyakit(kode: str, request: Request, db: Session = Depends(get_db)):
+    basis = basis_aktif(db)
+    if kode not in basis.penyakit:
         raise HTTPException(status_code=404, detail="Penyakit tidak ditemukan")
-    solusi = list(db.scalars(select(Solusi).where(Solusi.kode_penyakit==kode).order_by(Solusi.urutan)).all())
-    return PenyakitDetailKeluar(
-        kode=p.kode,
-        nama=p.nama,
-        pengertian=p.pengertian,
-        penyebab=p.penyebab,
-        solusi=[SolusiKeluar(kode=s.kode, deskripsi=s.deskripsi, urutan=s.urutan) for s in solusi]
-    )
+    # body sama dengan potongan detail penyakit yang dipakai response diagnosa
+    body, etag = basis.memo(("publik", "penyakit", kode), lambda: _dengan_etag(fragmen_penyakit(basis, kode)[0]))
+    return _respon(request, body, etag)
 
 @router.get("/gejala", response_model=list[GejalaKeluar])
-def list_gejala(db: Session = Depends(get_db)):
-    return list(db.scalars(select(Gejala).order_by(Gejala.kode)).all())
+@dukung_async
+def list_gejala(request: Request, db: Session = Depends(get_db)):
+    return _respon(request, *katalog_gejala(basis_aktif(db)))
@@ -0,0 +1,470 @@
+"""State sesi diagnosa aktif: penyimpanan (pluggable), TTL, dan pembersihan.
+
+Selama tanya-jawab, state sesi (biodata, mode, jawaban) cukup disimpan di
+`PenyimpananSesi` yang dipilih lewat SESI_STORE:
+
+- "mysql"  : tabel sesi_diagnosa + jawaban_diagnosa (perilaku awal).
+- "memori" : LRU + TTL di memori proses, untuk deployment satu node/worker.
+- "redis"  : server berprotokol Redis (Redis, Valkey, KeyDB, ...), TTL native.
+
+Untuk backend selain mysql, MySQL hanya ditulis saat sesi selesai (riwayat),
+jadi putaran pertanyaan tidak menyentuh DB sama sekali.
+
+Sesi boleh membawa `profil` (id profil jawaban pasien). Jawaban sesi lain
+dengan profil yang sama, asalkan sesi itu dibuat dalam PROFIL_TTL_MENIT
+terakhir, ikut dikembalikan oleh `jawaban()` (semua backend memakai arti TTL
+yang sama; kalau beberapa sesi menjawab gejala yang sama, jawaban sesi yang
+paling baru dibuat yang dipakai), jadi gejala yang sudah pernah dijawab tidak ditanyakan ulang saat
+pasien memeriksa penyakit berikutnya, dan tidak ditulis ulang ke DB.
+
+Sesi yang masih "aktif" lewat SESI_TTL_MENIT sejak dibuat dianggap ditinggalkan:
+jawaban yang datang terlambat ditolak (410), dan task latar belakang yang
+dijalankan dari lifespan app membersihkannya (backend mysql: hapus per batch
+kecil supaya lock baris tetap pendek). Sesi yang sudah selesai tidak dihapus
+dari MySQL.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, event, func, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .konfigurasi import settings
+from .metrik import Counter, Histogram
+from .model import JawabanDiagnosa, SesiDiagnosa
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class DataSesi:
+    """State satu sesi diagnosa, apa pun backend penyimpanannya."""
+    id: str
+    nama: str
+    umur: int
+    jk: str
+    alamat: str
+    kode_penyakit: Optional[str]
+    mode: str = "tunggal"
+    strategi: str = "urutan"
+    profil: Optional[str] = None
+    status: str = "aktif"
+    dibuat: float = field(default_factory=time.time)  # epoch detik
+    jawaban: dict[str, bool] = field(default_factory=dict)
+    kedaluwarsa: bool = False
+
+
+class StatPurge:
+    def __init__(self):
+        self.sesi = Counter()  # total sesi yang dihapus
+        self.jawaban = Counter()
+        self.putaran = Counter()
+        self.gagal = Counter()
+        self.durasi = Histogram()
+        self.terakhir: Optional[float] = None  # epoch detik putaran terakhir
+
+    def ke_dict(self) -> dict:
+        return {
+            "sesi_dihapus": self.sesi.nilai,
+            "jawaban_dihapus": self.jawaban.nilai,
+            "putaran": self.putaran.nilai,
+            "gagal": self.gagal.nilai,
+            "durasi_detik": self.durasi.ke_dict(),
+            "terakhir": self.terakhir,
+        }
+
+
+stat = StatPurge()
+
+
+def _ttl_detik() -> float:
+    return settings.SESI_TTL_MENIT * 60
+
+
+def _lewat_ttl(dibuat: float, sekarang: float) -> bool:
+    return settings.SESI_TTL_MENIT > 0 and dibuat < sekarang - _ttl_detik()
+
+
+def _ttl_profil_detik() -> float:
+    return settings.PROFIL_TTL_MENIT * 60
+
+
+def _menit_lalu(db: Session, menit: int):
+    """Ekspresi SQL "jam server DB dikurangi `menit`" (MySQL, atau SQLite untuk uji/benchmark)."""
+    if db.get_bind().dialect.name == "mysql":
+        return func.date_sub(func.now(), text(f"INTERVAL {int(menit)} MINUTE"))
+    return func.datetime("now", f"-{int(menit)} minutes")
+
+
+class PenyimpananSesi:
+    """Antarmuka penyimpanan sesi aktif. Penulisan ke `db` tidak di-commit di sini;
+    perubahan state di backend non-DB baru diterapkan setelah commit pemanggil."""
+
+    # True kalau sesi & jawaban ikut ditulis ke MySQL (dipakai jalur batch)
+    di_db = False
+
+    def buat(self, db: Session, sesi: DataSesi) -> None:
+        raise NotImplementedError
+
+    def ambil(self, db: Session, sesi_id: str) -> Optional[DataSesi]:
+        """Sesi beserta flag `kedaluwarsa`; None kalau tidak ada (atau sudah dibersihkan)."""
+        raise NotImplementedError
+
+    def jawaban(self, db: Session, sesi: DataSesi) -> dict[str, bool]:
+        """Jawaban sesi, ditambah jawaban sesi lain di profil yang sama (jawaban sesi ini menang)."""
+        return sesi.jawaban
+
+    def simpan_jawaban(self, db: Session, sesi: DataSesi, kode_gejala: str, jawaban: bool) -> None:
+        raise NotImplementedError
+
+    def selesai(self, db: Session, sesi: DataSesi, status: str) -> None:
+        """Tandai sesi selesai/tidak_terpenuhi (bersamaan dengan commit riwayat)."""
+        raise NotImplementedError
+
+    def jumlah_aktif(self, db: Session) -> Optional[int]:
+        return None
+
+    def purge(self) -> tuple[int, int]:
+        """Bersihkan sesi kedaluwarsa; (jumlah sesi, jumlah jawaban) yang dihapus."""
+        return 0, 0
+
+    @staticmethod
+    def _setelah_commit(db: Session, fn) -> None:
+        event.listen(db, "after_commit", lambda _s: fn(), once=True)
+
+
+class PenyimpananMySQL(PenyimpananSesi):
+    di_db = True
+
+    def buat(self, db, sesi):
+        db.add(SesiDiagnosa(
+            id=sesi.id, nama=sesi.nama, umur=sesi.umur, jk=sesi.jk, alamat=sesi.alamat,
+            kode_penyakit=sesi.kode_penyakit, mode=sesi.mode, strategi=sesi.strategi, status=sesi.status,
+            profil_id=sesi.profil,
+        ))
+
+    def ambil(self, db, sesi_id):
+        # jam server DB ikut diambil di query yang sama untuk cek TTL sesi
+        row = db.execute(select(SesiDiagnosa, func.now()).where(SesiDiagnosa.id == sesi_id)).first()
+        if not row:
+            return None
+        s, sekarang = row
+        return DataSesi(
+            id=s.id, nama=s.nama, umur=s.umur, jk=s.jk, alamat=s.alamat, kode_penyakit=s.kode_penyakit,
+            mode=s.mode, strategi=s.strategi, profil=s.profil_id, status=s.status,
+            kedaluwarsa=kedaluwarsa(s, sekarang),
+        )
+
+    def jawaban(self, db, sesi):
+        from .mesin import peta_jawaban
+        if not sesi.profil:
+            return peta_jawaban(db, sesi.id)
+        # jendela TTL di WHERE supaya ix_sesi_profil (profil_id, created_at) membatasi
+        # sesi yang dibaca; tanpa ORDER BY, pemenang dipilih di sini dari created_at
+        rows = db.execute(
+            select(JawabanDiagnosa.kode_gejala, JawabanDiagnosa.jawaban, SesiDiagnosa.id, SesiDiagnosa.created_at)
+            .join(SesiDiagnosa, SesiDiagnosa.id == JawabanDiagnosa.sesi_id)
+            .where(
+                SesiDiagnosa.profil_id == sesi.profil,
+                or_(SesiDiagnosa.created_at >= _menit_lalu(db, settings.PROFIL_TTL_MENIT), SesiDiagnosa.id == sesi.id),
+            )
+        ).all()
+        lain: dict[str, tuple[tuple, bool]] = {}
+        sendiri = {}
+        for kg, v, sid, dibuat in rows:
+            if sid == sesi.id:
+                sendiri[kg] = bool(v)
+                continue
+            urut = (dibuat or datetime.min, sid)
+            if kg not in lain or urut > lain[kg][0]:
+                lain[kg] = (urut, bool(v))
+        return {**{kg: v for kg, (_, v) in lain.items()}, **sendiri}
+
+    def simpan_jawaban(self, db, sesi, kode_gejala, jawaban):
+        from .mesin import simpan_jawaban
+        simpan_jawaban(db, sesi.id, kode_gejala, jawaban)
+
+    def selesai(self, db, sesi, status):
+        db.execute(update(SesiDiagnosa).where(SesiDiagnosa.id == sesi.id).values(status=status))
+        sesi.status = status
+
+    def jumlah_aktif(self, db):
+        return db.scalar(select(func.count()).select_from(SesiDiagnosa).where(SesiDiagnosa.status == "aktif")) or 0
+
+    def purge(self):
+        with SessionLocal() as db:
+            return purge(db, settings.SESI_PURGE_BATCH)
+
+
+class PenyimpananMemori(PenyimpananSesi):
+    """LRU + TTL di memori proses. State hilang saat restart dan tidak dibagi antar
+    worker, jadi hanya cocok untuk satu proses (atau sticky session)."""
+
+    def __init__(self, maks: int):
+        self.maks = maks
+        self._data: OrderedDict[str, DataSesi] = OrderedDict()
+        # profil -> kode gejala -> (epoch sesi yang menjawab dibuat, jawaban)
+        self._profil: OrderedDict[str, dict[str, tuple[float, bool]]] = OrderedDict()
+        self._kunci = threading.Lock()
+        self.dibuang = Counter()  # sesi aktif yang tergusur LRU sebelum TTL
+
+    def buat(self, db, sesi):
+        with self._kunci:
+            self._data[sesi.id] = sesi
+            while len(self._data) > self.maks:
+                _, lama = self._data.popitem(last=False)
+                if lama.status == "aktif":
+                    self.dibuang.tambah()
+            if sesi.profil:
+                self._isi_profil(sesi.profil)
+
+    def ambil(self, db, sesi_id):
+        with self._kunci:
+            s = self._data.get(sesi_id)
+            if s is None:
+                return None
+            self._data.move_to_end(sesi_id)
+        if s.status == "aktif" and _lewat_ttl(s.dibuat, time.time()):
+            s.kedaluwarsa = True
+        # salinan, supaya perubahan request yang gagal commit tidak bocor ke state bersama
+        return DataSesi(**{**asdict(s), "jawaban": dict(s.jawaban)})
+
+    def jawaban(self, db, sesi):
+        if not sesi.profil:
+            return sesi.jawaban
+        batas = time.time() - _ttl_profil_detik()
+        with self._kunci:
+            isi = self._profil.get(sesi.profil, {})
+            lain = {kg: v for kg, (dibuat, v) in isi.items() if dibuat >= batas}
+        return {**lain, **sesi.jawaban}
+
+    def _isi_profil(self, profil: str) -> dict[str, tuple[float, bool]]:
+        # dipanggil dengan self._kunci terpegang
+        isi = self._profil.pop(profil, None)
+        self._profil[profil] = isi = {} if isi is None else isi
+        while len(self._profil) > self.maks:
+            self._profil.popitem(last=False)
+        return isi
+
+    def simpan_jawaban(self, db, sesi, kode_gejala, jawaban):
+        sesi.jawaban[kode_gejala] = jawaban
+
+        def terapkan():
+            self._ubah(sesi.id, lambda s: s.jawaban.__setitem__(kode_gejala, jawaban))
+            if sesi.profil:
+                with self._kunci:
+                    isi = self._isi_profil(sesi.profil)
+                    lama = isi.get(kode_gejala)
+                    if lama is None or sesi.dibuat >= lama[0]:
+                        isi[kode_gejala] = (sesi.dibuat, jawaban)
+
+        self._setelah_commit(db, terapkan)
+
+    def selesai(self, db, sesi, status):
+        sesi.status = status
+        self._setelah_commit(db, lambda: self._ubah(sesi.id, lambda s: setattr(s, "status", status)))
+
+    def _ubah(self, sesi_id: str, fn) -> None:
+        with self._kunci:
+            s = self._data.get(sesi_id)
+            if s is not None:
+                fn(s)
+
+    def jumlah_aktif(self, db):
+        with self._kunci:
+            return sum(1 for s in self._data.values() if s.status == "aktif")
+
+    def purge(self):
+        # sesi selesai ikut dibuang setelah TTL; hasilnya sudah ada di riwayat MySQL
+        sekarang, n_sesi, n_jawaban = time.time(), 0, 0
+        with self._kunci:
+            for sid in [sid for sid, s in self._data.items() if _lewat_ttl(s.dibuat, sekarang)]:
+                n_jawaban += len(self._data.pop(sid).jawaban)
+                n_sesi += 1
+            batas = sekarang - _ttl_profil_detik()
+            for p in list(self._profil):
+                isi = {kg: x for kg, x in self._profil[p].items() if x[0] >= batas}
+                if isi:
+                    self._profil[p] = isi
+                else:
+                    del self._profil[p]
+        return n_sesi, n_jawaban
+
+
+class PenyimpananRedis(PenyimpananSesi):
+    """Satu hash per sesi (`<prefix><id>`): field `data` (JSON biodata & status) dan
+    `j:<kode_gejala>` = "1"/"0". Kedaluwarsa memakai EXPIRE Redis, jadi sesi yang
+    lewat TTL langsung hilang (jawaban terlambat dapat 404, bukan 410). Jawaban
+    profil disimpan di hash `<prefix>profil:<id>` (field = kode gejala, nilai
+    `<jawaban>:<epoch sesi dibuat>`), disaring saat dibaca dengan TTL yang sama
+    seperti backend lain; EXPIRE PROFIL_TTL_MENIT hanya membuang hash yang diam.
+    Kalau dua sesi aktif menjawab gejala yang sama, tulisan terakhir yang dipakai.
+
+    Perintah Redis dijalankan sinkron; pakai server lokal/dekat supaya tidak
+    menahan worker (atau event loop saat DB_ASYNC).
+    """
+
+    def __init__(self, klien, prefix: str = "sesi:"):
+        self.klien = klien
+        self.prefix = prefix
+
+    def _key(self, sesi_id: str) -> str:
+        return self.prefix + sesi_id
+
+    def _sisa_ttl(self, sesi: DataSesi) -> Optional[int]:
+        if settings.SESI_TTL_MENIT <= 0:
+            return None
+        return max(1, int(sesi.dibuat + _ttl_detik() - time.time()))
+
+    def _key_profil(self, profil: str) -> str:
+        return f"{self.prefix}profil:{profil}"
+
+    def _tulis(self, sesi: DataSesi, nilai: dict, profil: Optional[dict] = None) -> None:
+        key, ttl = self._key(sesi.id), self._sisa_ttl(sesi)
+        pipa = self.klien.pipeline()
+        pipa.hset(key, mapping=nilai)
+        if ttl is not None:
+            pipa.expire(key, ttl)
+        if sesi.profil and settings.PROFIL_TTL_MENIT > 0:
+            kp = self._key_profil(sesi.profil)
+            if profil:
+                pipa.hset(kp, mapping=profil)
+            pipa.expire(kp, int(_ttl_profil_detik()))
+        pipa.execute()
+
+    @staticmethod
+    def _data(sesi: DataSesi) -> str:
+        d = asdict(sesi)
+        del d["jawaban"], d["kedaluwarsa"]
+        return json.dumps(d)
+
+    def buat(self, db, sesi):
+        nilai = {"data": self._data(sesi)}
+        nilai.update((f"j:{k}", "1" if v else "0") for k, v in sesi.jawaban.items())
+        self._setelah_commit(db, lambda: self._tulis(sesi, nilai))
+
+    def ambil(self, db, sesi_id):
+        isi = self.klien.hgetall(self._key(sesi_id))
+        if not isi:
+            return None
+        isi = {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v) for k, v in isi.items()}
+        if "data" not in isi:
+            return None
+        sesi = DataSesi(**json.loads(isi["data"]))
+        sesi.jawaban = {k[2:]: v == "1" for k, v in isi.items() if k.startswith("j:")}
+        return sesi
+
+    def jawaban(self, db, sesi):
+        if not sesi.profil:
+            return sesi.jawaban
+        batas = time.time() - _ttl_profil_detik()
+        lain = {}
+        for k, v in self.klien.hgetall(self._key_profil(sesi.profil)).items():
+            k, v = (x.decode() if isinstance(x, bytes) else x for x in (k, v))
+            nilai, _, dibuat = v.partition(":")
+            if dibuat and float(dibuat) >= batas:
+                lain[k] = nilai == "1"
+        return {**lain, **sesi.jawaban}
+
+    def simpan_jawaban(self, db, sesi, kode_gejala, jawaban):
+        sesi.jawaban[kode_gejala] = jawaban
+        v = "1" if jawaban else "0"
+        p = f"{v}:{sesi.dibuat}"
+        self._setelah_commit(db, lambda: self._tulis(sesi, {f"j:{kode_gejala}": v}, {kode_gejala: p}))
+
+    def selesai(self, db, sesi, status):
+        sesi.status = status
+        self._setelah_commit(db, lambda: self._tulis(sesi, {"data": self._data(sesi)}))
+
+
+def buat_penyimpanan() -> PenyimpananSesi:
+    jenis = settings.SESI_STORE
+    if jenis == "mysql":
+        return PenyimpananMySQL()
+    if jenis == "memori":
+        return PenyimpananMemori(settings.SESI_MEMORI_MAKS)
+    if jenis == "redis":
+        try:
+            import redis
+        except ImportError as e:  # dependency opsional
+            raise RuntimeError("SESI_STORE=redis butuh paket redis (uv sync --extra redis)") from e
+        return PenyimpananRedis(redis.Redis.from_url(settings.SESI_REDIS_URL), settings.SESI_REDIS_PREFIX)
+    raise RuntimeError(f"SESI_STORE tidak dikenal: {jenis!r} (mysql|memori|redis)")
+
+
+penyimpanan: PenyimpananSesi = buat_penyimpanan()
+
+
+def store_memblokir() -> bool:
+    """Store sesi di luar DB memblokir thread pemanggil (klien Redis sync, lock store memori)."""
+    return not penyimpanan.di_db
+
+
+def kedaluwarsa(sesi: SesiDiagnosa, sekarang: datetime) -> bool:
+    """Sesi aktif di MySQL yang umurnya sudah lewat TTL (`sekarang` = waktu server DB)."""
+    ttl = settings.SESI_TTL_MENIT
+    return ttl > 0 and sesi.status == "aktif" and sesi.created_at is not None \
+        and sesi.created_at < sekarang - timedelta(minutes=ttl)
+
+
+def purge(db: Session, ukuran_batch: int) -> tuple[int, int]:
+    """Hapus semua sesi aktif yang kedaluwarsa dari MySQL, satu transaksi per batch.
+
+    Batas waktu dihitung dari jam server DB (sama dengan default created_at).
+    Mengembalikan (jumlah sesi, jumlah jawaban) yang dihapus. SESI_TTL_MENIT=0
+    berarti sesi tidak pernah kedaluwarsa, jadi tidak ada yang dihapus.
+    """
+    if settings.SESI_TTL_MENIT <= 0:
+        return 0, 0
+    batas = db.scalar(select(func.now())) - timedelta(minutes=settings.SESI_TTL_MENIT)
+    total_sesi = total_jawaban = 0
+    while True:
+        ids = db.scalars(
+            select(SesiDiagnosa.id)
+            .where(SesiDiagnosa.status == "aktif", SesiDiagnosa.created_at < batas)
+            .limit(ukuran_batch)
+        ).all()
+        if not ids:
+            break
+        total_jawaban += db.execute(delete(JawabanDiagnosa).where(JawabanDiagnosa.sesi_id.in_(ids))).rowcount or 0
+        total_sesi += db.execute(delete(SesiDiagnosa).where(SesiDiagnosa.id.in_(ids))).rowcount or 0
+        db.commit()
+        if len(ids) < ukuran_batch:
+            break
+    return total_sesi, total_jawaban
+
+
+def purge_sekali() -> int:
+    mulai = time.perf_counter()
+    try:
+        n_sesi, n_jawaban = penyimpanan.purge()
+    except Exception:
+        stat.gagal.tambah()
+        raise
+    finally:
+        stat.putaran.tambah()
+        stat.durasi.amati(time.perf_counter() - mulai)
+        stat.terakhir = time.time()
+    stat.sesi.tambah(n_sesi)
+    stat.jawaban.tambah(n_jawaban)
+    if n_sesi:
+        log.info("purge sesi: %d sesi, %d jawaban dihapus", n_sesi, n_jawaban)
+    return n_sesi
+
+
+async def loop_purge() -> None:
+    """Jalankan purge tiap SESI_PURGE_INTERVAL detik (di thread terpisah) sampai dibatalkan."""
+    while True:
+        try:
+            await asyncio.to_thread(purge_sekali)
+        except Exception:
+            log.exception("purge sesi gagal")
+        await asyncio.sleep(settings.SESI_PURGE_INTERVAL)
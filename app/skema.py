@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
+from typing import Optional, List, Literal, Dict
 
 
 class ORMBase(BaseModel):
@@ -42,7 +42,13 @@ class Biodata(BaseModel):
     alamat: str
 
 class DiagnosaMulaiMasuk(Biodata):
-    kode_penyakit: str = Field(min_length=2, max_length=3)
+    # mode "tunggal": cek satu penyakit pilihan; mode "semua": telusuri semua penyakit sekaligus
+    mode: Literal["tunggal", "semua"] = "tunggal"
+    kode_penyakit: Optional[str] = Field(default=None, min_length=2, max_length=3)
+    # "urutan": tanya sesuai Aturan.urutan; "informasi": tanya gejala yang paling banyak memangkas kandidat
+    strategi: Literal["urutan", "informasi"] = "urutan"
+    # id profil dari response /mulai sebelumnya: gejala yang sudah dijawab tidak ditanya ulang
+    profil: Optional[str] = Field(default=None, pattern=r"^[0-9a-f-]{36}$")
 
 class Pertanyaan(BaseModel):
     kode_gejala: str
@@ -52,23 +58,68 @@ class Progres(BaseModel):
     ditanya: int
     total: int
 
+class Kandidat(BaseModel):
+    kode: str
+    nama: str
+    status: str  # terbukti|mungkin
+
 class DiagnosaMulaiKeluar(ORMBase):
     sesi_id: str
-    penyakit: PenyakitKeluar
-    pertanyaan: Pertanyaan
+    # "tanya", atau langsung selesai|tidak_terpenuhi kalau jawaban profil sudah cukup
+    status: str = "tanya"
+    pesan: Optional[str] = None
+    penyakit: Optional[PenyakitKeluar] = None
+    solusi: Optional[List[SolusiKeluar]] = None
+    pertanyaan: Optional[Pertanyaan] = None
     progres: Progres
+    kandidat: Optional[List[Kandidat]] = None
+    profil: Optional[str] = None
 
 class DiagnosaJawabMasuk(BaseModel):
     sesi_id: str
     kode_gejala: str
     jawaban: bool
+    # True: langkah "tanya" tidak mengulang detail penyakit & solusi (hemat bytes)
+    ringkas: bool = False
 
 class DiagnosaHasilKeluar(ORMBase):
     status: str  # tanya|selesai|tidak_terpenuhi
     pesan: str
     sesi_id: str
     biodata: Biodata
-    penyakit: PenyakitDetailKeluar
+    penyakit: Optional[PenyakitDetailKeluar] = None
     solusi: List[SolusiKeluar] = []
     pertanyaan: Optional[Pertanyaan] = None
     progres: Optional[Progres] = None
+    kandidat: Optional[List[Kandidat]] = None  # hanya diisi untuk mode "semua"
+
+class DiagnosaBatchMasuk(Biodata):
+    # kosongkan kode_penyakit untuk memeriksa semua penyakit sekaligus
+    kode_penyakit: Optional[str] = Field(default=None, min_length=2, max_length=3)
+    jawaban: Dict[str, bool]  # kode_gejala -> Ya/Tidak
+
+class KandidatPeringkat(BaseModel):
+    kode: str
+    nama: str
+    keyakinan: float  # 0..1, 1.0 = semua premis dijawab "Ya"
+    terjawab: float  # porsi bobot premis yang sudah dijawab
+
+class DiagnosaPeringkatMasuk(BaseModel):
+    jawaban: Dict[str, bool]  # kode_gejala -> Ya/Tidak, boleh sebagian
+    k: int = Field(default=5, ge=1, le=50)
+
+class DiagnosaPeringkatKeluar(BaseModel):
+    sesi_id: Optional[str] = None
+    peringkat: List[KandidatPeringkat] = []
+
+class DiagnosaBatchHasil(BaseModel):
+    sesi_id: str
+    status: str  # selesai|tidak_terpenuhi
+    pesan: str
+    kode_penyakit: Optional[str] = None
+    terbukti: List[Kandidat] = []
+    belum_dijawab: List[str] = []  # premis kandidat yang masih terbuka karena tidak ada jawabannya
+
+class DiagnosaBatchKeluar(BaseModel):
+    jumlah: int
+    hasil: List[DiagnosaBatchHasil]
@@ -0,0 +1,103 @@
+"""Statistik diagnosa yang dirawat inkremental (tabel statistik_diagnosa).
+
+Setiap insert riwayat juga menaikkan satu counter per (tanggal, penyakit,
+status, jk, kelompok umur) di transaksi yang sama, jadi dashboard cukup
+menjumlah bucket counter alih-alih COUNT(*) atas seluruh riwayat_diagnosa.
+"""
+from collections import Counter
+from datetime import date
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from .db import upsert
+from .model import RiwayatDiagnosa, StatistikDiagnosa
+
+# (batas atas umur, label); umur di atas batas terakhir masuk ">60"
+KELOMPOK_UMUR = ((17, "<18"), (25, "18-25"), (35, "26-35"), (45, "36-45"), (60, "46-60"))
+KELOMPOK_UMUR_SISA = ">60"
+
+DIMENSI = ("tanggal", "kode_penyakit", "status", "jk", "kelompok_umur")
+
+
+def kelompok_umur(umur: int) -> str:
+    for batas, label in KELOMPOK_UMUR:
+        if umur <= batas:
+            return label
+    return KELOMPOK_UMUR_SISA
+
+
+def catat(db: Session, riwayat: Iterable[dict]) -> None:
+    """Naikkan counter untuk baris riwayat (dict kolom RiwayatDiagnosa) yang sedang
+    di-insert; dijalankan di transaksi pemanggil, commit dilakukan pemanggil.
+
+    Tanggal diambil dari CURRENT_DATE server DB supaya sejalan dengan
+    default created_at riwayat.
+    """
+    hitung = Counter(
+        (r["kode_penyakit"], r["status"], r["jk"], kelompok_umur(r["umur"])) for r in riwayat
+    )
+    kolom = StatistikDiagnosa.__table__.c
+    for (kp, status, jk, ku), n in hitung.items():
+        upsert(
+            db, StatistikDiagnosa,
+            {"tanggal": func.current_date(), "kode_penyakit": kp, "status": status, "jk": jk,
+             "kelompok_umur": ku, "jumlah": n},
+            kunci=list(DIMENSI),
+            ubah={"jumlah": kolom.jumlah + n},
+        )
+
+
+def rekap(
+    db: Session,
+    per: Sequence[str],
+    dari: Optional[date] = None,
+    sampai: Optional[date] = None,
+    kode_penyakit: Optional[str] = None,
+    status: Optional[str] = None,
+) -> list[dict]:
+    """Jumlah riwayat dikelompokkan menurut dimensi `per` (subset DIMENSI)."""
+    kolom = [getattr(StatistikDiagnosa, d) for d in per]
+    stmt = select(*kolom, func.sum(StatistikDiagnosa.jumlah).label("jumlah"))
+    if dari:
+        stmt = stmt.where(StatistikDiagnosa.tanggal >= dari)
+    if sampai:
+        stmt = stmt.where(StatistikDiagnosa.tanggal <= sampai)
+    if kode_penyakit:
+        stmt = stmt.where(StatistikDiagnosa.kode_penyakit == kode_penyakit)
+    if status:
+        stmt = stmt.where(StatistikDiagnosa.status == status)
+    if kolom:
+        stmt = stmt.group_by(*kolom).order_by(*kolom)
+    out = []
+    for row in db.execute(stmt).mappings():
+        d = dict(row)
+        d["jumlah"] = int(d["jumlah"] or 0)
+        if "tanggal" in d:
+            d["tanggal"] = str(d["tanggal"])
+        out.append(d)
+    return out
+
+
+def total(db: Session) -> int:
+    return int(db.scalar(select(func.sum(StatistikDiagnosa.jumlah))) or 0)
+
+
+def bangun_ulang(db: Session) -> int:
+    """Hitung ulang seluruh counter dari riwayat_diagnosa (mis. setelah migrasi data lama).
+
+    Satu INSERT ... SELECT GROUP BY; mengembalikan jumlah bucket. Commit dilakukan pemanggil.
+    """
+    r = RiwayatDiagnosa
+    ku = case(
+        *[(r.umur <= batas, label) for batas, label in KELOMPOK_UMUR],
+        else_=KELOMPOK_UMUR_SISA,
+    )
+    tanggal = func.date(r.created_at)
+    sumber = select(tanggal, r.kode_penyakit, r.status, r.jk, ku, func.count()).group_by(
+        tanggal, r.kode_penyakit, r.status, r.jk, ku
+    )
+    db.execute(delete(StatistikDiagnosa))
+    db.execute(insert(StatistikDiagnosa).from_select([*DIMENSI, "jumlah"], sumber))
+    return db.scalar(select(func.count()).select_from(StatistikDiagnosa)) or 0
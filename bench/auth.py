@@ -0,0 +1,60 @@
+"""Benchmark overhead autentikasi admin, dengan dan tanpa cache verifikasi token.
+
+Dua ukuran, masing-masing dijalankan dengan cache mati (JWT_CACHE_MAKS=0)
+lalu hidup:
+
+- `cek_token`  : biaya verifikasi token saja (decode + HMAC vs lookup cache).
+- `request`    : GET /api/admin/pool in-process (endpoint admin tanpa query DB),
+                 jadi selisihnya adalah overhead auth per request.
+
+    python -m bench.auth --n 5000
+
+Hasil dicetak sebagai JSON (p50/p95/p99 dalam ms + hit/miss cache).
+"""
+import argparse
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app import keamanan
+from app.main import app
+from bench.jawab import ringkas
+
+
+def ukur(fn, n: int) -> list[float]:
+    out = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t) * 1000)
+    return out
+
+
+def jalankan(n: int, maks: int) -> dict:
+    client = TestClient(app)
+    token = keamanan.buat_token("admin")
+    headers = {"Authorization": f"Bearer {token}"}
+    hasil = {}
+    for nama, ukuran in (("tanpa_cache", 0), ("dengan_cache", maks)):
+        keamanan.cache_token = keamanan.CacheLRU(ukuran)
+        verifikasi = ringkas(ukur(lambda: keamanan.cek_token(token), n))
+
+        def minta():
+            client.get("/api/admin/pool", headers=headers).raise_for_status()
+
+        request = ringkas(ukur(minta, n))
+        hasil[nama] = {"cek_token": verifikasi, "request": request, "cache": keamanan.cache_token.ke_dict()}
+    return hasil
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=2000, help="jumlah verifikasi/request per mode")
+    ap.add_argument("--maks", type=int, default=1024, help="ukuran cache untuk mode dengan_cache")
+    args = ap.parse_args()
+    print(json.dumps(jalankan(args.n, args.maks), indent=2))
+
+
+if __name__ == "__main__":
+    main()
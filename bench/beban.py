@@ -0,0 +1,225 @@
+"""Load test alur diagnosa penuh: /mulai -> /jawab* -> selesai, banyak sesi paralel.
+
+Basis pengetahuan sintetis (penyakit x gejala x premis per penyakit) di-import
+lewat /api/admin/import/ndjson, lalu sesi diagnosa dijalankan bersamaan lewat
+transport ASGI in-process (httpx), tanpa server HTTP. Query DB dihitung per
+request lewat event engine SQLAlchemy.
+
+    # SQLite sementara sebagai pengganti MySQL (default)
+    python -m bench.beban --penyakit 50 --gejala 99 --aturan 8 --sesi 500 --paralel 16
+
+    # MySQL di .env -- MENGGANTI basis pengetahuan di DB!
+    python -m bench.beban --db mysql --konfirmasi --keluaran hasil.json
+
+Output JSON (stdout atau --keluaran): throughput, p50/p95/p99 (ms) dan query
+DB per request untuk /mulai, /jawab (langkah tanya) dan /jawab terakhir,
+plus konfigurasi run supaya hasil antar-versi bisa dibandingkan.
+Format kode dibatasi validasi admin: maksimal 99 penyakit & 99 gejala.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import db as app_db
+from app.keamanan import buat_token
+from app.konfigurasi import settings
+from app.main import app
+from bench.impor import baris_sintetis
+from bench.jawab import ringkas
+
+# penghitung query milik request yang sedang berjalan (ikut terbawa ke threadpool)
+_query: contextvars.ContextVar = contextvars.ContextVar("query", default=None)
+
+
+def _hitung_query(conn, cursor, statement, parameters, context, executemany):
+    n = _query.get()
+    if n is not None:
+        n[0] += 1
+
+
+def pakai_sqlite(path: str) -> list:
+    """Arahkan dependency DB app ke file SQLite; kembalikan engine yang dipakai."""
+    eng = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(eng, "connect")
+    def _pragma(conn, _):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+
+    app_db.Base.metadata.create_all(eng)
+    sesi = sessionmaker(bind=eng, autoflush=False, autocommit=False)
+
+    def get_db():
+        db = sesi()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[app_db.get_db] = get_db
+    engines = [eng]
+    if settings.DB_ASYNC:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        aeng = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 30})
+        asesi = async_sessionmaker(aeng, autoflush=False)
+
+        async def get_async_db():
+            async with asesi() as db:
+                yield db
+
+        app.dependency_overrides[app_db.get_async_db] = get_async_db
+        engines.append(aeng.sync_engine)
+    return engines
+
+
+class Pencatat:
+    def __init__(self):
+        self.data: dict[str, list[tuple[float, int]]] = {}
+
+    async def kirim(self, client: httpx.AsyncClient, nama: str, path: str, body: dict) -> dict:
+        n = [0]
+        token = _query.set(n)
+        t = time.perf_counter()
+        try:
+            r = await client.post(path, json=body)
+        finally:
+            _query.reset(token)
+        dt = (time.perf_counter() - t) * 1000
+        r.raise_for_status()
+        out = r.json()
+        if nama == "jawab" and out["status"] != "tanya":
+            nama = "jawab_akhir"
+        self.data.setdefault(nama, []).append((dt, n[0]))
+        return out
+
+
+async def sesi_penuh(client, catat: Pencatat, rnd: random.Random, premis: dict[str, set], args) -> str:
+    """Satu sesi dari /mulai sampai selesai; kembalikan status akhir."""
+    target = rnd.choice(list(premis))
+    bio = {"nama": "bench", "umur": rnd.randint(10, 80), "jk": rnd.choice(["L", "P"]), "alamat": "-"}
+    if args.mode == "semua":
+        mulai = {**bio, "mode": "semua", "strategi": args.strategi}
+    else:
+        mulai = {**bio, "kode_penyakit": target, "strategi": args.strategi}
+    out = await catat.kirim(client, "mulai", "/api/diagnosa/mulai", mulai)
+    sid, q = out["sesi_id"], out["pertanyaan"]["kode_gejala"]
+    while True:
+        # "benar": jawab sesuai premis penyakit target; "acak": Ya dengan peluang --peluang-ya
+        ya = q in premis[target] if args.jawab == "benar" else rnd.random() < args.peluang_ya
+        out = await catat.kirim(client, "jawab", "/api/diagnosa/jawab",
+                                {"sesi_id": sid, "kode_gejala": q, "jawaban": ya, "ringkas": args.ringkas})
+        if out["status"] != "tanya":
+            return out["status"]
+        q = out["pertanyaan"]["kode_gejala"]
+
+
+async def jalankan(args) -> dict:
+    rows = list(baris_sintetis(args.penyakit, args.gejala, args.aturan, args.solusi, seed=args.seed))
+    premis: dict[str, set] = {r["kode"]: set() for r in rows if r["jenis"] == "penyakit"}
+    for r in rows:
+        if r["jenis"] == "aturan":
+            premis[r["kode_penyakit"]].add(r["kode_gejala"])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        admin = {"Authorization": f"Bearer {buat_token('admin')}"}
+        body = b"".join(json.dumps(r).encode() + b"\n" for r in rows)
+        r = await client.post("/api/admin/import/ndjson", content=body, headers=admin)
+        r.raise_for_status()
+
+        catat, rnd = Pencatat(), random.Random(args.seed)
+        status: dict[str, int] = {}
+        batas = asyncio.Semaphore(args.paralel)
+
+        async def satu():
+            async with batas:
+                st = await sesi_penuh(client, catat, random.Random(rnd.random()), premis, args)
+                status[st] = status.get(st, 0) + 1
+
+        # pemanasan (tidak dihitung): snapshot, pool koneksi, cache
+        await asyncio.gather(*(satu() for _ in range(min(args.pemanasan, args.sesi))))
+        catat.data.clear()
+        status.clear()
+
+        t = time.perf_counter()
+        await asyncio.gather(*(satu() for _ in range(args.sesi)))
+        durasi = time.perf_counter() - t
+
+    endpoint = {}
+    for nama, isi in catat.data.items():
+        ms = [x for x, _ in isi]
+        q = [n for _, n in isi]
+        endpoint[nama] = {
+            **ringkas(ms),
+            "rps": round(len(isi) / durasi, 1),
+            "query_per_request": {"mean": round(statistics.fmean(q), 2), "max": max(q)},
+        }
+    total = sum(len(v) for v in catat.data.values())
+    return {
+        "konfigurasi": {
+            "db": args.db, "db_async": settings.DB_ASYNC, "sesi_store": settings.SESI_STORE,
+            "penyakit": args.penyakit, "gejala": args.gejala, "aturan": args.aturan,
+            "sesi": args.sesi, "paralel": args.paralel, "mode": args.mode, "strategi": args.strategi,
+            "jawab": args.jawab, "ringkas": args.ringkas, "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "durasi_detik": round(durasi, 3),
+        "sesi_per_detik": round(args.sesi / durasi, 1),
+        "request_per_detik": round(total / durasi, 1),
+        "status_akhir": status,
+        "endpoint": endpoint,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", choices=["sqlite", "mysql"], default="sqlite",
+                    help="sqlite: file sementara sebagai pengganti MySQL; mysql: DB di .env")
+    ap.add_argument("--konfirmasi", action="store_true", help="wajib untuk --db mysql (basis pengetahuan diganti)")
+    ap.add_argument("--penyakit", type=int, default=20)
+    ap.add_argument("--gejala", type=int, default=60)
+    ap.add_argument("--aturan", type=int, default=6, help="premis per penyakit")
+    ap.add_argument("--solusi", type=int, default=40)
+    ap.add_argument("--sesi", type=int, default=200, help="jumlah sesi diagnosa penuh yang diukur")
+    ap.add_argument("--paralel", type=int, default=8, help="sesi yang berjalan bersamaan")
+    ap.add_argument("--pemanasan", type=int, default=10, help="sesi pemanasan (tidak diukur)")
+    ap.add_argument("--mode", choices=["tunggal", "semua"], default="tunggal")
+    ap.add_argument("--strategi", choices=["urutan", "informasi"], default="urutan")
+    ap.add_argument("--jawab", choices=["benar", "acak"], default="benar")
+    ap.add_argument("--peluang-ya", type=float, default=0.5)
+    ap.add_argument("--ringkas", action="store_true", help="kirim ringkas=true di /jawab")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--keluaran", help="tulis JSON ke file ini (default stdout)")
+    args = ap.parse_args()
+    if args.db == "mysql" and not args.konfirmasi:
+        ap.error("tambahkan --konfirmasi (basis pengetahuan di DB akan diganti)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engines = pakai_sqlite(os.path.join(tmp, "bench.db")) if args.db == "sqlite" else [
+            app_db.engine, *([app_db.async_engine.sync_engine] if app_db.async_engine is not None else [])
+        ]
+        for eng in engines:
+            event.listen(eng, "before_cursor_execute", _hitung_query)
+        hasil = asyncio.run(jalankan(args))
+
+    teks = json.dumps(hasil, indent=2)
+    if args.keluaran:
+        with open(args.keluaran, "w") as f:
+            f.write(teks + "\n")
+    else:
+        print(teks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark throughput import basis pengetahuan (baris/detik).
+
+PERINGATAN: import mengganti seluruh basis pengetahuan di DB yang dikonfigurasi
+di .env (riwayat tetap). Pakai DB khusus benchmark, lalu import ulang db_init.sql.
+
+    python -m bench.impor --penyakit 99 --gejala 99 --aturan 60 --konfirmasi
+
+Basis pengetahuan sintetis dibangkitkan sebagai NDJSON dan dikirim bertahap ke
+/api/admin/import/ndjson; mode --json mengirim dokumen JSON utuh ke
+/api/admin/import sebagai pembanding.
+"""
+import argparse
+import json
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from app.keamanan import buat_token
+from app.main import app
+
+
+def baris_sintetis(penyakit: int, gejala: int, aturan: int, solusi: int, seed: int = 1):
+    """Bangkitkan baris NDJSON (dict) urut induk -> anak.
+
+    Format kode dibatasi validasi admin: P01..P99, G-01..G-99, solusi maks S99.
+    """
+    rnd = random.Random(seed)
+    kp = [f"P{i:02d}" for i in range(1, penyakit + 1)]
+    kg = [f"G-{i:02d}" for i in range(1, gejala + 1)]
+    for k in kp:
+        yield {"jenis": "penyakit", "kode": k, "nama": f"Penyakit {k}", "pengertian": "-", "penyebab": "-"}
+    for k in kg:
+        yield {"jenis": "gejala", "kode": k, "nama": f"Gejala {k}"}
+    for k in kp:
+        for i, g in enumerate(rnd.sample(kg, min(aturan, len(kg))), start=1):
+            yield {"jenis": "aturan", "kode_penyakit": k, "kode_gejala": g, "urutan": i}
+    for n in range(1, solusi + 1):
+        yield {"jenis": "solusi", "kode": f"S{n:02d}", "kode_penyakit": kp[(n - 1) % len(kp)], "deskripsi": f"Solusi {n}", "urutan": 1}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--penyakit", type=int, default=99)
+    ap.add_argument("--gejala", type=int, default=99)
+    ap.add_argument("--aturan", type=int, default=60, help="premis per penyakit")
+    ap.add_argument("--solusi", type=int, default=99)
+    ap.add_argument("--json", action="store_true", help="kirim satu dokumen JSON ke /api/admin/import")
+    ap.add_argument("--konfirmasi", action="store_true", help="wajib: basis pengetahuan di DB akan diganti")
+    args = ap.parse_args()
+    if not args.konfirmasi:
+        ap.error("tambahkan --konfirmasi (basis pengetahuan di DB akan diganti)")
+
+    rows = list(baris_sintetis(args.penyakit, args.gejala, args.aturan, args.solusi))
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {buat_token('admin')}"}
+
+    t = time.perf_counter()
+    if args.json:
+        dok = {k: [] for k in ("penyakit", "gejala", "aturan", "solusi")}
+        for r in rows:
+            dok[r.pop("jenis")].append(r)
+        resp = client.post("/api/admin/import", json=dok, headers=headers)
+    else:
+        body = (json.dumps(r).encode() + b"\n" for r in rows)
+        resp = client.post("/api/admin/import/ndjson", content=body, headers=headers)
+    detik = time.perf_counter() - t
+    resp.raise_for_status()
+
+    print(json.dumps({
+        "mode": "json" if args.json else "ndjson",
+        "baris": len(rows),
+        "detik": round(detik, 3),
+        "baris_per_detik": round(len(rows) / detik, 1),
+        "server": {k: v for k, v in resp.json().items() if k != "chunk"},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Penasihat indeks: EXPLAIN untuk setiap query yang dikirim mesin & router.
+
+Skenario request dijalankan in-process (TestClient) terhadap DB di .env, atau
+terhadap file SQLite lewat --url (skema dibuat dan, kalau masih kosong, basis
+pengetahuan sintetis di-import dulu); semua statement SELECT/UPDATE/DELETE
+yang lewat engine direkam per endpoint, lalu
+masing-masing di-EXPLAIN (MySQL) atau EXPLAIN QUERY PLAN (SQLite). Akses yang
+memindai seluruh tabel/indeks tanpa indeks yang bisa dipakai ditandai, dan
+exit code 1 kalau ada, jadi bisa dipasang di CI sebelum data membesar.
+
+    python -m bench.indeks                                  # ringkasan + temuan
+    python -m bench.indeks --json                           # semua rencana query sebagai JSON
+    python -m bench.indeks --url sqlite:///indeks.db --tulis  # SQLite, plus endpoint tulis
+
+Skenario default menulis sesi & riwayat diagnosa ke DB tapi tidak mengubah
+basis pengetahuan; untuk DB di .env basis pengetahuan harus sudah di-seed
+(db_init.sql). --tulis menambahkan endpoint tulis sebelum sesi diagnosa:
+import JSON & NDJSON (hasil export di-import balik), PUT /aturan dengan premis
+yang sama, purge sesi kedaluwarsa (store mysql), lalu POST /reset dan import
+ulang. Reset ikut menghapus riwayat & statistik, jadi --tulis terhadap DB di
+.env wajib --konfirmasi. Import & reset gagal kalau masih ada sesi mode tunggal
+yang merujuk penyakit (FK RESTRICT), jadi pakai DB/file yang belum punya sesi.
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.db import async_engine, engine
+from app.keamanan import buat_token
+from app.konfigurasi import settings
+from app.main import app
+from app.model import Penyakit
+from app.pengetahuan import muat_ulang
+from app.sesi import purge
+from bench.beban import pakai_sqlite
+from bench.impor import baris_sintetis
+
+# (metode, path, body, scan_wajar) — scan_wajar: endpoint yang memang membaca
+# seluruh tabel (daftar/export), hasil scan-nya dilaporkan tapi tidak ditandai.
+_BIO = {"nama": "explain", "umur": 30, "jk": "Laki-laki", "alamat": "-"}
+_HARI_INI = date.today().isoformat()
+SKENARIO_ADMIN = (
+    ("GET", "/api/admin/stats", None, True),  # SUM atas seluruh bucket counter, memang kecil
+    ("GET", "/api/admin/statistik?per=tanggal&dari=2000-01-01", None, False),
+    ("GET", "/api/admin/statistik?per=kode_penyakit&per=status&kode_penyakit=P01", None, False),
+    ("GET", "/api/admin/riwayat?limit=50", None, False),
+    ("GET", "/api/admin/riwayat?limit=50&sebelum=1000000", None, False),
+    ("GET", f"/api/admin/riwayat?dari={_HARI_INI}&sampai={_HARI_INI}", None, False),
+    ("GET", "/api/admin/riwayat?kode_penyakit=P01&status=selesai", None, False),
+    ("GET", "/api/admin/riwayat/export?format=csv", None, True),
+    ("GET", "/api/admin/penyakit/P01", None, False),
+    ("GET", "/api/admin/aturan/P01", None, False),
+    ("GET", "/api/admin/aturan", None, True),
+    ("GET", "/api/admin/peringkat?limit=100", None, False),
+    ("GET", f"/api/admin/peringkat?dari={_HARI_INI}&status=selesai", None, False),
+    ("GET", "/api/admin/penyakit", None, True),
+    ("GET", "/api/admin/gejala", None, True),
+)
+
+
+class Perekam:
+    """Rekam statement unik (teks + parameter pertama) per endpoint lewat event engine."""
+
+    def __init__(self):
+        self.rute = None
+        self.wajar = False
+        self.query: dict[str, dict] = {}
+        self.abaikan: set[str] = set()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.rute is None or statement in self.abaikan or not re.match(r"\s*(SELECT|UPDATE|DELETE)\b", statement, re.I):
+            return
+        if statement not in self.query:
+            params = parameters[0] if executemany and parameters else parameters
+            self.query[statement] = {"sql": statement, "params": params, "rute": set(), "wajar": True}
+        q = self.query[statement]
+        q["rute"].add(self.rute)
+        q["wajar"] = q["wajar"] and self.wajar
+
+
+def siapkan_sqlite(url: str) -> list:
+    """Arahkan app ke file SQLite di `url`; buat skema & seed basis sintetis kalau kosong."""
+    u = make_url(url)
+    if u.get_backend_name() != "sqlite" or not u.database or u.database == ":memory:":
+        raise SystemExit("--url hanya menerima file SQLite, mis. sqlite:///indeks.db")
+    engines = pakai_sqlite(u.database)
+    eng = engines[0]
+    with eng.begin() as conn:
+        # tabel admin tidak dimodelkan ORM (lihat db_init.sql)
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS admin (id INTEGER PRIMARY KEY, "
+            "username VARCHAR(50) NOT NULL UNIQUE, password_sha CHAR(64) NOT NULL)"
+        ))
+    with Session(eng) as db:
+        kosong = db.scalar(select(Penyakit.kode).limit(1)) is None
+    if kosong:
+        admin = {"Authorization": f"Bearer {buat_token('admin')}"}
+        body = b"".join(json.dumps(r).encode() + b"\n" for r in baris_sintetis(20, 60, 6, 40))
+        TestClient(app).post("/api/admin/import/ndjson", content=body, headers=admin).raise_for_status()
+    return engines
+
+
+def jalankan_tulis(kirim, admin: dict, kode_penyakit: str, rekam: Perekam, eng) -> None:
+    """Endpoint tulis; basis pengetahuan dikembalikan seperti semula."""
+    # import & reset memang mengosongkan seluruh tabel basis, scan-nya tidak ditandai
+    dok = kirim("GET", "/api/admin/export", None, True, admin).json()
+    ndjson = kirim("GET", "/api/admin/export/ndjson", None, True, admin).content
+    kirim("POST", "/api/admin/import", dok, True, admin)
+    kirim("POST", "/api/admin/import/ndjson", None, True, admin, ndjson)
+    aturan = kirim("GET", f"/api/admin/aturan/{kode_penyakit}", None, False, admin).json()
+    solusi = [s["deskripsi"] for s in aturan["solusi"]]
+    body = {"gejala": aturan["gejala"], "solusi": solusi, "bobot": aturan["bobot"]}
+    kirim("PUT", f"/api/admin/aturan/{kode_penyakit}", body, False, admin)
+    if settings.SESI_STORE == "mysql" and settings.SESI_TTL_MENIT > 0:
+        # purge berjalan sebagai task lifespan, bukan endpoint
+        rekam.rute, rekam.wajar = "TASK purge sesi", False
+        try:
+            with Session(eng) as db:
+                purge(db, settings.SESI_PURGE_BATCH)
+        finally:
+            rekam.rute = None
+    kirim("POST", "/api/admin/reset", None, True, admin)
+    kirim("POST", "/api/admin/import/ndjson", None, True, admin, ndjson)
+
+
+def jalankan_skenario(rekam: Perekam, kode_penyakit: str, eng, tulis: bool = False) -> None:
+    client = TestClient(app, raise_server_exceptions=False)
+    admin = {"Authorization": f"Bearer {buat_token('admin')}"}
+
+    def kirim(metode, path, body=None, wajar=False, headers=None, konten=None):
+        rekam.rute, rekam.wajar = f"{metode} {path.split('?')[0]}", wajar
+        try:
+            r = client.request(metode, path, json=body, content=konten, headers=headers)
+        finally:
+            rekam.rute = None
+        if r.status_code >= 500:
+            raise SystemExit(f"{metode} {path} -> {r.status_code}: {r.text[:200]}")
+        return r
+
+    kirim("POST", "/api/auth/login", {"username": "admin", "password": "-"})
+    if tulis:
+        jalankan_tulis(kirim, admin, kode_penyakit, rekam, eng)
+    for mulai in ({"kode_penyakit": kode_penyakit}, {"mode": "semua", "strategi": "informasi"}):
+        out = kirim("POST", "/api/diagnosa/mulai", {**_BIO, **mulai}).json()
+        sid, q, n = out["sesi_id"], out["pertanyaan"]["kode_gejala"], 0
+        while True:
+            out = kirim("POST", "/api/diagnosa/jawab", {"sesi_id": sid, "kode_gejala": q, "jawaban": n % 3 != 2}).json()
+            if out["status"] != "tanya":
+                break
+            q, n = out["pertanyaan"]["kode_gejala"], n + 1
+    kirim("POST", "/api/diagnosa/batch", {**_BIO, "kode_penyakit": kode_penyakit, "jawaban": {}})
+    for metode, path, body, wajar in SKENARIO_ADMIN:
+        kirim(metode, path, body, wajar, admin)
+
+
+def _pakai_limit(sql: str) -> bool:
+    return re.search(r"\bLIMIT\b", sql, re.I) is not None
+
+
+def _scan_terbatas(sql: str) -> bool:
+    """Scan mengikuti ORDER BY yang berhenti di LIMIT (mis. riwayat terbaru)."""
+    return _pakai_limit(sql) and re.search(r"\bORDER BY\b", sql, re.I) is not None
+
+
+def _rencana_mysql(conn, q: dict) -> tuple[list[dict], list[str]]:
+    rows = [dict(r) for r in conn.exec_driver_sql("EXPLAIN " + q["sql"], q["params"]).mappings()]
+    temuan = []
+    for r in rows:
+        jenis, kunci, extra = r.get("type"), r.get("possible_keys"), r.get("Extra") or ""
+        if jenis == "index" and _scan_terbatas(q["sql"]) and "filesort" not in extra:
+            continue
+        if jenis in ("ALL", "index") and not kunci and r.get("table"):
+            temuan.append(f"{r['table']}: scan penuh ({jenis}, rows={r.get('rows')}) tanpa indeks yang cocok")
+        elif jenis == "ALL":
+            temuan.append(f"{r['table']}: optimizer memilih scan penuh (rows={r.get('rows')}); wajar di tabel kecil")
+        if "filesort" in extra and not _pakai_limit(q["sql"]):
+            temuan.append(f"{r['table']}: filesort")
+    return rows, temuan
+
+
+def _rencana_sqlite(conn, q: dict) -> tuple[list[dict], list[str]]:
+    rows = [dict(r) for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + q["sql"], q["params"]).mappings()]
+    temuan = []
+    urut = not any("TEMP B-TREE" in r.get("detail", "") for r in rows)
+    for r in rows:
+        detail = r.get("detail", "")
+        if detail.startswith("SCAN ") and "INDEX" not in detail and detail != "SCAN CONSTANT ROW":
+            if not (urut and _scan_terbatas(q["sql"])):
+                temuan.append(f"scan penuh: {detail}")
+        elif "TEMP B-TREE" in detail and not _pakai_limit(q["sql"]):
+            temuan.append(f"sort tanpa indeks: {detail}")
+    return rows, temuan
+
+
+def analisis(rekam: Perekam, eng) -> list[dict]:
+    hasil = []
+    with eng.connect() as conn:
+        rencana = _rencana_mysql if conn.dialect.name == "mysql" else _rencana_sqlite
+        for q in rekam.query.values():
+            rows, temuan = rencana(conn, q)
+            hasil.append({
+                "rute": sorted(q["rute"]),
+                "sql": " ".join(q["sql"].split()),
+                "rencana": rows,
+                "temuan": temuan,
+                # yang ditandai: scan tak terduga, bukan pilihan optimizer di tabel kecil
+                "ditandai": bool([t for t in temuan if "wajar" not in t]) and not q["wajar"],
+            })
+        conn.rollback()
+    return hasil
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--penyakit", default="P01", help="kode penyakit untuk sesi mode tunggal")
+    ap.add_argument("--json", action="store_true", help="cetak semua rencana query sebagai JSON")
+    ap.add_argument("--url", help="file SQLite yang diperiksa, mis. sqlite:///indeks.db (default: DB di .env)")
+    ap.add_argument("--tulis", action="store_true", help="ikut periksa endpoint tulis (import, PUT aturan, purge, reset)")
+    ap.add_argument("--konfirmasi", action="store_true", help="wajib untuk --tulis tanpa --url (riwayat & statistik dihapus)")
+    args = ap.parse_args()
+    if args.tulis and not args.url and not args.konfirmasi:
+        ap.error("tambahkan --konfirmasi (POST /reset menghapus riwayat & statistik di DB .env)")
+
+    if args.url:
+        engines = siapkan_sqlite(args.url)
+    else:
+        engines = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    rekam = Perekam()
+    for eng in engines:
+        event.listen(eng, "before_cursor_execute", rekam)
+    try:
+        # snapshot basis pengetahuan sengaja dibaca utuh: statement-nya dicatat dulu lalu
+        # dikecualikan, juga saat snapshot dibangun ulang di dalam endpoint tulis
+        rekam.rute = "snapshot"
+        with Session(engines[0]) as db:
+            muat_ulang(db)
+        rekam.rute = None
+        rekam.abaikan = set(rekam.query)
+        rekam.query.clear()
+        jalankan_skenario(rekam, args.penyakit, engines[0], args.tulis)
+    finally:
+        for eng in engines:
+            event.remove(eng, "before_cursor_execute", rekam)
+
+    hasil = analisis(rekam, engines[0])
+    ditandai = [h for h in hasil if h["ditandai"]]
+    if args.json:
+        print(json.dumps(hasil, indent=2, default=str))
+    else:
+        print(f"{len(hasil)} query unik diperiksa, {len(ditandai)} ditandai")
+        for h in hasil:
+            if h["temuan"]:
+                tanda = "!!" if h["ditandai"] else "--"
+                print(f"\n{tanda} {', '.join(h['rute'])}\n   {h['sql'][:200]}")
+                for t in h["temuan"]:
+                    print(f"   - {t}")
+    sys.exit(1 if ditandai else 0)
+
+
+if __name__ == "__main__":
+    main()
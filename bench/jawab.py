@@ -0,0 +1,77 @@
+"""Benchmark latensi alur /api/diagnosa/mulai -> /api/diagnosa/jawab.
+
+Dijalankan in-process (TestClient) terhadap DB yang dikonfigurasi di .env,
+jadi angka yang keluar mencakup round-trip & commit MySQL sungguhan.
+Basis pengetahuan harus sudah di-seed (db_init.sql).
+
+    python -m bench.jawab --sesi 200 --penyakit P02
+
+Hasil dicetak sebagai JSON: p50/p95/p99 (ms) untuk /mulai, /jawab antara
+(status "tanya"), dan /jawab terakhir (yang menulis riwayat).
+"""
+import argparse
+import json
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def persentil(data: list[float], p: float) -> float:
+    if not data:
+        return 0.0
+    data = sorted(data)
+    i = min(len(data) - 1, max(0, round(p / 100 * len(data)) - 1))
+    return data[i]
+
+
+def ringkas(data: list[float]) -> dict:
+    return {
+        "n": len(data),
+        "mean_ms": round(statistics.fmean(data), 3) if data else 0.0,
+        "p50_ms": round(persentil(data, 50), 3),
+        "p95_ms": round(persentil(data, 95), 3),
+        "p99_ms": round(persentil(data, 99), 3),
+    }
+
+
+def jalankan(sesi: int, kode_penyakit: str) -> dict:
+    client = TestClient(app)
+    bio = {"nama": "bench", "umur": 30, "jk": "Laki-laki", "alamat": "-"}
+    mulai, antara, akhir = [], [], []
+
+    for _ in range(sesi):
+        t = time.perf_counter()
+        r = client.post("/api/diagnosa/mulai", json={**bio, "kode_penyakit": kode_penyakit})
+        mulai.append((time.perf_counter() - t) * 1000)
+        r.raise_for_status()
+        out = r.json()
+        sid, q = out["sesi_id"], out["pertanyaan"]["kode_gejala"]
+
+        while True:
+            t = time.perf_counter()
+            r = client.post("/api/diagnosa/jawab", json={"sesi_id": sid, "kode_gejala": q, "jawaban": True})
+            dt = (time.perf_counter() - t) * 1000
+            r.raise_for_status()
+            out = r.json()
+            if out["status"] != "tanya":
+                akhir.append(dt)
+                break
+            antara.append(dt)
+            q = out["pertanyaan"]["kode_gejala"]
+
+    return {"mulai": ringkas(mulai), "jawab_antara": ringkas(antara), "jawab_akhir": ringkas(akhir)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sesi", type=int, default=100, help="jumlah sesi diagnosa penuh")
+    ap.add_argument("--penyakit", default="P01", help="kode penyakit yang dicek")
+    args = ap.parse_args()
+    print(json.dumps(jalankan(args.sesi, args.penyakit), indent=2))
+
+
+if __name__ == "__main__":
+    main()
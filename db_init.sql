@@ -12,6 +12,9 @@ DROP TABLE IF EXISTS solusi;
 DROP TABLE IF EXISTS gejala;
 DROP TABLE IF EXISTS penyakit;
 DROP TABLE IF EXISTS admin;
+DROP TABLE IF EXISTS nomor_urut;
+DROP TABLE IF EXISTS kb_version;
+DROP TABLE IF EXISTS statistik_diagnosa;
 
 CREATE TABLE admin (
   id INT AUTO_INCREMENT PRIMARY KEY,
@@ -46,29 +49,51 @@ CREATE TABLE aturan (
   kode_penyakit VARCHAR(3) NOT NULL,
   kode_gejala VARCHAR(5) NOT NULL,
   urutan INT NOT NULL DEFAULT 0,
+  bobot DOUBLE NOT NULL DEFAULT 1,  -- certainty factor (0..1] untuk diagnosa berperingkat
   CONSTRAINT fk_aturan_penyakit FOREIGN KEY (kode_penyakit) REFERENCES penyakit(kode) ON DELETE CASCADE,
   CONSTRAINT fk_aturan_gejala FOREIGN KEY (kode_gejala) REFERENCES gejala(kode) ON DELETE CASCADE,
-  UNIQUE KEY uq_aturan (kode_penyakit, kode_gejala)
+  UNIQUE KEY uq_aturan (kode_penyakit, kode_gejala),
+  KEY ix_aturan_penyakit_urutan (kode_penyakit, urutan)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE solusi (
-  kode VARCHAR(3) PRIMARY KEY,     -- S01, S02, ...
+  kode VARCHAR(10) PRIMARY KEY,    -- S01 .. S99, S100, ... (DB lama: ALTER TABLE solusi MODIFY kode VARCHAR(10))
   kode_penyakit VARCHAR(3) NOT NULL,
   deskripsi TEXT NOT NULL,
   urutan INT NOT NULL DEFAULT 0,
+  KEY ix_solusi_penyakit_urutan (kode_penyakit, urutan),
   CONSTRAINT fk_solusi_penyakit FOREIGN KEY (kode_penyakit) REFERENCES penyakit(kode) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Counter penomoran kode (nilai = nomor terakhir yang sudah dipakai)
+CREATE TABLE nomor_urut (
+  nama VARCHAR(30) PRIMARY KEY,
+  nilai INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Versi basis pengetahuan (satu baris), naik bersama setiap perubahan admin
+CREATE TABLE kb_version (
+  id INT PRIMARY KEY,
+  versi INT NOT NULL DEFAULT 0,
+  diubah_pada DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 CREATE TABLE sesi_diagnosa (
   id CHAR(36) PRIMARY KEY,
   nama VARCHAR(120) NOT NULL,
   umur INT NOT NULL,
   jk VARCHAR(20) NOT NULL,
   alamat TEXT NOT NULL,
-  kode_penyakit VARCHAR(3) NOT NULL,
+  kode_penyakit VARCHAR(3) NULL, -- kosong kalau mode=semua
+  mode VARCHAR(20) NOT NULL DEFAULT 'tunggal', -- tunggal|semua
+  strategi VARCHAR(20) NOT NULL DEFAULT 'urutan', -- urutan|informasi
   status VARCHAR(20) NOT NULL DEFAULT 'aktif', -- aktif|selesai|tidak_terpenuhi
+  profil_id CHAR(36) NULL, -- profil jawaban pasien lintas sesi
   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  KEY ix_sesi_status_created (status, created_at),
+  KEY ix_sesi_created (created_at),
+  KEY ix_sesi_profil (profil_id, created_at),
   CONSTRAINT fk_sesi_penyakit FOREIGN KEY (kode_penyakit) REFERENCES penyakit(kode) ON DELETE RESTRICT
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -94,7 +119,21 @@ CREATE TABLE riwayat_diagnosa (
   kode_penyakit VARCHAR(3) NOT NULL,
   nama_penyakit VARCHAR(120) NOT NULL,
   pesan TEXT NULL,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  KEY ix_riwayat_created (created_at),
+  KEY ix_riwayat_penyakit_status (kode_penyakit, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Counter agregat riwayat (dinaikkan bersamaan dengan insert riwayat_diagnosa)
+CREATE TABLE statistik_diagnosa (
+  tanggal DATE NOT NULL,
+  kode_penyakit VARCHAR(3) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  jk VARCHAR(20) NOT NULL,
+  kelompok_umur VARCHAR(10) NOT NULL, -- <18, 18-25, 26-35, 36-45, 46-60, >60
+  jumlah INT NOT NULL DEFAULT 0,
+  PRIMARY KEY (tanggal, kode_penyakit, status, jk, kelompok_umur),
+  KEY ix_statistik_penyakit_status (kode_penyakit, status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Seed penyakit (P01-P05)
@@ -167,3 +206,6 @@ INSERT INTO solusi (kode, kode_penyakit, deskripsi, urutan) VALUES
 ('S19','P05','Terapi kecemasan/depresi (mis. SSRI) sesuai evaluasi tenaga kesehatan',3),
 ('S20','P05','Obat penenang ringan dosis rendah (mis. doxepin) sesuai dokter, hindari ketergantungan',4),
 ('S21','P05','Relaksasi/meditasi: pernapasan dalam atau mindfulness',5);
+
+INSERT INTO nomor_urut (nama, nilai) VALUES ('solusi', 21);
+INSERT INTO kb_version (id, versi) VALUES (1, 0);
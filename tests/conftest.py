@@ -0,0 +1,37 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db import Base, get_db
+from app.keamanan import buat_token
+from app.main import app
+
+
+@pytest.fixture
+def sqlite():
+    """(engine, sessionmaker) SQLite in-memory kosong; get_db app diarahkan ke sini selama test."""
+    eng = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(eng)
+    Sesi = sessionmaker(bind=eng, autoflush=False, autocommit=False)
+
+    def _get():
+        with Sesi() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = _get
+    yield eng, Sesi
+    app.dependency_overrides.pop(get_db, None)
+    eng.dispose()
+
+
+@pytest.fixture
+def klien():
+    # tanpa `with`: lifespan (pemanasan ke MySQL, purge sesi) tidak dijalankan
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin():
+    return {"Authorization": f"Bearer {buat_token('admin')}"}
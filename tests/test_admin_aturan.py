@@ -0,0 +1,32 @@
+"""GET /api/admin/aturan harus memakai jumlah query tetap, berapa pun jumlah penyakitnya (tanpa N+1)."""
+import pytest
+from sqlalchemy import event
+
+from app.model import Aturan, Gejala, Penyakit, Solusi
+
+
+def _seed(Sesi, n_penyakit: int) -> None:
+    with Sesi() as db:
+        db.add_all(Gejala(kode=f"G-{i:02d}", nama=f"Gejala {i}") for i in range(1, 4))
+        for i in range(1, n_penyakit + 1):
+            kode = f"P{i:02d}"
+            db.add(Penyakit(kode=kode, nama=f"Penyakit {i}"))
+            db.add_all(Aturan(kode_penyakit=kode, kode_gejala=f"G-{g:02d}", urutan=g) for g in range(1, 4))
+            db.add(Solusi(kode=f"S{i:02d}", kode_penyakit=kode, deskripsi="-", urutan=1))
+        db.commit()
+
+
+@pytest.mark.parametrize("n_penyakit", [5, 60])
+def test_list_aturan_jumlah_query_tetap(sqlite, klien, admin, n_penyakit):
+    eng, Sesi = sqlite
+    _seed(Sesi, n_penyakit)
+    query = []
+    event.listen(eng, "before_cursor_execute", lambda *a: query.append(a[2]))
+
+    r = klien.get("/api/admin/aturan", headers=admin)
+
+    assert r.status_code == 200
+    assert len(r.json()) == n_penyakit
+    assert all(len(a["gejala"]) == 3 and len(a["solusi"]) == 1 for a in r.json())
+    # penyakit, aturan IN (...), solusi IN (...)
+    assert len(query) == 3
@@ -0,0 +1,75 @@
+"""Import NDJSON: error menyebut nomor baris sumber yang salah, juga untuk referensi & duplikat."""
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.konfigurasi import settings
+from app.model import Aturan
+
+_INDUK = [
+    {"jenis": "penyakit", "kode": "P01", "nama": "Insomnia"},
+    {"jenis": "gejala", "kode": "G-01", "nama": "Sulit tidur"},
+    {"jenis": "gejala", "kode": "G-02", "nama": "Mengantuk"},
+]
+
+
+def _ndjson(rows) -> bytes:
+    return "\n".join(json.dumps(r) for r in rows).encode()
+
+
+@pytest.fixture(autouse=True)
+def chunk_kecil(monkeypatch):
+    # chunk 2 baris: baris yang salah tidak pernah jadi baris pemicu flush
+    monkeypatch.setattr(settings, "IMPORT_CHUNK", 2)
+
+
+def _impor(klien, admin, rows):
+    return klien.post("/api/admin/import/ndjson", content=_ndjson(rows), headers=admin)
+
+
+def test_import_berhasil(sqlite, klien, admin):
+    rows = _INDUK + [
+        {"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-01", "urutan": 1},
+        {"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-02", "urutan": 2},
+        {"jenis": "solusi", "kode": "S01", "kode_penyakit": "P01", "deskripsi": "Tidur teratur"},
+    ]
+    r = _impor(klien, admin, rows)
+    assert r.status_code == 200, r.text
+    assert r.json()["jumlah"] == {"penyakit": 1, "gejala": 2, "aturan": 2, "solusi": 1}
+    with sqlite[1]() as db:
+        assert db.scalar(select(func.count()).select_from(Aturan)) == 2
+
+
+@pytest.mark.parametrize("salah, pesan", [
+    ({"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-99"}, "Gejala G-99"),
+    ({"jenis": "solusi", "kode": "S01", "kode_penyakit": "P09", "deskripsi": "-"}, "Penyakit P09"),
+    ({"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-01"}, "duplikat"),
+    ({"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-02", "urutan": "x"}, "Urutan"),
+    ({"jenis": "solusi", "kode": "S01", "kode_penyakit": "P01", "deskripsi": "-", "urutan": [1]}, "Urutan"),
+    ({"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-02", "bobot": 1.5}, "Bobot"),
+])
+def test_import_error_menyebut_baris_yang_salah(sqlite, klien, admin, salah, pesan):
+    rows = _INDUK + [
+        {"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-01", "urutan": 1},
+        salah,  # baris 5
+        {"jenis": "aturan", "kode_penyakit": "P01", "kode_gejala": "G-02", "urutan": 2},
+    ]
+    r = _impor(klien, admin, rows)
+    assert r.status_code == 400
+    detail = r.json()["detail"]
+    assert detail.startswith("Baris 5: ")
+    assert pesan in detail
+
+
+@pytest.mark.parametrize("urutan", ["x", [1]])
+def test_import_json_urutan_tidak_valid(sqlite, klien, admin, urutan):
+    # /import memakai validasi yang sama dengan /import/ndjson: 400, bukan 500
+    dok = {
+        "penyakit": [{"kode": "P01", "nama": "Insomnia"}],
+        "gejala": [{"kode": "G-01", "nama": "Sulit tidur"}],
+        "aturan": [{"kode_penyakit": "P01", "kode_gejala": "G-01", "urutan": urutan}],
+    }
+    r = klien.post("/api/admin/import", json=dok, headers=admin)
+    assert r.status_code == 400
+    assert "Urutan" in r.json()["detail"]
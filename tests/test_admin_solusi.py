@@ -0,0 +1,37 @@
+"""Penomoran kode solusi lewat counter nomor_urut, termasuk lewat S99 dan DB tanpa baris counter."""
+from sqlalchemy import select
+
+from app.model import Gejala, NomorUrut, Penyakit, Solusi
+
+
+def _seed(Sesi, counter=None, solusi=()):
+    with Sesi() as db:
+        db.add(Penyakit(kode="P01", nama="Insomnia"))
+        db.add(Gejala(kode="G-01", nama="Sulit tidur"))
+        db.add_all(Solusi(kode=k, kode_penyakit="P01", deskripsi="-", urutan=0) for k in solusi)
+        if counter is not None:
+            db.add(NomorUrut(nama="solusi", nilai=counter))
+        db.commit()
+
+
+def _simpan(klien, admin, solusi):
+    return klien.put("/api/admin/aturan/P01", headers=admin, json={"gejala": ["G-01"], "solusi": solusi})
+
+
+def test_kode_solusi_lewat_s99(sqlite, klien, admin):
+    _seed(sqlite[1], counter=98)
+    r = _simpan(klien, admin, ["a", "b", "c"])
+    assert r.status_code == 200, r.text
+    assert [s["kode"] for s in r.json()["solusi"]] == ["S99", "S100", "S101"]
+    with sqlite[1]() as db:
+        assert db.scalar(select(NomorUrut.nilai).where(NomorUrut.nama == "solusi")) == 101
+
+
+def test_counter_dibuat_dari_kode_lama(sqlite, klien, admin):
+    # DB lama tanpa baris counter: nomor dilanjutkan dari kode solusi tertinggi yang ada
+    _seed(sqlite[1], solusi=("S07",))
+    r = _simpan(klien, admin, ["lama", "baru"])
+    assert r.status_code == 200, r.text
+    assert [s["kode"] for s in r.json()["solusi"]] == ["S07", "S08"]
+    with sqlite[1]() as db:
+        assert db.scalar(select(NomorUrut.nilai).where(NomorUrut.nama == "solusi")) == 8
@@ -0,0 +1,31 @@
+"""Purge sesi kedaluwarsa (store mysql): SESI_TTL_MENIT=0 tidak boleh menghapus sesi aktif."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.konfigurasi import settings
+from app.model import Gejala, JawabanDiagnosa, SesiDiagnosa
+from app.sesi import purge
+
+
+def _seed(Sesi):
+    with Sesi() as db:
+        db.add(Gejala(kode="G-01", nama="Sulit tidur"))
+        # CURRENT_TIMESTAMP SQLite = UTC
+        lama = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+        db.add(SesiDiagnosa(id="lama", nama="-", umur=30, jk="L", alamat="-", mode="semua", created_at=lama))
+        db.add(SesiDiagnosa(id="baru", nama="-", umur=30, jk="L", alamat="-", mode="semua"))
+        db.add(JawabanDiagnosa(sesi_id="lama", kode_gejala="G-01", jawaban=True))
+        db.commit()
+
+
+@pytest.mark.parametrize("ttl, terhapus, sisa", [(60, (1, 1), {"baru"}), (0, (0, 0), {"lama", "baru"})])
+def test_purge(sqlite, monkeypatch, ttl, terhapus, sisa):
+    monkeypatch.setattr(settings, "SESI_TTL_MENIT", ttl)
+    _seed(sqlite[1])
+    with sqlite[1]() as db:
+        assert purge(db, 10) == terhapus
+    with sqlite[1]() as db:
+        assert set(db.scalars(select(SesiDiagnosa.id))) == sisa
+        assert db.scalar(select(func.count()).select_from(JawabanDiagnosa)) == (0 if ttl else 1)